@@ -46,13 +46,26 @@ import time
 import base64
 from collections import deque
 import hashlib
+import sqlite3
+import gzip
+import unicodedata
+import heapq
+import itertools
+import bisect
+import functools
+from contextlib import contextmanager
+from urllib.parse import urlparse
 from threading import Thread
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from logging.handlers import RotatingFileHandler
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed, wait, FIRST_COMPLETED
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import queue
+import atexit
+import copy
 
 # 第三方库导入
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
 from collections import OrderedDict
+from typing import Optional, Dict, Any
 
 # ================================
 # 应用程序初始化和常量定义
@@ -588,6 +601,42 @@ app_config = {
     "ENABLE_QUALITY_ASSESSMENT": False,  # 智能分组是否启用质量评估（禁用可提高性能）
     "ENABLE_SCRAPING_QUALITY_ASSESSMENT": True,  # 刮削功能是否启用质量评估（建议开启）
 
+    # 本地文件名解析配置
+    "ENABLE_LOCAL_FILENAME_PARSER": True,  # 刮削前先用规则解析文件名，高置信度文件跳过AI
+    "LOCAL_PARSER_CONFIDENCE_THRESHOLD": 80,  # 本地解析置信度阈值（0-100），低于阈值的文件交给AI
+
+    # 模型级联配置
+    "ENABLE_MODEL_CASCADE": False,  # 是否启用模型级联（先用快速模型，低分项目再交给强模型）
+    "CASCADE_FAST_MODEL": "",  # 级联第一层的快速/低成本模型（为空时使用MODEL/GROUPING_MODEL）
+    "CASCADE_STRONG_MODEL": "",  # 级联第二层的强模型（为空时使用MODEL/GROUPING_MODEL）
+    "CASCADE_ESCALATION_THRESHOLD": 70,  # 单项质量分数低于该值时升级到强模型
+
+    # TMDB并发搜索配置
+    "ENABLE_PARALLEL_TMDB_STRATEGIES": False,  # 是否并发执行多个TMDB搜索策略（找到高质量匹配后取消其余策略）
+    "TMDB_PARALLEL_STRATEGY_COUNT": 3,  # 并发执行的不同查询策略数量
+    "TMDB_MAX_CONCURRENT_REQUESTS": 4,  # 全局TMDB并发请求上限
+    "TMDB_RATE_LIMIT": 20,  # TMDB令牌桶速率（每秒请求数）
+    "TMDB_RATE_BURST": 10,  # TMDB令牌桶容量（允许的瞬时突发请求数）
+
+    # 离线TMDB标题索引配置
+    "ENABLE_TMDB_TITLE_INDEX": False,  # 是否先用离线标题索引解析候选ID（需先通过 /build_tmdb_title_index 构建）
+
+    # 智能分组任务队列配置
+    "GROUPING_WORKERS": 3,  # 并行执行智能分组任务的工作线程数
+
+    # 日志配置
+    "LOG_LEVELS": {  # 各子系统的日志级别（cloud=云盘API, tmdb=TMDB, ai=AI调用, scrape=逐文件刮削；也可写完整日志器名）
+        "cloud": "INFO",
+        "tmdb": "INFO",
+        "ai": "INFO",
+        "scrape": "INFO"
+    },
+    "LOG_REPEAT_LIMIT": 30,  # 同一位置的INFO及以下日志每分钟最多输出条数，超出部分汇总为一条（0为不限制）
+
+    # 追踪配置
+    "TRACING_ENABLED": True,  # 是否记录分组任务和刮削/重命名请求的阶段耗时追踪（可导出为Chrome trace JSON）
+    "TRACE_MAX_TRACES": 20,  # 内存中保留的最近追踪条数
+
     # 端口管理配置
     "KILL_OCCUPIED_PORT_PROCESS": True  # 是否自动结束占用端口的进程（启用可避免端口冲突）
 }
@@ -596,8 +645,92 @@ app_config = {
 # 全局变量声明
 # ================================
 
-# 日志队列，用于Web界面实时显示日志
-log_queue = deque(maxlen=5000)
+class LogRing:
+    """
+    带递增序号的日志环形缓冲区，用于Web界面实时显示日志
+
+    每行日志分配单调递增的序号，客户端以 since=<序号> 为游标只获取新日志，
+    并可按级别过滤；wait_since 支持长轮询，没有新日志时阻塞等待而不是反复返回空结果。
+    序号只在同一进程内有效，epoch 标识本次进程启动，客户端据此判断服务是否重启过。
+    """
+
+    def __init__(self, maxlen: int = 5000):
+        self.entries = deque(maxlen=maxlen)
+        self.last_seq = 0
+        self.epoch = f"{os.getpid()}-{int(time.time() * 1000)}"
+        self.condition = threading.Condition()
+
+    def append(self, line: str, levelno: int = logging.INFO):
+        with self.condition:
+            self.last_seq += 1
+            self.entries.append((self.last_seq, levelno, line))
+            self.condition.notify_all()
+
+    def lines(self):
+        """全部缓存的日志行（兼容旧的 /logs 返回格式）"""
+        with self.condition:
+            return [line for _, _, line in self.entries]
+
+    def since(self, after_seq: int, min_level: int = 0, limit: int = 1000, epoch: str = '') -> Dict[str, Any]:
+        """
+        获取序号大于 after_seq 的日志
+
+        游标早于缓冲区最旧的日志时 truncated 为True（中间的日志已被覆盖）；
+        客户端带来的 epoch 与当前进程不同（服务已重启，游标属于上一次运行）时从头获取，reset 为True。
+        超过 limit 条时只返回最新的 limit 条。
+        """
+        with self.condition:
+            reset = bool(epoch) and epoch != self.epoch
+            if reset:
+                after_seq = 0
+            after_seq = min(after_seq, self.last_seq)
+            oldest_seq = self.entries[0][0] if self.entries else self.last_seq + 1
+            truncated = after_seq > 0 and after_seq < oldest_seq - 1
+            # 序号连续，直接按偏移定位，避免遍历整个缓冲区
+            start = max(0, len(self.entries) - (self.last_seq - after_seq))
+            selected = [
+                {'seq': seq, 'level': logging.getLevelName(levelno), 'line': line}
+                for seq, levelno, line in itertools.islice(self.entries, start, None)
+                if levelno >= min_level
+            ]
+            if len(selected) > limit:
+                selected = selected[-limit:]
+                truncated = True
+            return {
+                'entries': selected,
+                'last_seq': self.last_seq,
+                'truncated': truncated,
+                'reset': reset,
+                'epoch': self.epoch
+            }
+
+    def wait_since(self, after_seq: int, min_level: int = 0, timeout: float = 0, limit: int = 1000,
+                   epoch: str = '') -> Dict[str, Any]:
+        """长轮询：没有符合条件的新日志时最多等待 timeout 秒"""
+        deadline = time.time() + timeout
+        result = self.since(after_seq, min_level, limit, epoch)
+        while not result['entries'] and not result['reset']:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            with self.condition:
+                if self.last_seq <= result['last_seq']:
+                    self.condition.wait(timeout=remaining)
+            # 被过滤掉的日志也会推进游标，下次从新位置继续等待
+            after_seq = result['last_seq']
+            result = self.since(after_seq, min_level, limit)
+        return result
+
+    def clear(self):
+        with self.condition:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# 日志环形缓冲区，用于Web界面实时显示日志
+log_ring = LogRing(maxlen=5000)
 
 # 性能配置全局变量
 QPS_LIMIT = app_config["QPS_LIMIT"]
@@ -624,6 +757,40 @@ LANGUAGE = app_config["LANGUAGE"]
 ENABLE_QUALITY_ASSESSMENT = app_config["ENABLE_QUALITY_ASSESSMENT"]  # 智能分组质量评估
 ENABLE_SCRAPING_QUALITY_ASSESSMENT = app_config["ENABLE_SCRAPING_QUALITY_ASSESSMENT"]  # 刮削质量评估
 
+# 本地文件名解析配置全局变量
+ENABLE_LOCAL_FILENAME_PARSER = app_config["ENABLE_LOCAL_FILENAME_PARSER"]
+LOCAL_PARSER_CONFIDENCE_THRESHOLD = app_config["LOCAL_PARSER_CONFIDENCE_THRESHOLD"]
+
+# 模型级联配置全局变量
+ENABLE_MODEL_CASCADE = app_config["ENABLE_MODEL_CASCADE"]
+CASCADE_FAST_MODEL = app_config["CASCADE_FAST_MODEL"]
+CASCADE_STRONG_MODEL = app_config["CASCADE_STRONG_MODEL"]
+CASCADE_ESCALATION_THRESHOLD = app_config["CASCADE_ESCALATION_THRESHOLD"]
+
+# TMDB并发搜索配置全局变量
+ENABLE_PARALLEL_TMDB_STRATEGIES = app_config["ENABLE_PARALLEL_TMDB_STRATEGIES"]
+TMDB_PARALLEL_STRATEGY_COUNT = app_config["TMDB_PARALLEL_STRATEGY_COUNT"]
+TMDB_MAX_CONCURRENT_REQUESTS = app_config["TMDB_MAX_CONCURRENT_REQUESTS"]
+TMDB_RATE_LIMIT = app_config["TMDB_RATE_LIMIT"]
+TMDB_RATE_BURST = app_config["TMDB_RATE_BURST"]
+
+# 离线TMDB标题索引配置全局变量
+ENABLE_TMDB_TITLE_INDEX = app_config["ENABLE_TMDB_TITLE_INDEX"]
+
+# 智能分组任务队列配置全局变量
+GROUPING_WORKERS = app_config["GROUPING_WORKERS"]
+
+# 日志配置全局变量
+LOG_LEVELS = app_config["LOG_LEVELS"]
+LOG_REPEAT_LIMIT = app_config["LOG_REPEAT_LIMIT"]
+
+# 追踪配置全局变量
+TRACING_ENABLED = app_config["TRACING_ENABLED"]
+TRACE_MAX_TRACES = app_config["TRACE_MAX_TRACES"]
+
+# 全局TMDB并发请求信号量（所有TMDB请求共享，配置重载时重建）
+tmdb_request_semaphore = threading.BoundedSemaphore(max(1, TMDB_MAX_CONCURRENT_REQUESTS))
+
 # 123云盘API基础URL
 BASE_API_URL = "https://open-api.123pan.com"
 
@@ -657,6 +824,15 @@ root_logger = None
 file_handler = None
 console_handler = None
 queue_handler = None
+web_log_handler = None
+log_listener = None
+repeated_log_filter = None
+
+# 子系统日志器（级别可通过 LOG_LEVELS 单独配置）
+cloud_logger = logging.getLogger('pan123.cloud')
+tmdb_logger = logging.getLogger('pan123.tmdb')
+ai_logger = logging.getLogger('pan123.ai')
+scrape_logger = logging.getLogger('pan123.scrape')
 
 # QPS限制器全局变量（在应用启动时初始化）
 qps_limiter = None
@@ -665,10 +841,6 @@ rename_limiter = None
 move_limiter = None
 delete_limiter = None
 
-# 任务取消控制全局变量
-current_task_cancelled = False
-current_task_id = None
-
 # ================================
 # 缓存系统初始化（使用LRU缓存）
 # ================================
@@ -689,11 +861,625 @@ scraping_cache._cache_name = 'scraping_cache'
 folder_content_cache = LRUCache(max_size=300, ttl=180)  # 3分钟
 folder_content_cache._cache_name = 'folder_content_cache'
 
+# TMDB搜索结果缓存（按标题/年份/类型去重，短期有效）
+tmdb_search_memo = LRUCache(max_size=1000, ttl=600)  # 10分钟
+tmdb_search_memo._cache_name = 'tmdb_search_memo'
+
+# TMDB季度数据缓存（按(剧集, 季)缓存集数索引）
+tmdb_season_memo = LRUCache(max_size=500, ttl=3600)  # 1小时
+tmdb_season_memo._cache_name = 'tmdb_season_memo'
+
 # 保留原有的常量定义以兼容现有代码（调整为更短的缓存时间）
 GROUPING_CACHE_DURATION = 300  # 5分钟
 SCRAPING_CACHE_DURATION = 600  # 10分钟
 FOLDER_CONTENT_CACHE_DURATION = 180  # 3分钟
 
+# ================================
+# 持久化文件元数据存储
+# ================================
+
+# 文件元数据数据库路径
+FILE_METADATA_DB = 'file_metadata.db'
+
+
+class FileMetadataStore:
+    """
+    持久化的单文件元数据存储（SQLite）
+
+    以"父文件夹名/文件名"的SHA1作为稳定键，保存解析出的标题、年份、季集、
+    媒体类型和TMDB匹配结果，供刮削、智能分组和文件夹命名共享，重启后依然有效。
+    """
+
+    def __init__(self, db_path):
+        """
+        初始化元数据存储
+
+        Args:
+            db_path (str): SQLite数据库文件路径
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_metadata (
+                    file_key TEXT PRIMARY KEY,
+                    name_key TEXT NOT NULL,
+                    file_path TEXT,
+                    title TEXT,
+                    year TEXT,
+                    season INTEGER,
+                    episode INTEGER,
+                    media_type TEXT,
+                    tmdb_id TEXT,
+                    file_info TEXT,
+                    tmdb_info TEXT,
+                    updated_at REAL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_file_metadata_name ON file_metadata (name_key)")
+            self.conn.commit()
+
+    @staticmethod
+    def is_generic_name(file_path):
+        """判断文件名本身是否不含标题（如 "S01E01.mkv"、"第01集.mp4"、"11.mp4"）"""
+        title = str(parse_filename_locally(os.path.basename((file_path or '').replace('\\', '/'))).get('title') or '')
+        return not title or title.isdigit()
+
+    @staticmethod
+    def make_key(file_path):
+        """
+        根据父文件夹名和文件名生成稳定键（不受进程哈希随机化影响）
+
+        通用剧集文件名的父文件夹通常只是 "Season 1"，不足以区分剧集，
+        因此这类文件改用完整路径生成键。
+        """
+        normalized = (file_path or '').replace('\\', '/')
+        if FileMetadataStore.is_generic_name(normalized):
+            return hashlib.sha1(normalized.strip('/').encode('utf-8')).hexdigest()
+        parent_name = os.path.basename(os.path.dirname(normalized))
+        return hashlib.sha1(f"{parent_name}/{os.path.basename(normalized)}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_name_key(file_path):
+        """仅根据文件名生成键，用于调用方不知道路径上下文时的查找"""
+        normalized = (file_path or '').replace('\\', '/')
+        return hashlib.sha1(os.path.basename(normalized).encode('utf-8')).hexdigest()
+
+    def get(self, file_path):
+        """
+        获取单个文件的元数据
+
+        Returns:
+            dict or None: {'file_info': ..., 'tmdb_info': ..., 'updated_at': ...}
+        """
+        return self.get_many([file_path]).get(file_path)
+
+    def get_many(self, file_paths):
+        """
+        批量获取文件元数据
+
+        只有不带目录的文件名才会回退到按文件名查找；"S01E01.mkv" 这类通用
+        文件名必须带路径并按完整路径命中，避免在不同剧集之间串号。
+
+        Returns:
+            dict: file_path -> 元数据记录，未命中的文件不在结果中
+        """
+        found = {}
+        if not file_paths:
+            return found
+
+        try:
+            with self.lock:
+                for file_path in file_paths:
+                    has_dir = '/' in file_path.replace('\\', '/')
+                    generic = self.is_generic_name(file_path)
+                    if generic and not has_dir:
+                        continue
+                    row = self.conn.execute(
+                        "SELECT file_info, tmdb_info, updated_at FROM file_metadata WHERE file_key = ?",
+                        (self.make_key(file_path),)
+                    ).fetchone()
+                    if row is None and not has_dir and not generic:
+                        row = self.conn.execute(
+                            "SELECT file_info, tmdb_info, updated_at FROM file_metadata WHERE name_key = ? "
+                            "ORDER BY updated_at DESC LIMIT 1",
+                            (self.make_name_key(file_path),)
+                        ).fetchone()
+                    if row is not None:
+                        found[file_path] = {
+                            'file_info': json.loads(row[0]) if row[0] else None,
+                            'tmdb_info': json.loads(row[1]) if row[1] else None,
+                            'updated_at': row[2]
+                        }
+            for file_path in file_paths:
+                performance_monitor.record_cache_hit('file_metadata_store', hit=file_path in found)
+        except Exception as e:
+            logging.error(f"❌ 读取文件元数据失败: {e}")
+
+        return found
+
+    def put(self, file_path, file_info, tmdb_info=None):
+        """
+        保存文件元数据（已有记录会被覆盖）
+
+        Args:
+            file_path (str): 带父文件夹的文件路径
+            file_info (dict): 解析出的文件信息
+            tmdb_info (dict, optional): TMDB匹配结果
+        """
+        if not isinstance(file_info, dict):
+            return
+        if '/' not in (file_path or '').replace('\\', '/') and self.is_generic_name(file_path):
+            # 没有路径上下文的通用文件名无法可靠区分剧集，不写入
+            return
+
+        season = file_info.get('season')
+        episode = file_info.get('episode')
+        try:
+            with self.lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO file_metadata "
+                    "(file_key, name_key, file_path, title, year, season, episode, media_type, tmdb_id, file_info, tmdb_info, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        self.make_key(file_path),
+                        self.make_name_key(file_path),
+                        file_path,
+                        (tmdb_info or {}).get('title') or (tmdb_info or {}).get('name') or file_info.get('title', ''),
+                        str(file_info.get('year', '') or ''),
+                        int(season) if str(season or '').isdigit() else None,
+                        int(episode) if str(episode or '').isdigit() else None,
+                        file_info.get('media_type', ''),
+                        str((tmdb_info or {}).get('id', '') or file_info.get('tmdb_id', '') or ''),
+                        json.dumps(file_info, ensure_ascii=False),
+                        json.dumps(tmdb_info, ensure_ascii=False) if tmdb_info else None,
+                        time.time()
+                    )
+                )
+                self.conn.commit()
+        except Exception as e:
+            logging.error(f"❌ 保存文件元数据失败 {file_path}: {e}")
+
+    def clear(self):
+        """清空所有元数据，返回删除的条目数"""
+        with self.lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM file_metadata").fetchone()[0]
+            self.conn.execute("DELETE FROM file_metadata")
+            self.conn.commit()
+            return count
+
+    def stats(self):
+        """获取存储统计信息"""
+        with self.lock:
+            total, matched = self.conn.execute(
+                "SELECT COUNT(*), COUNT(tmdb_info) FROM file_metadata"
+            ).fetchone()
+        return {
+            'size': total,
+            'with_tmdb_match': matched,
+            'db_path': self.db_path
+        }
+
+
+# 创建全局文件元数据存储实例
+file_metadata_store = FileMetadataStore(FILE_METADATA_DB)
+
+
+# TMDB响应缓存数据库路径
+TMDB_CACHE_DB = 'tmdb_cache.db'
+
+# TMDB响应缓存各类资源的有效期（秒）
+TMDB_CACHE_TTLS = {
+    'search': 86400,        # 搜索结果：1天
+    'detail': 7 * 86400,    # 电影/剧集详情：7天
+    'season': 7 * 86400,    # 季详情：7天
+    'find': 7 * 86400,      # 外部ID查找：7天
+    'negative': 3600        # 空结果/404：1小时
+}
+
+
+class TMDBResponseCache:
+    """
+    持久化的TMDB HTTP响应缓存（SQLite）
+
+    以规范化后的接口路径和参数（不含api_key）为键，不同资源使用不同的有效期，
+    空搜索结果和404以较短的有效期做负缓存。
+    """
+
+    def __init__(self, db_path):
+        """
+        初始化TMDB响应缓存
+
+        Args:
+            db_path (str): SQLite数据库文件路径
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.counters = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'stores': 0}
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS tmdb_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    path TEXT,
+                    response TEXT,
+                    negative INTEGER,
+                    expires_at REAL
+                )
+            """)
+            self.conn.commit()
+
+    @staticmethod
+    def resource_type(path):
+        """根据接口路径判断资源类型"""
+        if path.startswith('/search/'):
+            return 'search'
+        if path.startswith('/find/'):
+            return 'find'
+        if '/season/' in path:
+            return 'season'
+        return 'detail'
+
+    @staticmethod
+    def make_key(path, params):
+        """规范化接口路径和参数生成缓存键（忽略api_key，查询词统一大小写和空白）"""
+        normalized = []
+        for name in sorted(params or {}):
+            if name == 'api_key':
+                continue
+            value = str(params[name])
+            if name == 'query':
+                value = re.sub(r'\s+', ' ', value).strip().lower()
+            normalized.append(f"{name}={value}")
+        raw_key = f"{path.lower()}?{'&'.join(normalized)}"
+        return hashlib.sha1(raw_key.encode('utf-8')).hexdigest()
+
+    def get(self, path, params):
+        """
+        查询缓存
+
+        Returns:
+            tuple: (是否命中, 缓存的响应)；404负缓存命中时响应为None
+        """
+        cache_key = self.make_key(path, params)
+        try:
+            with self.lock:
+                row = self.conn.execute(
+                    "SELECT response, negative, expires_at FROM tmdb_responses WHERE cache_key = ?",
+                    (cache_key,)
+                ).fetchone()
+                if row is None or row[2] < time.time():
+                    self.counters['misses'] += 1
+                    hit = False
+                else:
+                    self.counters['negative_hits' if row[1] else 'hits'] += 1
+                    hit = True
+            performance_monitor.record_cache_hit('tmdb_response_cache', hit=hit)
+            if not hit:
+                return False, None
+            return True, json.loads(row[0]) if row[0] else None
+        except Exception as e:
+            logging.error(f"❌ 读取TMDB响应缓存失败: {e}")
+            return False, None
+
+    def put(self, path, params, response, negative=False):
+        """写入缓存，有效期按资源类型决定，负缓存使用较短的有效期"""
+        ttl = TMDB_CACHE_TTLS['negative'] if negative else TMDB_CACHE_TTLS[self.resource_type(path)]
+        try:
+            with self.lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO tmdb_responses (cache_key, path, response, negative, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        self.make_key(path, params),
+                        path,
+                        json.dumps(response, ensure_ascii=False) if response is not None else None,
+                        1 if negative else 0,
+                        time.time() + ttl
+                    )
+                )
+                self.conn.commit()
+                self.counters['stores'] += 1
+        except Exception as e:
+            logging.error(f"❌ 写入TMDB响应缓存失败: {e}")
+
+    def cleanup_expired(self):
+        """清理过期条目，返回清理数量"""
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM tmdb_responses WHERE expires_at < ?", (time.time(),))
+            self.conn.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        """清空缓存，返回删除的条目数"""
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM tmdb_responses")
+            self.conn.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        """获取缓存统计信息"""
+        with self.lock:
+            total, negative = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(negative), 0) FROM tmdb_responses"
+            ).fetchone()
+            counters = self.counters.copy()
+        lookups = counters['hits'] + counters['negative_hits'] + counters['misses']
+        return {
+            'size': total,
+            'negative_entries': negative,
+            'hits': counters['hits'],
+            'negative_hits': counters['negative_hits'],
+            'misses': counters['misses'],
+            'stores': counters['stores'],
+            'hit_rate': (counters['hits'] + counters['negative_hits']) / lookups if lookups > 0 else 0,
+            'ttls': TMDB_CACHE_TTLS.copy(),
+            'db_path': self.db_path
+        }
+
+
+# 创建全局TMDB响应缓存实例
+tmdb_response_cache = TMDBResponseCache(TMDB_CACHE_DB)
+
+
+# ================================
+# 离线TMDB标题索引（基于TMDB每日ID导出文件）
+# ================================
+
+# 离线标题索引数据库文件
+TMDB_TITLE_INDEX_DB = 'tmdb_title_index.db'
+
+# 模糊匹配的最低三元组相似度
+TMDB_TITLE_INDEX_MIN_SIMILARITY = 0.5
+
+
+class TMDBTitleIndex:
+    """
+    离线TMDB标题索引（SQLite，只读内存映射）
+
+    由TMDB每日导出文件（movie_ids_*.json.gz / tv_series_ids_*.json.gz）构建，
+    保存 id、原始标题、规范化标题和热度。查询时先按规范化标题精确匹配（B树索引），
+    再用FTS5 trigram索引做子串/模糊匹配，只把候选ID交给网络请求获取详情。
+    索引文件不存在时所有查询直接返回空列表。
+    """
+
+    def __init__(self, db_path):
+        """
+        初始化离线标题索引
+
+        Args:
+            db_path (str): SQLite数据库文件路径
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = None
+        self.has_trigram = False
+        self.building = False
+        self.counters = {'lookups': 0, 'exact_hits': 0, 'fuzzy_hits': 0, 'misses': 0}
+
+    def try_begin_build(self):
+        """原子地标记开始构建，已在构建中时返回False"""
+        with self.lock:
+            if self.building:
+                return False
+            self.building = True
+            return True
+
+    @staticmethod
+    def normalize(title):
+        """规范化标题：全角转半角、小写、去除标点并合并空白"""
+        title = unicodedata.normalize('NFKC', str(title or '')).lower()
+        return re.sub(r'[\W_]+', ' ', title).strip()
+
+    @staticmethod
+    def trigram_similarity(a, b):
+        """计算两个规范化标题的三元组Jaccard相似度"""
+        def trigrams(text):
+            padded = f"  {text} "
+            return {padded[i:i + 3] for i in range(len(padded) - 2)}
+        grams_a, grams_b = trigrams(a), trigrams(b)
+        if not grams_a or not grams_b:
+            return 0.0
+        return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+    def available(self):
+        """索引文件是否存在"""
+        return os.path.exists(self.db_path) and not self.building
+
+    def _connect(self):
+        """以只读方式打开索引并启用内存映射（调用方需持有锁）"""
+        if self.conn is None:
+            self.conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self.conn.execute("PRAGMA mmap_size = 536870912")
+            self.has_trigram = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'title_trigrams'"
+            ).fetchone() is not None
+        return self.conn
+
+    def _close(self):
+        """关闭当前连接（调用方需持有锁）"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def lookup(self, title, media_type, limit=5):
+        """
+        按标题查找候选条目
+
+        Args:
+            title (str): 标题（通常为原始标题）
+            media_type (str): 'movie' 或 'tv'
+            limit (int): 最多返回的候选数量
+
+        Returns:
+            list: [{'id', 'media_type', 'original_title', 'popularity', 'similarity'}]，按相似度和热度排序
+        """
+        normalized = self.normalize(title)
+        if not normalized or not self.available():
+            return []
+
+        try:
+            with self.lock:
+                conn = self._connect()
+                self.counters['lookups'] += 1
+                rows = conn.execute(
+                    "SELECT id, original_title, norm_title, popularity FROM titles "
+                    "WHERE norm_title = ? AND media_type = ? ORDER BY popularity DESC LIMIT ?",
+                    (normalized, media_type, limit)
+                ).fetchall()
+                counter = 'exact_hits'
+
+                if not rows and self.has_trigram and len(normalized) >= 3:
+                    # 先整体子串匹配，再退化为每个词都出现（忽略词序和多余的词）
+                    words = [word for word in normalized.split() if len(word) >= 3]
+                    queries = ['"' + normalized.replace('"', '') + '"']
+                    if len(words) > 1:
+                        queries.append(' AND '.join(f'"{word}"' for word in words))
+                    for fts_query in queries:
+                        rows = conn.execute(
+                            "SELECT t.id, t.original_title, t.norm_title, t.popularity "
+                            "FROM title_trigrams JOIN titles t ON t.rowid = title_trigrams.rowid "
+                            "WHERE title_trigrams MATCH ? AND t.media_type = ? "
+                            "ORDER BY bm25(title_trigrams), t.popularity DESC LIMIT 200",
+                            (fts_query, media_type)
+                        ).fetchall()
+                        if rows:
+                            break
+                    counter = 'fuzzy_hits'
+
+                self.counters[counter if rows else 'misses'] += 1
+        except Exception as e:
+            logging.error(f"❌ 查询离线标题索引失败: {e}")
+            return []
+
+        candidates = []
+        for tmdb_id, original_title, norm_title, popularity in rows:
+            similarity = 1.0 if norm_title == normalized else self.trigram_similarity(normalized, norm_title)
+            if similarity >= TMDB_TITLE_INDEX_MIN_SIMILARITY:
+                candidates.append({
+                    'id': tmdb_id,
+                    'media_type': media_type,
+                    'original_title': original_title,
+                    'popularity': popularity,
+                    'similarity': round(similarity, 3)
+                })
+        candidates.sort(key=lambda c: (c['similarity'], c['popularity'] or 0), reverse=True)
+        return candidates[:limit]
+
+    @staticmethod
+    def _iter_export_file(export_path, media_type):
+        """逐行读取TMDB导出文件（支持.gz），产出 (id, media_type, 原始标题, 规范化标题, 热度)"""
+        title_field = 'original_title' if media_type == 'movie' else 'original_name'
+        opener = gzip.open if export_path.endswith('.gz') else open
+        with opener(export_path, 'rt', encoding='utf-8') as export_file:
+            for line in export_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                original_title = entry.get(title_field)
+                if not original_title or entry.get('adult'):
+                    continue
+                normalized = TMDBTitleIndex.normalize(original_title)
+                if normalized:
+                    yield (entry.get('id'), media_type, original_title, normalized, entry.get('popularity', 0.0))
+
+    def build(self, movie_export_path=None, tv_export_path=None):
+        """
+        从TMDB每日导出文件重建索引（先写临时文件，完成后原子替换）
+
+        Args:
+            movie_export_path (str, optional): movie_ids_MM_DD_YYYY.json.gz 路径
+            tv_export_path (str, optional): tv_series_ids_MM_DD_YYYY.json.gz 路径
+
+        Returns:
+            dict: {'movie': 条目数, 'tv': 条目数, 'trigram': 是否建立了trigram索引, 'duration': 耗时}
+        """
+        # 经接口触发时已由 try_begin_build 占用构建状态；直接调用时在此占用
+        self.try_begin_build()
+        start_time = time.time()
+        temp_path = f"{self.db_path}.building"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        counts = {'movie': 0, 'tv': 0}
+        try:
+            conn = sqlite3.connect(temp_path)
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("""
+                CREATE TABLE titles (
+                    id INTEGER,
+                    media_type TEXT,
+                    original_title TEXT,
+                    norm_title TEXT,
+                    popularity REAL
+                )
+            """)
+
+            for media_type, export_path in (('movie', movie_export_path), ('tv', tv_export_path)):
+                if not export_path:
+                    continue
+                batch = []
+                for row in self._iter_export_file(export_path, media_type):
+                    batch.append(row)
+                    if len(batch) >= 10000:
+                        conn.executemany("INSERT INTO titles VALUES (?, ?, ?, ?, ?)", batch)
+                        counts[media_type] += len(batch)
+                        batch = []
+                if batch:
+                    conn.executemany("INSERT INTO titles VALUES (?, ?, ?, ?, ?)", batch)
+                    counts[media_type] += len(batch)
+                logging.info(f"📚 已导入 {counts[media_type]} 个{media_type}标题: {export_path}")
+
+            conn.execute("CREATE INDEX idx_titles_norm ON titles (norm_title, media_type)")
+
+            has_trigram = True
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE title_trigrams USING fts5("
+                    "norm_title, content='titles', content_rowid='rowid', tokenize='trigram')"
+                )
+                conn.execute("INSERT INTO title_trigrams (title_trigrams) VALUES ('rebuild')")
+            except sqlite3.OperationalError as e:
+                # SQLite < 3.34 不支持trigram分词器，只保留精确匹配
+                logging.warning(f"⚠️ 当前SQLite不支持trigram索引，仅启用精确匹配: {e}")
+                has_trigram = False
+
+            conn.commit()
+            conn.execute("VACUUM")
+            conn.close()
+
+            with self.lock:
+                self._close()
+                os.replace(temp_path, self.db_path)
+        finally:
+            self.building = False
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        duration = time.time() - start_time
+        logging.info(f"✅ 离线标题索引构建完成: 电影 {counts['movie']}，剧集 {counts['tv']}，耗时 {duration:.1f}秒")
+        return dict(counts, trigram=has_trigram, duration=round(duration, 1))
+
+    def stats(self):
+        """获取索引统计信息"""
+        with self.lock:
+            counters = self.counters.copy()
+        return dict(
+            counters,
+            available=self.available(),
+            building=self.building,
+            has_trigram=self.has_trigram,
+            size_bytes=os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            db_path=self.db_path
+        )
+
+
+# 创建全局离线标题索引实例
+tmdb_title_index = TMDBTitleIndex(TMDB_TITLE_INDEX_DB)
+
 
 def cleanup_all_caches():
     """
@@ -709,6 +1495,9 @@ def cleanup_all_caches():
         stats['grouping_cache'] = grouping_cache.cleanup_expired()
         stats['scraping_cache'] = scraping_cache.cleanup_expired()
         stats['folder_content_cache'] = folder_content_cache.cleanup_expired()
+        stats['tmdb_search_memo'] = tmdb_search_memo.cleanup_expired()
+        stats['tmdb_season_memo'] = tmdb_season_memo.cleanup_expired()
+        stats['tmdb_response_cache'] = tmdb_response_cache.cleanup_expired()
 
         total_cleaned = sum(stats.values())
         if total_cleaned > 0:
@@ -772,20 +1561,149 @@ def clear_operation_related_caches(folder_id=None, operation_type="unknown"):
         return 0
 
 
-def start_cache_cleanup_task():
-    """启动缓存清理后台任务"""
-    def cache_cleanup_worker():
+# ================================
+# 定时调度服务
+# ================================
+
+class ScheduledJob:
+    """调度器中的一个定时作业（一次性或周期性），可随时取消"""
+
+    def __init__(self, name: str, func, run_at: float, interval: float = None):
+        self.name = name
+        self.func = func
+        self.run_at = run_at
+        self.interval = interval
+        self.cancelled = False
+        self.runs = 0
+        self.last_lag = 0.0
+
+    def cancel(self):
+        """取消作业；已在堆中的条目会在到期时被跳过"""
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    基于最小堆的单线程定时调度器
+
+    任务超时、缓存过期清理、任务管理器维护等定时工作都注册到这里，
+    无论有多少任务在运行，都只占用一个调度线程。作业在调度线程上执行，应保持短小。
+    """
+
+    def __init__(self, name: str = "scheduler"):
+        self.name = name
+        self.heap = []
+        self.sequence = itertools.count()  # 同一时刻到期的作业按注册顺序执行
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stats_data = {
+            'scheduled': 0,
+            'executed': 0,
+            'cancelled': 0,
+            'failed': 0,
+            'total_lag': 0.0,
+            'max_lag': 0.0
+        }
+
+    def _ensure_started(self):
+        """按需启动调度线程（调用方需持有条件锁）"""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+            self.thread.start()
+
+    def _push(self, job: ScheduledJob):
+        with self.condition:
+            heapq.heappush(self.heap, (job.run_at, next(self.sequence), job))
+            self.stats_data['scheduled'] += 1
+            self._ensure_started()
+            self.condition.notify()
+
+    def call_later(self, delay: float, func, name: str = None) -> ScheduledJob:
+        """delay 秒后执行一次 func，返回可取消的作业"""
+        job = ScheduledJob(name or getattr(func, '__name__', 'job'), func, time.time() + delay)
+        self._push(job)
+        return job
+
+    def call_every(self, interval: float, func, name: str = None, initial_delay: float = None) -> ScheduledJob:
+        """每隔 interval 秒执行一次 func（首次在 initial_delay 秒后，默认等于 interval）"""
+        first_delay = interval if initial_delay is None else initial_delay
+        job = ScheduledJob(name or getattr(func, '__name__', 'job'), func, time.time() + first_delay, interval)
+        self._push(job)
+        return job
+
+    def _run(self):
+        """调度线程主循环：等待最早到期的作业，执行后按需重新入堆"""
         while True:
+            with self.condition:
+                while True:
+                    # 丢弃已取消的堆顶作业
+                    while self.heap and self.heap[0][2].cancelled:
+                        heapq.heappop(self.heap)
+                        self.stats_data['cancelled'] += 1
+                    if not self.heap:
+                        self.condition.wait()
+                        continue
+                    delay = self.heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self.condition.wait(timeout=delay)
+                _, _, job = heapq.heappop(self.heap)
+
+                lag = max(0.0, time.time() - job.run_at)
+                job.last_lag = lag
+                job.runs += 1
+                self.stats_data['executed'] += 1
+                self.stats_data['total_lag'] += lag
+                self.stats_data['max_lag'] = max(self.stats_data['max_lag'], lag)
+
             try:
-                time.sleep(180)  # 每3分钟清理一次（更频繁）
-                cleanup_all_caches()
+                job.func()
             except Exception as e:
-                logging.error(f"❌ 缓存清理任务异常: {e}")
-                time.sleep(60)  # 出错后等待1分钟再重试
+                with self.condition:
+                    self.stats_data['failed'] += 1
+                logging.error(f"❌ 定时作业 {job.name} 执行失败: {e}")
+
+            if job.interval and not job.cancelled:
+                # 以计划时间为基准推进，避免周期漂移；严重滞后时从当前时间重新计算
+                job.run_at = max(job.run_at + job.interval, time.time())
+                with self.condition:
+                    heapq.heappush(self.heap, (job.run_at, next(self.sequence), job))
+
+    def stats(self) -> Dict[str, Any]:
+        """获取调度器统计信息（包括作业滞后时间）"""
+        with self.condition:
+            pending = [job for _, _, job in self.heap if not job.cancelled]
+            executed = self.stats_data['executed']
+            return {
+                'thread_alive': bool(self.thread and self.thread.is_alive()),
+                'pending_jobs': len(pending),
+                'scheduled': self.stats_data['scheduled'],
+                'executed': executed,
+                'cancelled': self.stats_data['cancelled'],
+                'failed': self.stats_data['failed'],
+                'avg_lag': self.stats_data['total_lag'] / executed if executed > 0 else 0,
+                'max_lag': self.stats_data['max_lag'],
+                'periodic_jobs': {
+                    job.name: {'interval': job.interval, 'runs': job.runs, 'last_lag': job.last_lag,
+                               'next_run_in': max(0.0, job.run_at - time.time())}
+                    for job in pending if job.interval
+                }
+            }
+
+
+# 全局调度器实例
+scheduler = Scheduler()
+
+cache_cleanup_job = None
 
-    cleanup_thread = threading.Thread(target=cache_cleanup_worker, daemon=True)
-    cleanup_thread.start()
-    logging.info("🧹 缓存清理后台任务已启动（每3分钟清理一次）")
+
+def start_cache_cleanup_task():
+    """启动缓存清理定时作业"""
+    global cache_cleanup_job
+    if cache_cleanup_job and not cache_cleanup_job.cancelled:
+        return
+    cache_cleanup_job = scheduler.call_every(180, cleanup_all_caches, name="cache_cleanup")  # 每3分钟清理一次（更频繁）
+    logging.info("🧹 缓存清理定时作业已启动（每3分钟清理一次）")
 
 # 🚦 请求限流控制全局变量（已优化为与任务队列配合）
 folder_request_tracker = {}
@@ -829,11 +1747,9 @@ TASK_QUEUE_GET_TIMEOUT = 1.0  # 任务队列获取超时时间（秒）
 # 全局任务队列管理系统
 # ================================
 
-import queue
 import threading
 from enum import Enum
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Any
 import uuid
 
 class TaskStatus(Enum):
@@ -858,6 +1774,9 @@ class GroupingTask:
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     progress: float = 0.0  # 进度百分比 0-100
+    submitter: str = ''  # 提交方标识（用于公平调度）
+    submit_count: int = 1  # 被合并的重复提交次数（含首次）
+    stage: str = 'queued'  # 当前执行阶段（结构化进度事件使用）
 
     def get_duration(self) -> Optional[float]:
         """获取任务执行时长"""
@@ -867,66 +1786,416 @@ class GroupingTask:
             return time.time() - self.started_at
         return None
 
-class GroupingTaskManager:
-    """智能分组任务管理器"""
 
-    def __init__(self, max_queue_size: int = 10, task_timeout: int = 300):
-        self.task_queue = queue.Queue(maxsize=max_queue_size)
-        self.active_tasks: Dict[str, GroupingTask] = {}
-        self.completed_tasks: Dict[str, GroupingTask] = {}
-        self.max_completed_tasks = 50  # 最多保留50个已完成任务
-        self.task_timeout = task_timeout  # 任务超时时间（秒）
-        self.lock = threading.RLock()
-        self.worker_thread = None
-        self.is_running = False
-        self._start_worker()
+# 持久化任务存储数据库路径
+TASK_STORE_DB = 'task_store.db'
+TASK_RESUME_MAX_ATTEMPTS = 3  # 同一任务最多被中断后恢复的次数（避免导致崩溃的任务反复恢复）
 
-    def _start_worker(self):
-        """启动工作线程"""
-        if not self.is_running:
-            self.is_running = True
-            self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-            self.worker_thread.start()
-            logging.info("🚀 智能分组任务管理器已启动")
 
-    def _worker_loop(self):
-        """工作线程主循环"""
-        while self.is_running:
-            try:
-                # 从队列中获取任务（阻塞等待）
-                task = self.task_queue.get(timeout=TASK_QUEUE_GET_TIMEOUT)
-                if task is None:  # 停止信号
-                    break
+class DurableTaskStore:
+    """
+    持久化的任务存储（SQLite）
 
-                self._execute_task(task)
-                self.task_queue.task_done()
+    记录分组任务的状态，并在阶段边界（扫描完成、第k批分组完成、合并完成）保存检查点。
+    进程重启或崩溃后，未完成的任务按原任务ID重新入队，从最后的检查点继续，
+    已经完成的扫描和AI调用不会重复执行。
+    """
 
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logging.error(f"❌ 任务管理器工作线程异常: {e}")
+    def __init__(self, db_path):
+        """
+        初始化任务存储
 
-    def _execute_task(self, task: GroupingTask):
-        """执行单个任务"""
+        Args:
+            db_path (str): SQLite数据库文件路径
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
         with self.lock:
-            # 更新任务状态
-            task.status = TaskStatus.RUNNING
-            task.started_at = time.time()
-            self.active_tasks[task.task_id] = task
-
-        logging.info(f"🎯 开始执行智能分组任务: {task.task_id} (文件夹: {task.folder_name})")
-
-        # 创建超时检查线程
-        timeout_thread = threading.Thread(target=self._check_task_timeout, args=(task,), daemon=True)
-        timeout_thread.start()
-
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    task_type TEXT NOT NULL,
+                    folder_id TEXT,
+                    folder_name TEXT,
+                    submitter TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER DEFAULT 0,
+                    error TEXT,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS task_checkpoints (
+                    task_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    data TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (task_id, stage)
+                )
+            """)
+            self.conn.commit()
+
+    def save_task(self, task_type, task):
+        """新建或覆盖任务记录（状态为等待中）"""
         try:
-            # 检查任务是否已被取消
+            with self.lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO tasks "
+                    "(task_id, task_type, folder_id, folder_name, submitter, status, attempts, error, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0, NULL, ?, ?)",
+                    (task.task_id, task_type, task.folder_id, task.folder_name, task.submitter,
+                     TaskStatus.PENDING.value, task.created_at, time.time())
+                )
+                self.conn.commit()
+        except Exception as e:
+            logging.error(f"❌ 保存任务记录失败 {task.task_id}: {e}")
+
+    def mark_running(self, task_id):
+        """标记任务开始执行，并累计执行次数"""
+        try:
+            with self.lock:
+                self.conn.execute(
+                    "UPDATE tasks SET status = ?, attempts = attempts + 1, updated_at = ? WHERE task_id = ?",
+                    (TaskStatus.RUNNING.value, time.time(), task_id)
+                )
+                self.conn.commit()
+        except Exception as e:
+            logging.error(f"❌ 更新任务状态失败 {task_id}: {e}")
+
+    def finish_task(self, task_id, status, error=None):
+        """记录任务的最终状态并删除其检查点"""
+        try:
+            with self.lock:
+                self.conn.execute(
+                    "UPDATE tasks SET status = ?, error = ?, updated_at = ? WHERE task_id = ?",
+                    (status, error, time.time(), task_id)
+                )
+                self.conn.execute("DELETE FROM task_checkpoints WHERE task_id = ?", (task_id,))
+                self.conn.commit()
+        except Exception as e:
+            logging.error(f"❌ 更新任务状态失败 {task_id}: {e}")
+
+    def unfinished_tasks(self, task_type):
+        """获取上次进程退出时仍在等待或执行中的任务（按创建时间排序）"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT task_id, folder_id, folder_name, submitter, attempts, created_at FROM tasks "
+                "WHERE task_type = ? AND status IN (?, ?) ORDER BY created_at",
+                (task_type, TaskStatus.PENDING.value, TaskStatus.RUNNING.value)
+            ).fetchall()
+        return [
+            {'task_id': row[0], 'folder_id': row[1], 'folder_name': row[2], 'submitter': row[3],
+             'attempts': row[4], 'created_at': row[5]}
+            for row in rows
+        ]
+
+    def save_checkpoint(self, task_id, stage, data):
+        """
+        保存阶段检查点（同一阶段重复保存会覆盖）
+
+        只有任务仍处于等待或执行中时才写入：任务被取消或超时后，仍在运行的
+        工作线程不会再留下无人清理的检查点。
+        """
+        try:
+            with self.lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO task_checkpoints (task_id, stage, data, updated_at) "
+                    "SELECT ?, ?, ?, ? WHERE EXISTS "
+                    "(SELECT 1 FROM tasks WHERE task_id = ? AND status IN (?, ?))",
+                    (task_id, stage, json.dumps(data, ensure_ascii=False), time.time(),
+                     task_id, TaskStatus.PENDING.value, TaskStatus.RUNNING.value)
+                )
+                self.conn.commit()
+        except Exception as e:
+            logging.error(f"❌ 保存任务检查点失败 {task_id}/{stage}: {e}")
+
+    def load_checkpoints(self, task_id):
+        """读取任务的全部检查点：stage -> data"""
+        try:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT stage, data FROM task_checkpoints WHERE task_id = ?", (task_id,)
+                ).fetchall()
+            return {stage: json.loads(data) for stage, data in rows}
+        except Exception as e:
+            logging.error(f"❌ 读取任务检查点失败 {task_id}: {e}")
+            return {}
+
+    def purge_finished(self, max_age_hours=24):
+        """删除早于指定时间的已结束任务记录及不再属于活动任务的检查点，返回删除的任务条数"""
+        cutoff_time = time.time() - max_age_hours * 3600
+        with self.lock:
+            cursor = self.conn.execute(
+                "DELETE FROM tasks WHERE status NOT IN (?, ?) AND updated_at < ?",
+                (TaskStatus.PENDING.value, TaskStatus.RUNNING.value, cutoff_time)
+            )
+            self.conn.execute(
+                "DELETE FROM task_checkpoints WHERE task_id NOT IN "
+                "(SELECT task_id FROM tasks WHERE status IN (?, ?))",
+                (TaskStatus.PENDING.value, TaskStatus.RUNNING.value)
+            )
+            self.conn.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        """获取存储统计信息"""
+        with self.lock:
+            status_counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            checkpoints = self.conn.execute("SELECT COUNT(*) FROM task_checkpoints").fetchone()[0]
+        return {
+            'tasks_by_status': status_counts,
+            'checkpoints': checkpoints,
+            'db_path': self.db_path
+        }
+
+
+class TaskCheckpointer:
+    """单个任务的检查点读写器：启动时一次性载入已有检查点，保存时直接写入存储"""
+
+    def __init__(self, store: DurableTaskStore, task_id: str):
+        self.store = store
+        self.task_id = task_id
+        self.checkpoints = store.load_checkpoints(task_id)
+
+    def get(self, stage):
+        """获取阶段检查点，不存在时返回None"""
+        return self.checkpoints.get(stage)
+
+    def save(self, stage, data):
+        """保存阶段检查点（当前任务已取消时忽略）"""
+        token = get_current_cancellation_token()
+        if token is not None and token.cancelled:
+            return
+        self.checkpoints[stage] = data
+        self.store.save_checkpoint(self.task_id, stage, data)
+
+
+# 创建全局任务存储实例
+task_store = DurableTaskStore(TASK_STORE_DB)
+
+
+class TaskEventBus:
+    """
+    任务进度事件总线
+
+    每个任务一个事件通道，事件带递增序号，SSE连接按序号续传（断线重连时通过 Last-Event-ID 补发）。
+    任务结束时发布 done 事件并关闭通道，已关闭的通道保留一段时间后清理。
+    """
+
+    def __init__(self, history_size: int = 200, retention_seconds: int = 600):
+        self.history_size = history_size
+        self.retention_seconds = retention_seconds
+        self.condition = threading.Condition()
+        self.channels: Dict[str, Dict[str, Any]] = {}
+        self.published = 0
+
+    def open(self, task_id: str):
+        """为新入队（或以相同ID恢复）的任务打开事件通道"""
+        with self.condition:
+            self.channels[task_id] = {'events': deque(maxlen=self.history_size), 'next_seq': 1, 'closed_at': None}
+
+    def publish(self, task_id: str, event_type: str, data: Dict[str, Any]):
+        """发布事件并唤醒等待中的订阅者（通道不存在或已关闭时忽略）"""
+        with self.condition:
+            channel = self.channels.get(task_id)
+            if channel is None or channel['closed_at'] is not None:
+                return
+            event = {'seq': channel['next_seq'], 'type': event_type, 'data': data, 'time': time.time()}
+            channel['next_seq'] += 1
+            channel['events'].append(event)
+            self.published += 1
+            self.condition.notify_all()
+
+    def close(self, task_id: str, data: Dict[str, Any]):
+        """发布任务结束事件并关闭通道"""
+        with self.condition:
+            if task_id not in self.channels:
+                self.open(task_id)
+            self.publish(task_id, 'done', data)
+            self.channels[task_id]['closed_at'] = time.time()
+
+    def has_channel(self, task_id: str) -> bool:
+        with self.condition:
+            return task_id in self.channels
+
+    def events_since(self, task_id: str, after_seq: int, timeout: float):
+        """
+        获取序号大于 after_seq 的事件，没有新事件时最多等待 timeout 秒
+
+        Returns:
+            tuple: (事件列表, 通道是否已关闭或不存在)
+        """
+        deadline = time.time() + timeout
+        with self.condition:
+            while True:
+                channel = self.channels.get(task_id)
+                if channel is None:
+                    return [], True
+                events = [event for event in channel['events'] if event['seq'] > after_seq]
+                if events or channel['closed_at'] is not None:
+                    return events, channel['closed_at'] is not None
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return [], False
+                self.condition.wait(timeout=remaining)
+
+    def cleanup(self) -> int:
+        """清理关闭时间超过保留期的通道，返回清理数量"""
+        cutoff_time = time.time() - self.retention_seconds
+        with self.condition:
+            expired = [task_id for task_id, channel in self.channels.items()
+                       if channel['closed_at'] is not None and channel['closed_at'] < cutoff_time]
+            for task_id in expired:
+                del self.channels[task_id]
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            open_channels = sum(1 for channel in self.channels.values() if channel['closed_at'] is None)
+            return {
+                'channels': len(self.channels),
+                'open_channels': open_channels,
+                'published': self.published
+            }
+
+
+# 全局任务事件总线
+task_event_bus = TaskEventBus()
+scheduler.call_every(60, task_event_bus.cleanup, name="task_event_cleanup")
+
+class GroupingTaskManager:
+    """
+    智能分组任务管理器
+
+    多个工作线程并行执行分组任务（扫描和AI调用都是I/O密集型，共享全局限速器）；
+    同一文件夹的重复提交合并到同一个任务；待执行任务按提交方分队列，轮询调度保证公平。
+    """
+
+    def __init__(self, max_queue_size: int = 10, task_timeout: int = 300, num_workers: int = 1):
+        self.max_queue_size = max_queue_size
+        self.pending_by_submitter: "OrderedDict[str, deque]" = OrderedDict()  # 提交方 -> 待执行任务队列
+        self.active_tasks: Dict[str, GroupingTask] = {}
+        self.completed_tasks: Dict[str, GroupingTask] = {}
+        self.max_completed_tasks = 50  # 最多保留50个已完成任务
+        self.task_timeout = task_timeout  # 任务超时时间（秒）
+        self.num_workers = max(1, num_workers)
+        self.lock = threading.RLock()
+        self.task_available = threading.Condition(self.lock)
+        self.worker_threads = []
+        self.is_running = False
+        self.started_at = time.time()
+        self.busy_workers = 0
+        self.metrics = {
+            'submitted': 0,
+            'deduplicated': 0,
+            'executed': 0,
+            'max_queue_depth': 0,
+            'total_queue_wait': 0.0,
+            'total_busy_time': 0.0
+        }
+        self._start_worker()
+
+    def _pending_count(self) -> int:
+        """待执行任务总数（调用方需持有锁）"""
+        return sum(len(pending) for pending in self.pending_by_submitter.values())
+
+    def _start_worker(self):
+        """启动工作线程池（只补齐缺少或已退出的线程）"""
+        with self.lock:
+            self.is_running = True
+            self.worker_threads = [thread for thread in self.worker_threads if thread.is_alive()]
+            missing = self.num_workers - len(self.worker_threads)
+            for _ in range(missing):
+                worker_thread = threading.Thread(target=self._worker_loop, daemon=True,
+                                                 name=f"grouping-worker-{len(self.worker_threads) + 1}")
+                worker_thread.start()
+                self.worker_threads.append(worker_thread)
+        if missing > 0:
+            logging.info(f"🚀 智能分组任务管理器已启动 {missing} 个工作线程（共 {self.num_workers} 个）")
+
+    def set_num_workers(self, num_workers: int):
+        """调整工作线程数：增加时立即补齐，减少时多余线程在完成当前任务后退出"""
+        with self.lock:
+            self.num_workers = max(1, num_workers)
+            self.task_available.notify_all()
+        self._start_worker()
+
+    def _next_task(self) -> Optional[GroupingTask]:
+        """按提交方轮询取出下一个任务（调用方需持有锁）"""
+        while self.pending_by_submitter:
+            submitter, pending = next(iter(self.pending_by_submitter.items()))
+            task = pending.popleft()
+            # 轮询：当前提交方移到队尾，空队列直接移除
+            del self.pending_by_submitter[submitter]
+            if pending:
+                self.pending_by_submitter[submitter] = pending
+            if task.status == TaskStatus.PENDING:
+                return task
+        return None
+
+    def _worker_loop(self):
+        """工作线程主循环"""
+        current_thread = threading.current_thread()
+        while self.is_running:
+            try:
+                with self.lock:
+                    task = self._next_task()
+                    while task is None and self.is_running:
+                        # 线程数被调小时，多余的空闲线程退出
+                        alive = [thread for thread in self.worker_threads if thread.is_alive()]
+                        if len(alive) > self.num_workers:
+                            self.worker_threads.remove(current_thread)
+                            return
+                        self.task_available.wait(timeout=TASK_QUEUE_GET_TIMEOUT)
+                        task = self._next_task()
+                    if task is None:
+                        break
+                    self.busy_workers += 1
+                    self.metrics['executed'] += 1
+                    self.metrics['total_queue_wait'] += time.time() - task.created_at
+
+                busy_start = time.time()
+                try:
+                    self._execute_task(task)
+                finally:
+                    with self.lock:
+                        self.busy_workers -= 1
+                        self.metrics['total_busy_time'] += time.time() - busy_start
+
+            except Exception as e:
+                logging.error(f"❌ 任务管理器工作线程异常: {e}")
+
+    def _execute_task(self, task: GroupingTask):
+        """执行单个任务"""
+        with self.lock:
+            # 更新任务状态
+            task.status = TaskStatus.RUNNING
+            task.started_at = time.time()
+            self.active_tasks[task.task_id] = task
+        task_store.mark_running(task.task_id)
+
+        logging.info(f"🎯 开始执行智能分组任务: {task.task_id} (文件夹: {task.folder_name})")
+
+        # 注册超时作业（任务提前结束时取消）
+        timeout_job = scheduler.call_later(self.task_timeout, lambda: self._check_task_timeout(task),
+                                           name=f"grouping_timeout_{task.task_id}")
+        # 追踪ID与任务ID相同，可通过 /api/traces/<task_id> 导出
+        trace_handle = tracer.begin_trace(task.task_id, f"grouping {task.folder_name}", folder_id=task.folder_id)
+
+        try:
+            # 检查任务是否已被取消
             if task.status == TaskStatus.CANCELLED:
                 return
 
-            # 执行实际的分组任务
-            result = self._perform_grouping_analysis(task)
+            # 执行实际的分组任务（绑定独立的取消令牌，扫描/AI/TMDB调用都会检查它）
+            token = register_cancellation_token(task.task_id)
+            set_current_cancellation_token(token)
+            try:
+                result = self._perform_grouping_analysis(task)
+            finally:
+                unregister_cancellation_token(set_current_cancellation_token(None))
 
             with self.lock:
                 if task.status not in [TaskStatus.CANCELLED, TaskStatus.TIMEOUT]:
@@ -949,11 +2218,12 @@ class GroupingTaskManager:
                     self._move_to_completed(task)
 
                     logging.error(f"❌ 智能分组任务失败: {task.task_id} - {e}")
+        finally:
+            timeout_job.cancel()
+            tracer.end_trace(trace_handle, task.error)
 
     def _check_task_timeout(self, task: GroupingTask):
-        """检查任务超时"""
-        time.sleep(self.task_timeout)
-
+        """检查任务超时（由调度器在截止时间触发）"""
         with self.lock:
             if task.task_id in self.active_tasks and task.status == TaskStatus.RUNNING:
                 # 任务超时
@@ -961,6 +2231,7 @@ class GroupingTaskManager:
                 task.completed_at = time.time()
                 task.error = f"任务执行超时 (超过 {self.task_timeout} 秒)"
                 self._move_to_completed(task)
+                cancel_task_token(task.task_id, reason="执行超时")
 
                 logging.warning(f"⏰ 智能分组任务超时: {task.task_id} (超时时间: {self.task_timeout}秒)")
 
@@ -970,14 +2241,19 @@ class GroupingTaskManager:
         if task.status == TaskStatus.CANCELLED:
             raise Exception("任务已被取消")
 
-        # 设置当前任务ID，以便全局取消机制能够工作
-        global current_task_id, current_task_cancelled
-        current_task_id = task.task_id
-        current_task_cancelled = False  # 重置取消标志
+        # 从持久化检查点恢复（进程重启后继续未完成的任务）
+        checkpointer = TaskCheckpointer(task_store, task.task_id)
 
         # 这里调用现有的分组分析函数
-        video_files = []
-        get_video_files_recursively(task.folder_id, video_files)
+        self._publish_progress(task, 'scanning', 5.0)
+        video_files = checkpointer.get('scan')
+        if video_files is not None:
+            logging.info(f"♻️ 从检查点恢复扫描结果: {task.task_id} ({len(video_files)} 个视频文件)")
+        else:
+            video_files = []
+            with tracer.span('scan'):
+                get_video_files_recursively(task.folder_id, video_files)
+            checkpointer.save('scan', video_files)
 
         # 再次检查任务是否被取消
         if task.status == TaskStatus.CANCELLED:
@@ -993,36 +2269,46 @@ class GroupingTaskManager:
             }
 
         # 更新进度
-        task.progress = 30.0
+        self._publish_progress(task, 'scanned', 30.0, files_scanned=len(video_files))
 
         # 调用分组分析
         def progress_callback(message):
             # 检查任务是否被取消
             if task.status == TaskStatus.CANCELLED:
                 raise Exception("任务已被取消")
-
-            # 详细的进度更新逻辑
-            if '开始智能文件分组分析' in message:
-                task.progress = 40.0
-                logging.info(f"🎯 智能分组进度: {task.progress}% - {message}")
-            elif '按子文件夹分组' in message:
-                task.progress = 45.0
-                logging.info(f"📁 智能分组进度: {task.progress}% - {message}")
-            elif '处理子文件夹' in message:
-                task.progress = min(50.0 + (task.progress - 50.0) * 0.1, 85.0)
-                logging.info(f"🔄 智能分组进度: {task.progress}% - {message}")
-            elif 'AI分组耗时' in message:
-                task.progress = min(task.progress + 5.0, 85.0)
-                logging.info(f"⏱️ 智能分组进度: {task.progress}% - {message}")
-            elif '分组分析完成' in message:
-                task.progress = 90.0
-                logging.info(f"✅ 智能分组进度: {task.progress}% - {message}")
+            # 所有分组进度都经过这一行，豁免重复日志限流；
+            # 消息本身已带进度信息，任务百分比通过结构化进度事件发布，这里只标注所属文件夹
+            logging.info(f"📊 [{task.folder_name}] {message}", extra={'repeat_limit_exempt': True})
+
+        # 结构化进度事件：批次进度映射到 40%-85%，ETA 按本次实际执行的批次耗时估算
+        batch_clock = {'started_at': time.time(), 'computed': 0}
+
+        def progress_event(stage, **data):
+            if stage == 'grouping_started':
+                batch_clock['started_at'] = time.time()
+                self._publish_progress(task, stage, 40.0, **data)
+            elif stage == 'batch_done':
+                if not data.get('resumed'):
+                    batch_clock['computed'] += 1
+                remaining = data['total_batches'] - data['batches_done']
+                eta = None
+                if batch_clock['computed'] > 0:
+                    eta = (time.time() - batch_clock['started_at']) / batch_clock['computed'] * remaining
+                progress = 40.0 + 45.0 * data['batches_done'] / max(data['total_batches'], 1)
+                self._publish_progress(task, stage, progress, eta_seconds=eta, **data)
+            elif stage == 'merging':
+                self._publish_progress(task, stage, 88.0, **data)
+            elif stage == 'merged':
+                self._publish_progress(task, stage, 90.0, **data)
 
         # 检查任务是否被取消
         if task.status == TaskStatus.CANCELLED:
             raise Exception("任务已被取消")
 
-        grouping_result = get_folder_grouping_analysis_internal(video_files, task.folder_id, progress_callback)
+        with tracer.span('grouping', file_count=len(video_files)):
+            grouping_result = get_folder_grouping_analysis_internal(video_files, task.folder_id, progress_callback,
+                                                                    checkpointer=checkpointer,
+                                                                    progress_event=progress_event)
 
         # 最后检查任务是否被取消
         if task.status == TaskStatus.CANCELLED:
@@ -1036,10 +2322,29 @@ class GroupingTaskManager:
             'size': f"{sum(file.get('size', 0) for file in video_files) / (1024**3):.1f}GB"
         }
 
+    def _publish_progress(self, task: GroupingTask, stage: str, progress: float, **data):
+        """更新任务阶段和进度，并发布结构化进度事件"""
+        task.stage = stage
+        task.progress = progress
+        task_event_bus.publish(task.task_id, 'progress', {
+            'status': task.status.value,
+            'folder_name': task.folder_name,
+            'stage': stage,
+            'progress': progress,
+            **data
+        })
+
     def _move_to_completed(self, task: GroupingTask):
         """将任务移动到已完成列表"""
         if task.task_id in self.active_tasks:
             del self.active_tasks[task.task_id]
+        task_store.finish_task(task.task_id, task.status.value, task.error)
+        task_event_bus.close(task.task_id, {
+            'status': task.status.value,
+            'progress': task.progress,
+            'error': task.error,
+            'duration': task.get_duration()
+        })
 
         self.completed_tasks[task.task_id] = task
 
@@ -1050,46 +2355,80 @@ class GroupingTaskManager:
                                 key=lambda tid: self.completed_tasks[tid].completed_at or 0)
             del self.completed_tasks[oldest_task_id]
 
-    def submit_task(self, folder_id: str, folder_name: str) -> str:
-        """提交新的分组任务"""
-        task_id = str(uuid.uuid4())
-        task = GroupingTask(
-            task_id=task_id,
-            folder_id=str(folder_id),
-            folder_name=folder_name
-        )
+    def submit_task(self, folder_id: str, folder_name: str, submitter: str = '') -> str:
+        """
+        提交新的分组任务
 
-        try:
-            with self.lock:
-                # 检查是否已有相同文件夹的任务在队列中或执行中
-                for existing_task in list(self.active_tasks.values()):
-                    if existing_task.folder_id == str(folder_id) and existing_task.status in [TaskStatus.PENDING, TaskStatus.RUNNING]:
-                        raise ValueError(f"文件夹 {folder_name} 已有分组任务在进行中")
-
-                # 检查队列中是否有相同文件夹的任务
-                temp_queue = []
-                while not self.task_queue.empty():
-                    try:
-                        queued_task = self.task_queue.get_nowait()
-                        if queued_task.folder_id == str(folder_id):
-                            raise ValueError(f"文件夹 {folder_name} 已有分组任务在队列中")
-                        temp_queue.append(queued_task)
-                    except queue.Empty:
-                        break
+        同一文件夹已有等待中或执行中的任务时，不创建新任务，直接返回已有任务的ID。
+        """
+        with self.lock:
+            self.metrics['submitted'] += 1
+
+            # 相同文件夹的任务已在队列中或执行中：合并到该任务
+            for existing_task in self.active_tasks.values():
+                if existing_task.folder_id == str(folder_id) and existing_task.status in [TaskStatus.PENDING, TaskStatus.RUNNING]:
+                    existing_task.submit_count += 1
+                    self.metrics['deduplicated'] += 1
+                    logging.info(f"🔗 文件夹 {folder_name} 已有分组任务，合并到任务: {existing_task.task_id}")
+                    return existing_task.task_id
+
+            if self._pending_count() >= self.max_queue_size:
+                raise ValueError("任务队列已满，请稍后再试")
+
+            task_id = str(uuid.uuid4())
+            task = GroupingTask(
+                task_id=task_id,
+                folder_id=str(folder_id),
+                folder_name=folder_name,
+                submitter=submitter or 'anonymous'
+            )
 
-                # 重新放回队列中的任务
-                for queued_task in temp_queue:
-                    self.task_queue.put_nowait(queued_task)
+            task_store.save_task('grouping', task)
+            self._enqueue(task)
+            logging.info(f"📝 智能分组任务已提交: {task_id} (文件夹: {folder_name}, 提交方: {task.submitter})")
 
-                # 添加新任务到队列和活动任务列表
-                self.task_queue.put_nowait(task)
-                self.active_tasks[task_id] = task  # 立即添加到活动任务列表
-                logging.info(f"📝 智能分组任务已提交: {task_id} (文件夹: {folder_name})")
+            return task_id
 
-                return task_id
+    def _enqueue(self, task: GroupingTask):
+        """添加任务到提交方队列和活动任务列表（调用方需持有锁）"""
+        self.pending_by_submitter.setdefault(task.submitter, deque()).append(task)
+        self.active_tasks[task.task_id] = task  # 立即添加到活动任务列表
+        self.metrics['max_queue_depth'] = max(self.metrics['max_queue_depth'], self._pending_count())
+        self.task_available.notify()
+        task_event_bus.open(task.task_id)
+        self._publish_progress(task, 'queued', 0.0, queue_size=self._pending_count())
 
-        except queue.Full:
-            raise ValueError("任务队列已满，请稍后再试")
+    def resume_persisted_tasks(self) -> int:
+        """
+        恢复上次进程退出时未完成的任务
+
+        任务保留原任务ID重新入队（不受队列容量限制），执行时从最后的检查点继续；
+        被中断次数过多的任务标记为失败，不再恢复。
+
+        Returns:
+            int: 恢复的任务数量
+        """
+        resumed = 0
+        for record in task_store.unfinished_tasks('grouping'):
+            if record['attempts'] >= TASK_RESUME_MAX_ATTEMPTS:
+                task_store.finish_task(record['task_id'], TaskStatus.FAILED.value,
+                                       f"任务已被中断 {record['attempts']} 次，不再自动恢复")
+                logging.warning(f"⚠️ 放弃恢复多次中断的分组任务: {record['task_id']} (文件夹: {record['folder_name']})")
+                continue
+
+            task = GroupingTask(
+                task_id=record['task_id'],
+                folder_id=record['folder_id'],
+                folder_name=record['folder_name'],
+                created_at=record['created_at'] or time.time(),
+                submitter=record['submitter'] or 'anonymous'
+            )
+            with self.lock:
+                self._enqueue(task)
+            resumed += 1
+            logging.info(f"♻️ 恢复未完成的分组任务: {task.task_id} (文件夹: {task.folder_name})")
+
+        return resumed
 
     def cancel_task(self, task_id: str) -> bool:
         """取消任务"""
@@ -1097,9 +2436,15 @@ class GroupingTaskManager:
             if task_id in self.active_tasks:
                 task = self.active_tasks[task_id]
                 if task.status in [TaskStatus.PENDING, TaskStatus.RUNNING]:
+                    pending = self.pending_by_submitter.get(task.submitter)
+                    if task.status == TaskStatus.PENDING and pending and task in pending:
+                        pending.remove(task)
+                        if not pending:
+                            del self.pending_by_submitter[task.submitter]
                     task.status = TaskStatus.CANCELLED
                     task.completed_at = time.time()
                     self._move_to_completed(task)
+                    cancel_task_token(task_id)
                     logging.info(f"🛑 智能分组任务已取消: {task_id}")
                     return True
             return False
@@ -1114,13 +2459,27 @@ class GroupingTaskManager:
             return None
 
     def get_queue_info(self) -> Dict[str, Any]:
-        """获取队列信息"""
+        """获取队列信息（含队列深度、工作线程利用率和合并统计）"""
         with self.lock:
+            alive_workers = sum(1 for thread in self.worker_threads if thread.is_alive())
+            capacity_time = (time.time() - self.started_at) * self.num_workers
+            executed = self.metrics['executed']
             return {
-                'queue_size': self.task_queue.qsize(),
+                'queue_size': self._pending_count(),
+                'max_queue_size': self.max_queue_size,
+                'queue_by_submitter': {submitter: len(pending) for submitter, pending in self.pending_by_submitter.items()},
                 'active_tasks': len(self.active_tasks),
                 'completed_tasks': len(self.completed_tasks),
-                'is_running': self.is_running
+                'is_running': self.is_running,
+                'workers': self.num_workers,
+                'alive_workers': alive_workers,
+                'busy_workers': self.busy_workers,
+                'utilization': self.metrics['total_busy_time'] / capacity_time if capacity_time > 0 else 0,
+                'submitted': self.metrics['submitted'],
+                'deduplicated': self.metrics['deduplicated'],
+                'executed': executed,
+                'max_queue_depth': self.metrics['max_queue_depth'],
+                'avg_queue_wait': self.metrics['total_queue_wait'] / executed if executed > 0 else 0
             }
 
     def cleanup_old_tasks(self, max_age_hours: int = 24):
@@ -1156,19 +2515,21 @@ class GroupingTaskManager:
             return {
                 'is_healthy': len(long_running_tasks) == 0 and self.is_running,
                 'worker_running': self.is_running,
-                'queue_size': self.task_queue.qsize(),
+                'alive_workers': sum(1 for thread in self.worker_threads if thread.is_alive()),
+                'queue_size': self._pending_count(),
                 'active_tasks_count': len(self.active_tasks),
                 'completed_tasks_count': len(self.completed_tasks),
                 'long_running_tasks': long_running_tasks,
-                'max_queue_size': self.task_queue.maxsize,
+                'max_queue_size': self.max_queue_size,
                 'task_timeout': self.task_timeout
             }
 
     def restart_worker_if_needed(self):
-        """如果工作线程停止，重新启动它"""
-        if not self.is_running or not self.worker_thread or not self.worker_thread.is_alive():
-            logging.warning("🔄 检测到工作线程停止，正在重新启动...")
-            self.is_running = False
+        """如果有工作线程停止，补齐线程池"""
+        with self.lock:
+            alive_workers = sum(1 for thread in self.worker_threads if thread.is_alive())
+        if not self.is_running or alive_workers < self.num_workers:
+            logging.warning(f"🔄 检测到工作线程停止（存活 {alive_workers}/{self.num_workers}），正在重新启动...")
             self._start_worker()
 
     def force_cleanup_stuck_tasks(self):
@@ -1195,7 +2556,8 @@ class GroupingTaskManager:
 try:
     grouping_task_manager = GroupingTaskManager(
         max_queue_size=TASK_QUEUE_MAX_SIZE,
-        task_timeout=TASK_TIMEOUT_SECONDS
+        task_timeout=TASK_TIMEOUT_SECONDS,
+        num_workers=GROUPING_WORKERS
     )
     logging.info("✅ 智能分组任务管理器已成功初始化")
 except Exception as e:
@@ -1208,40 +2570,51 @@ except Exception as e:
 # 任务管理器维护功能
 # ================================
 
-def start_task_manager_maintenance():
-    """启动任务管理器维护线程"""
-    def maintenance_worker():
-        while True:
-            try:
-                # 每5分钟执行一次维护
-                time.sleep(300)
+def resume_grouping_tasks():
+    """
+    恢复上次进程退出时未完成的智能分组任务
+
+    恢复的任务会立即被工作线程执行，必须在限速器、访问令牌等全局对象初始化完成后调用。
+    """
+    if not grouping_task_manager:
+        return
+    try:
+        resumed_count = grouping_task_manager.resume_persisted_tasks()
+        if resumed_count > 0:
+            logging.info(f"♻️ 已恢复 {resumed_count} 个未完成的智能分组任务")
+    except Exception as e:
+        logging.error(f"❌ 恢复未完成的智能分组任务失败: {e}")
 
-                # 检查并重启工作线程
-                grouping_task_manager.restart_worker_if_needed()
 
-                # 清理旧任务（每小时执行一次）
-                if int(time.time()) % 3600 < 300:  # 在每小时的前5分钟内执行
-                    grouping_task_manager.cleanup_old_tasks(24)
+def start_task_manager_maintenance():
+    """注册任务管理器维护定时作业"""
+    def maintenance_job():
+        if not grouping_task_manager:
+            return
 
-                # 强制清理卡住的任务
-                stuck_count = grouping_task_manager.force_cleanup_stuck_tasks()
-                if stuck_count > 0:
-                    logging.warning(f"🧹 维护任务清理了 {stuck_count} 个卡住的任务")
+        # 检查并重启工作线程
+        grouping_task_manager.restart_worker_if_needed()
 
-                # 记录健康状态
-                health = grouping_task_manager.get_health_status()
-                if not health['is_healthy']:
-                    logging.warning(f"⚠️ 任务管理器健康状态异常: {health}")
+        # 强制清理卡住的任务
+        stuck_count = grouping_task_manager.force_cleanup_stuck_tasks()
+        if stuck_count > 0:
+            logging.warning(f"🧹 维护任务清理了 {stuck_count} 个卡住的任务")
 
-            except Exception as e:
-                logging.error(f"❌ 任务管理器维护失败: {e}")
+        # 记录健康状态
+        health = grouping_task_manager.get_health_status()
+        if not health['is_healthy']:
+            logging.warning(f"⚠️ 任务管理器健康状态异常: {health}")
+
+    def old_task_cleanup_job():
+        if grouping_task_manager:
+            grouping_task_manager.cleanup_old_tasks(24)
+        task_store.purge_finished(24)
 
-    # 启动维护线程
-    maintenance_thread = threading.Thread(target=maintenance_worker, daemon=True)
-    maintenance_thread.start()
-    logging.info("🔧 任务管理器维护线程已启动")
+    scheduler.call_every(300, maintenance_job, name="task_manager_maintenance")  # 每5分钟执行一次维护
+    scheduler.call_every(3600, old_task_cleanup_job, name="old_task_cleanup")  # 清理旧任务（每小时执行一次）
+    logging.info("🔧 任务管理器维护定时作业已启动")
 
-# 启动维护线程
+# 注册维护作业
 start_task_manager_maintenance()
 
 # ================================
@@ -1265,7 +2638,7 @@ def submit_grouping_task():
             return jsonify({'success': False, 'error': error_msg})
 
         # 提交任务到队列
-        task_id = grouping_task_manager.submit_task(folder_id, folder_name)
+        task_id = grouping_task_manager.submit_task(folder_id, folder_name, submitter=request.remote_addr or '')
 
         return jsonify({
             'success': True,
@@ -1313,6 +2686,37 @@ def get_grouping_task_status(task_id):
         logging.error(f"获取任务状态失败: {e}")
         return jsonify({'success': False, 'error': f'获取任务状态失败: {str(e)}'})
 
+@app.route('/api/grouping_task/events/<task_id>', methods=['GET'])
+def stream_grouping_task_events(task_id):
+    """
+    以SSE推送智能分组任务的结构化进度事件
+
+    事件类型：progress（阶段、进度、已扫描文件数、已完成批次、ETA、本批分组）和 done（最终状态）。
+    支持 Last-Event-ID 请求头或 since 参数断点续传；任务结束后连接自动关闭，完整结果仍通过状态接口获取。
+    """
+    if not task_event_bus.has_channel(task_id):
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+
+    try:
+        after_seq = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+    except ValueError:
+        after_seq = 0
+
+    def generate():
+        last_seq = after_seq
+        while True:
+            events, closed = task_event_bus.events_since(task_id, last_seq, timeout=15)
+            for event in events:
+                last_seq = event['seq']
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+            if closed:
+                return
+            if not events:
+                yield ": keep-alive\n\n"  # 心跳，防止代理断开空闲连接
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/grouping_task/queue_info', methods=['GET'])
 def get_grouping_queue_info():
     """获取智能分组任务队列信息"""
@@ -1395,36 +2799,65 @@ def perform_grouping_task_maintenance():
         return jsonify({'success': False, 'error': f'执行维护操作失败: {str(e)}'})
 
 def check_task_cancelled():
-    """检查当前任务是否被取消"""
-    # 使用app_state检查取消状态
-    app_state.check_task_cancelled()
+    """检查当前线程所属任务是否被取消"""
+    token = get_current_cancellation_token()
+    if token is None:
+        return
+
+    token.raise_if_cancelled()
 
     # 检查任务队列中的取消状态
-    if app_state.current_task_id and grouping_task_manager:
-        task = grouping_task_manager.get_task_status(app_state.current_task_id)
+    if grouping_task_manager:
+        task = grouping_task_manager.get_task_status(token.task_id)
         if task and task.status == TaskStatus.CANCELLED:
-            logging.info(f"🛑 任务已被用户取消 (任务队列): {app_state.current_task_id}")
+            logging.info(f"🛑 任务已被用户取消 (任务队列): {token.task_id}")
             raise TaskCancelledException("任务已被用户取消")
 
-def cancel_current_task():
-    """取消当前正在运行的任务"""
-    app_state.cancel_task()
+def cancel_current_task(task_id=None):
+    """
+    取消正在运行的任务
 
-    # 同时取消任务队列中的任务
-    if app_state.current_task_id:
-        cancelled = grouping_task_manager.cancel_task(app_state.current_task_id)
-        if cancelled:
-            logging.info(f"🛑 用户请求取消当前任务: {app_state.current_task_id} (任务队列)")
-        else:
-            logging.warning(f"⚠️ 任务队列中未找到任务: {app_state.current_task_id}")
+    Args:
+        task_id (str, optional): 要取消的任务ID；为空时取消所有活跃任务（兼容未传任务ID的旧调用）
 
-    logging.info("🛑 用户请求取消当前任务 (全局标志)")
+    Returns:
+        list: 实际取消的任务ID列表
+    """
+    if task_id:
+        task_ids = [task_id]
+    else:
+        with _cancellation_tokens_lock:
+            task_ids = list(active_cancellation_tokens.keys())
+
+    cancelled_ids = []
+    for target_id in task_ids:
+        found = cancel_task_token(target_id)
+        # 同时取消任务队列中的任务
+        if grouping_task_manager.cancel_task(target_id):
+            logging.info(f"🛑 用户请求取消任务: {target_id} (任务队列)")
+            found = True
+        if found:
+            cancelled_ids.append(target_id)
+
+    if not cancelled_ids:
+        logging.warning(f"⚠️ 未找到可取消的任务: {task_id or '（无活跃任务）'}")
+    return cancelled_ids
 
 def start_new_task(task_id=None):
-    """开始新任务"""
+    """
+    开始新任务：创建独立的取消令牌并绑定到当前线程
+
+    Returns:
+        CancellationToken: 当前任务的取消令牌
+    """
     task_id = task_id or str(int(time.time()))
     app_state.start_task(task_id)
 
+    # 同一线程上未结束的旧任务先注销
+    unregister_cancellation_token(get_current_cancellation_token())
+    token = register_cancellation_token(task_id)
+    set_current_cancellation_token(token)
+
     # 清理路径缓存（避免内存泄漏）
     if folder_path_cache.size() > 1000:  # 缓存过多时清理
         folder_path_cache.clear()
@@ -1438,10 +2871,15 @@ def start_new_task(task_id=None):
     # 定期清理过期缓存
     cleanup_expired_folder_cache()
 
+    return token
+
+def finish_task():
+    """结束当前线程的任务：注销取消令牌并解除绑定"""
+    unregister_cancellation_token(set_current_cancellation_token(None))
+
 def reset_task_state():
-    """重置任务状态（用于普通操作）"""
-    app_state.current_task_id = None
-    app_state.task_cancelled = False
+    """重置任务状态（用于普通操作）：只解除当前线程的任务绑定，不影响其他并发任务"""
+    finish_task()
 
 # ================================
 # 工具函数和辅助方法
@@ -1690,95 +3128,153 @@ def ensure_valid_access_token(func):
     return wrapper
 
 
-def call_ai_api(prompt, model=None, temperature=0.1):
+# 线程内AI token用量采集（用于按调用方统计成本，例如模型级联各层）
+_ai_usage_capture = threading.local()
+
+
+def start_ai_usage_capture():
+    """开始采集当前线程内AI调用的token用量"""
+    _ai_usage_capture.totals = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+
+def stop_ai_usage_capture():
+    """结束采集并返回当前线程内累计的token用量"""
+    totals = getattr(_ai_usage_capture, 'totals', None) or {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+    _ai_usage_capture.totals = None
+    return totals
+
+
+def _accumulate_captured_ai_usage(usage):
+    """如果当前线程正在采集，则累加本次调用的token用量"""
+    totals = getattr(_ai_usage_capture, 'totals', None)
+    if totals is not None:
+        totals['calls'] += 1
+        totals['prompt_tokens'] += usage.get('prompt_tokens') or 0
+        totals['completion_tokens'] += usage.get('completion_tokens') or 0
+
+
+def call_ai_api(prompt, model=None, temperature=0.1, system_prompt=None):
     """
     调用AI API进行文本生成（支持OpenAI兼容接口）
 
+    静态指令通过 system_prompt 以 system 消息发送，可变内容放在最后的 user 消息中，
+    保证请求前缀逐字节一致，以便服务商的提示词前缀缓存生效。
+
     Args:
-        prompt (str): 发送给AI的提示词
+        prompt (str): 发送给AI的提示词（可变的用户内容）
         model (str, optional): 使用的AI模型名称，默认使用配置中的模型
         temperature (float): 生成文本的随机性，0.0-1.0之间
+        system_prompt (str, optional): 静态系统提示词，不应包含任何随调用变化的内容
 
     Returns:
         str or None: AI生成的文本内容，失败时返回None
     """
+    check_task_cancelled()
+
     try:
         # 检查必要的配置
         if not AI_API_KEY:
-            logging.error("❌ AI API密钥未配置")
+            ai_logger.error("❌ AI API密钥未配置")
             return None
 
         if not AI_API_URL:
-            logging.error("❌ AI API服务地址未配置")
+            ai_logger.error("❌ AI API服务地址未配置")
             return None
 
         if not model:
-            logging.error("❌ 模型名称未指定")
+            ai_logger.error("❌ 模型名称未指定")
             return None
 
-        logging.info(f"🌐 调用AI API: {AI_API_URL}")
-        logging.info(f"🤖 使用模型: {model}")
-        logging.info(f"📝 提示词长度: {len(prompt)} 字符")
+        ai_logger.info("🌐 调用AI API: %s", AI_API_URL)
+        ai_logger.info("🤖 使用模型: %s", model)
+        if system_prompt:
+            ai_logger.info("📝 提示词长度: 系统 %s 字符 + 用户 %s 字符", len(system_prompt), len(prompt))
+        else:
+            ai_logger.info("📝 提示词长度: %s 字符", len(prompt))
 
         headers = {
             "Authorization": f"Bearer {AI_API_KEY}",
             "Content-Type": "application/json",
         }
 
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+
         payload = {
             "model": model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": messages,
             "temperature": temperature
             # "max_tokens": max_tokens
         }
 
         # 使用全局配置的超时时间
-        response = requests.post(AI_API_URL, headers=headers, json=payload, timeout=AI_API_TIMEOUT)
-
-        logging.info(f"📊 API响应状态码: {response.status_code}")
+        request_start = time.time()
+        try:
+            response = requests.post(AI_API_URL, headers=headers, json=payload, timeout=AI_API_TIMEOUT)
+        finally:
+            request_duration = time.time() - request_start
+            metrics_registry.observe('pan123_upstream_request_duration_seconds', request_duration,
+                                     upstream='ai', endpoint=model)
+            tracer.record_span(f"ai {model}", 'ai', request_duration, model=model)
+
+        ai_logger.info("📊 API响应状态码: %s", response.status_code)
+        if response.status_code == 429:
+            metrics_registry.inc('pan123_upstream_rate_limited_total', upstream='ai')
+        elif response.status_code >= 400:
+            metrics_registry.inc('pan123_upstream_errors_total', upstream='ai')
 
         response.raise_for_status()
         data = response.json()
 
         # 检查响应格式
         if "choices" not in data:
-            logging.error(f"❌ API响应格式错误，缺少choices字段: {data}")
+            ai_logger.error("❌ API响应格式错误，缺少choices字段: %s", data)
             return None
 
         if not data["choices"] or len(data["choices"]) == 0:
-            logging.error(f"❌ API响应choices为空: {data}")
+            ai_logger.error("❌ API响应choices为空: %s", data)
             return None
 
         if "message" not in data["choices"][0]:
-            logging.error(f"❌ API响应缺少message字段: {data['choices'][0]}")
+            ai_logger.error("❌ API响应缺少message字段: %s", data['choices'][0])
             return None
 
         if "content" not in data["choices"][0]["message"]:
-            logging.error(f"❌ API响应缺少content字段: {data['choices'][0]['message']}")
+            ai_logger.error("❌ API响应缺少content字段: %s", data['choices'][0]['message'])
             return None
 
         content = data["choices"][0]["message"]["content"]
-        logging.info(f"✅ AI API调用成功，返回内容长度: {len(content)} 字符")
+        ai_logger.info("✅ AI API调用成功，返回内容长度: %s 字符", len(content))
+
+        # 记录token用量（含前缀缓存命中的token数）
+        usage = data.get("usage")
+        if usage:
+            _accumulate_captured_ai_usage(usage)
+            cached_tokens = performance_monitor.record_ai_usage(model, usage)
+            if cached_tokens:
+                ai_logger.info("💾 提示词缓存命中: %s/%s tokens", cached_tokens, usage.get('prompt_tokens', 0))
 
         return content
 
     except requests.exceptions.Timeout as e:
-        logging.error(f"❌ AI API调用超时: {e}")
+        ai_logger.error("❌ AI API调用超时: %s", e)
         return None
     except requests.exceptions.ConnectionError as e:
-        logging.error(f"❌ AI API连接失败: {e}")
+        ai_logger.error("❌ AI API连接失败: %s", e)
         return None
     except requests.exceptions.HTTPError as e:
-        logging.error(f"❌ AI API HTTP错误: {e}, 响应内容: {e.response.text if e.response else 'N/A'}")
+        ai_logger.error("❌ AI API HTTP错误: %s, 响应内容: %s", e, e.response.text if e.response else 'N/A')
         return None
     except requests.exceptions.RequestException as e:
-        logging.error(f"❌ AI API请求异常: {e}")
+        ai_logger.error("❌ AI API请求异常: %s", e)
         return None
     except KeyError as e:
-        logging.error(f"❌ AI API响应解析失败，缺少字段: {e}")
+        ai_logger.error("❌ AI API响应解析失败，缺少字段: %s", e)
         return None
     except Exception as e:
-        logging.error(f"❌ AI API调用未知错误: {e}")
+        ai_logger.error("❌ AI API调用未知错误: %s", e)
         return None
 
 def parse_json_from_ai_response(response_content):
@@ -2061,6 +3557,11 @@ def load_application_config():
 
     # 更新全局变量
     global ENABLE_QUALITY_ASSESSMENT, ENABLE_SCRAPING_QUALITY_ASSESSMENT
+    global ENABLE_LOCAL_FILENAME_PARSER, LOCAL_PARSER_CONFIDENCE_THRESHOLD
+    global ENABLE_MODEL_CASCADE, CASCADE_FAST_MODEL, CASCADE_STRONG_MODEL, CASCADE_ESCALATION_THRESHOLD
+    global ENABLE_PARALLEL_TMDB_STRATEGIES, TMDB_PARALLEL_STRATEGY_COUNT, TMDB_MAX_CONCURRENT_REQUESTS, tmdb_request_semaphore
+    global TMDB_RATE_LIMIT, TMDB_RATE_BURST, ENABLE_TMDB_TITLE_INDEX, GROUPING_WORKERS
+    global LOG_LEVELS, LOG_REPEAT_LIMIT, TRACING_ENABLED, TRACE_MAX_TRACES
 
     QPS_LIMIT = app_config["QPS_LIMIT"]
     CHUNK_SIZE = app_config["CHUNK_SIZE"]
@@ -2090,6 +3591,30 @@ def load_application_config():
     TASK_QUEUE_GET_TIMEOUT = app_config.get("TASK_QUEUE_GET_TIMEOUT", 1.0)
     ENABLE_QUALITY_ASSESSMENT = app_config.get("ENABLE_QUALITY_ASSESSMENT", False)
     ENABLE_SCRAPING_QUALITY_ASSESSMENT = app_config.get("ENABLE_SCRAPING_QUALITY_ASSESSMENT", True)
+    ENABLE_LOCAL_FILENAME_PARSER = app_config.get("ENABLE_LOCAL_FILENAME_PARSER", True)
+    LOCAL_PARSER_CONFIDENCE_THRESHOLD = app_config.get("LOCAL_PARSER_CONFIDENCE_THRESHOLD", 80)
+    ENABLE_MODEL_CASCADE = app_config.get("ENABLE_MODEL_CASCADE", False)
+    CASCADE_FAST_MODEL = app_config.get("CASCADE_FAST_MODEL", "")
+    CASCADE_STRONG_MODEL = app_config.get("CASCADE_STRONG_MODEL", "")
+    CASCADE_ESCALATION_THRESHOLD = app_config.get("CASCADE_ESCALATION_THRESHOLD", 70)
+    ENABLE_PARALLEL_TMDB_STRATEGIES = app_config.get("ENABLE_PARALLEL_TMDB_STRATEGIES", False)
+    TMDB_PARALLEL_STRATEGY_COUNT = app_config.get("TMDB_PARALLEL_STRATEGY_COUNT", 3)
+    TMDB_MAX_CONCURRENT_REQUESTS = app_config.get("TMDB_MAX_CONCURRENT_REQUESTS", 4)
+    tmdb_request_semaphore = threading.BoundedSemaphore(max(1, TMDB_MAX_CONCURRENT_REQUESTS))
+    TMDB_RATE_LIMIT = app_config.get("TMDB_RATE_LIMIT", 20)
+    TMDB_RATE_BURST = app_config.get("TMDB_RATE_BURST", 10)
+    tmdb_client.rate_limiter.configure(TMDB_RATE_LIMIT, TMDB_RATE_BURST)
+    resize_shared_executors()
+    ENABLE_TMDB_TITLE_INDEX = app_config.get("ENABLE_TMDB_TITLE_INDEX", False)
+    GROUPING_WORKERS = app_config.get("GROUPING_WORKERS", 3)
+    if grouping_task_manager:
+        grouping_task_manager.set_num_workers(GROUPING_WORKERS)
+    LOG_LEVELS = app_config.get("LOG_LEVELS", {})
+    LOG_REPEAT_LIMIT = app_config.get("LOG_REPEAT_LIMIT", 30)
+    apply_log_settings()
+    TRACING_ENABLED = app_config.get("TRACING_ENABLED", True)
+    TRACE_MAX_TRACES = app_config.get("TRACE_MAX_TRACES", 20)
+    tracer.max_traces = max(1, TRACE_MAX_TRACES)
     logging.info(f"✅ 配置加载完成。QPS_LIMIT: {QPS_LIMIT}, CHUNK_SIZE: {CHUNK_SIZE}, MAX_WORKERS: {MAX_WORKERS}")
     logging.info(f"🔑 API配置状态 - CLIENT_ID: {'已设置' if CLIENT_ID else '未设置'}, CLIENT_SECRET: {'已设置' if CLIENT_SECRET else '未设置'}")
     logging.info(f"🎬 TMDB_API_KEY: {'已设置' if TMDB_API_KEY else '未设置'}, AI_API_KEY: {'已设置' if AI_API_KEY else '未设置'}")
@@ -2142,6 +3667,102 @@ class TaskCancelledException(Exception):
     pass
 
 
+class CancellationToken:
+    """
+    单个任务的取消令牌
+
+    每个任务持有独立的令牌，取消一个任务不会影响其他并发任务。
+    令牌通过线程局部变量绑定到执行线程，并随共享线程池的任务提交自动传递到工作线程。
+    """
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.created_at = time.time()
+        self.reason = None
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self):
+        """是否已取消"""
+        return self._event.is_set()
+
+    def cancel(self, reason="用户取消"):
+        """取消任务，正在等待（sleep/限速/重试退避）的线程会立即被唤醒"""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+            logging.info(f"🛑 任务已取消: {self.task_id} ({reason})")
+
+    def raise_if_cancelled(self):
+        """已取消时抛出 TaskCancelledException"""
+        if self._event.is_set():
+            raise TaskCancelledException(f"任务已被用户取消: {self.task_id}")
+
+    def wait(self, timeout):
+        """等待指定秒数，期间被取消则提前返回True"""
+        return self._event.wait(timeout)
+
+
+# 当前线程绑定的取消令牌
+_cancellation_context = threading.local()
+
+# 活跃任务的取消令牌 {task_id: CancellationToken}
+active_cancellation_tokens = {}
+_cancellation_tokens_lock = threading.Lock()
+
+
+def get_current_cancellation_token():
+    """获取当前线程绑定的取消令牌（未绑定时返回None）"""
+    return getattr(_cancellation_context, 'token', None)
+
+
+def set_current_cancellation_token(token):
+    """将取消令牌绑定到当前线程，返回之前绑定的令牌"""
+    previous = getattr(_cancellation_context, 'token', None)
+    _cancellation_context.token = token
+    return previous
+
+
+def register_cancellation_token(task_id):
+    """为任务创建并登记取消令牌"""
+    token = CancellationToken(task_id)
+    with _cancellation_tokens_lock:
+        active_cancellation_tokens[task_id] = token
+    return token
+
+
+def unregister_cancellation_token(token):
+    """任务结束后移除取消令牌"""
+    if token is None:
+        return
+    with _cancellation_tokens_lock:
+        if active_cancellation_tokens.get(token.task_id) is token:
+            del active_cancellation_tokens[token.task_id]
+
+
+def cancel_task_token(task_id, reason="用户取消"):
+    """取消指定任务的令牌，返回是否找到该任务"""
+    with _cancellation_tokens_lock:
+        token = active_cancellation_tokens.get(task_id)
+    if token:
+        token.cancel(reason)
+    return token is not None
+
+
+def cancellable_sleep(seconds):
+    """
+    可被当前任务取消打断的等待
+
+    用于限速、重试退避等等待点：任务被取消时立即抛出 TaskCancelledException，而不是睡满整个时长。
+    """
+    token = get_current_cancellation_token()
+    if token is None:
+        time.sleep(seconds)
+        return
+    if token.wait(seconds):
+        token.raise_if_cancelled()
+
+
 class APIRateLimitException(Exception):
     """API频率限制异常"""
     pass
@@ -2228,6 +3849,23 @@ class ConfigManager:
         'KILL_OCCUPIED_PORT_PROCESS': {'type': bool, 'default': True},
         'ENABLE_QUALITY_ASSESSMENT': {'type': bool, 'default': False},
         'ENABLE_SCRAPING_QUALITY_ASSESSMENT': {'type': bool, 'default': True},
+        'ENABLE_LOCAL_FILENAME_PARSER': {'type': bool, 'default': True},
+        'LOCAL_PARSER_CONFIDENCE_THRESHOLD': {'type': int, 'min': 0, 'max': 100, 'default': 80},
+        'ENABLE_MODEL_CASCADE': {'type': bool, 'default': False},
+        'CASCADE_FAST_MODEL': {'type': str, 'default': ''},
+        'CASCADE_STRONG_MODEL': {'type': str, 'default': ''},
+        'CASCADE_ESCALATION_THRESHOLD': {'type': int, 'min': 0, 'max': 100, 'default': 70},
+        'ENABLE_PARALLEL_TMDB_STRATEGIES': {'type': bool, 'default': False},
+        'TMDB_PARALLEL_STRATEGY_COUNT': {'type': int, 'min': 1, 'max': 5, 'default': 3},
+        'TMDB_MAX_CONCURRENT_REQUESTS': {'type': int, 'min': 1, 'max': 20, 'default': 4},
+        'TMDB_RATE_LIMIT': {'type': int, 'min': 1, 'max': 50, 'default': 20},
+        'TMDB_RATE_BURST': {'type': int, 'min': 1, 'max': 50, 'default': 10},
+        'ENABLE_TMDB_TITLE_INDEX': {'type': bool, 'default': False},
+        'GROUPING_WORKERS': {'type': int, 'min': 1, 'max': 10, 'default': 3},
+        'LOG_LEVELS': {'type': dict, 'default': {}},
+        'LOG_REPEAT_LIMIT': {'type': int, 'min': 0, 'max': 10000, 'default': 30},
+        'TRACING_ENABLED': {'type': bool, 'default': True},
+        'TRACE_MAX_TRACES': {'type': int, 'min': 1, 'max': 200, 'default': 20},
     }
 
     def __init__(self, config_file='config.json'):
@@ -2379,9 +4017,8 @@ class AppState:
         self.access_token = None
         self.token_expiry = None
 
-        # 任务管理状态
+        # 任务管理状态（最近启动的任务，仅用于统计展示；取消由各任务的 CancellationToken 负责）
         self.current_task_id = None
-        self.task_cancelled = False
 
         # QPS限制器
         self.qps_limiter = None
@@ -2419,20 +4056,8 @@ class AppState:
     def start_task(self, task_id):
         """开始新任务"""
         self.current_task_id = task_id
-        self.task_cancelled = False
         logging.info(f"🚀 开始新任务: {task_id}")
 
-    def cancel_task(self):
-        """取消当前任务"""
-        if self.current_task_id:
-            self.task_cancelled = True
-            logging.info(f"🛑 任务已取消: {self.current_task_id}")
-
-    def check_task_cancelled(self):
-        """检查任务是否被取消"""
-        if self.task_cancelled:
-            raise TaskCancelledException(f"任务已被用户取消: {self.current_task_id}")
-
     def add_log(self, message):
         """添加日志到队列"""
         self.log_queue.append({
@@ -2454,7 +4079,7 @@ class AppState:
         """获取应用程序统计信息"""
         return {
             'current_task': self.current_task_id,
-            'task_cancelled': self.task_cancelled,
+            'active_tasks': sorted(active_cancellation_tokens.keys()),
             'log_count': len(self.log_queue),
             'config_stats': self.config_manager.get_stats(),
             'cache_stats': {
@@ -2526,6 +4151,8 @@ class PerformanceMonitor:
             'cache_hits': {},  # 缓存命中统计
             'response_times': {},  # 响应时间统计
             'error_counts': {},  # 错误计数
+            'ai_usage': {},  # AI token用量统计（按模型）
+            'model_cascade': {},  # 模型级联各层的延迟和成本统计
             'start_time': time.time()
         }
         self.lock = threading.Lock()
@@ -2555,6 +4182,7 @@ class PerformanceMonitor:
 
     def record_cache_hit(self, cache_name, hit=True):
         """记录缓存命中"""
+        metrics_registry.inc('pan123_cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
         with self.lock:
             if cache_name not in self.metrics['cache_hits']:
                 self.metrics['cache_hits'][cache_name] = {
@@ -2572,6 +4200,78 @@ class PerformanceMonitor:
             total = stats['hits'] + stats['misses']
             stats['hit_rate'] = stats['hits'] / total if total > 0 else 0
 
+    def record_ai_usage(self, model, usage):
+        """
+        记录AI token用量
+
+        兼容OpenAI的 usage.prompt_tokens_details.cached_tokens
+        以及DeepSeek的 usage.prompt_cache_hit_tokens 两种缓存命中字段。
+
+        Returns:
+            int: 本次请求命中前缀缓存的token数
+        """
+        prompt_tokens = usage.get('prompt_tokens') or 0
+        completion_tokens = usage.get('completion_tokens') or 0
+        details = usage.get('prompt_tokens_details') or {}
+        cached_tokens = details.get('cached_tokens') or usage.get('prompt_cache_hit_tokens') or 0
+
+        with self.lock:
+            if model not in self.metrics['ai_usage']:
+                self.metrics['ai_usage'][model] = {
+                    'calls': 0,
+                    'prompt_tokens': 0,
+                    'cached_tokens': 0,
+                    'completion_tokens': 0,
+                    'cache_hit_rate': 0
+                }
+
+            stats = self.metrics['ai_usage'][model]
+            stats['calls'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['cached_tokens'] += cached_tokens
+            stats['completion_tokens'] += completion_tokens
+            stats['cache_hit_rate'] = stats['cached_tokens'] / stats['prompt_tokens'] if stats['prompt_tokens'] > 0 else 0
+
+        return cached_tokens
+
+    def record_cascade_tier(self, tier, model, item_count, duration, usage, escalated=0):
+        """
+        记录模型级联某一层的处理情况
+
+        Args:
+            tier (str): 层级名称（fast/strong）
+            model (str): 使用的模型
+            item_count (int): 本次处理的项目（文件）数
+            duration (float): 本次耗时（秒）
+            usage (dict): stop_ai_usage_capture 返回的token用量
+            escalated (int): 本层处理后被升级到下一层的项目数
+        """
+        with self.lock:
+            if tier not in self.metrics['model_cascade']:
+                self.metrics['model_cascade'][tier] = {
+                    'model': model,
+                    'runs': 0,
+                    'items': 0,
+                    'escalated_items': 0,
+                    'total_duration': 0,
+                    'prompt_tokens': 0,
+                    'completion_tokens': 0,
+                    'avg_latency_per_item': 0,
+                    'avg_tokens_per_item': 0
+                }
+
+            stats = self.metrics['model_cascade'][tier]
+            stats['model'] = model
+            stats['runs'] += 1
+            stats['items'] += item_count
+            stats['escalated_items'] += escalated
+            stats['total_duration'] += duration
+            stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+            stats['completion_tokens'] += usage.get('completion_tokens', 0)
+            if stats['items'] > 0:
+                stats['avg_latency_per_item'] = stats['total_duration'] / stats['items']
+                stats['avg_tokens_per_item'] = (stats['prompt_tokens'] + stats['completion_tokens']) / stats['items']
+
     def record_error(self, error_type):
         """记录错误"""
         with self.lock:
@@ -2588,7 +4288,9 @@ class PerformanceMonitor:
                 'uptime_formatted': self._format_duration(uptime),
                 'api_calls': self.metrics['api_calls'].copy(),
                 'cache_hits': self.metrics['cache_hits'].copy(),
-                'error_counts': self.metrics['error_counts'].copy()
+                'error_counts': self.metrics['error_counts'].copy(),
+                'ai_usage': {model: stats.copy() for model, stats in self.metrics['ai_usage'].items()},
+                'model_cascade': {tier: stats.copy() for tier, stats in self.metrics['model_cascade'].items()}
             }
 
     def _format_duration(self, seconds):
@@ -2606,6 +4308,8 @@ class PerformanceMonitor:
                 'cache_hits': {},
                 'response_times': {},
                 'error_counts': {},
+                'ai_usage': {},
+                'model_cascade': {},
                 'start_time': time.time()
             }
 
@@ -2614,17 +4318,391 @@ class PerformanceMonitor:
 performance_monitor = PerformanceMonitor()
 
 
-def task_management_decorator(func):
-    """任务管理装饰器"""
-    def wrapper(*args, **kwargs):
-        try:
-            # 开始新任务
-            task_id = f"{func.__name__}_{int(time.time())}"
-            start_new_task(task_id)
+class MetricsRegistry:
+    """
+    Prometheus风格的指标注册表（计数器 + 直方图）
 
-            # 清理操作相关缓存
-            operation_type = getattr(func, '_operation_type', 'unknown')
-            clear_operation_related_caches(operation_type=operation_type)
+    记录路径不加锁：每个线程只写自己的分片（threading.local），导出时再汇总所有分片；
+    线程退出后其分片并入"已退出"分片，计数始终单调递增。
+    新线程登记分片时顺带合并已退出线程的分片（Flask每个请求一个线程），分片数不随请求数增长。
+    """
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf'))
+
+    def __init__(self):
+        self.descriptions = {}  # 指标名 -> (类型, 说明)
+        self.buckets = {}  # 直方图名 -> 分桶上界
+        self.local = threading.local()
+        self.shards_lock = threading.Lock()
+        self.shards = []  # [(线程, 分片)]
+        self.retired = self._new_shard()
+
+    @staticmethod
+    def _new_shard():
+        return {'counters': {}, 'histograms': {}}
+
+    def describe(self, name, metric_type, help_text, buckets=None):
+        """登记指标类型和说明（直方图可指定分桶上界，最后一个必须是 inf）"""
+        self.descriptions[name] = (metric_type, help_text)
+        if buckets:
+            self.buckets[name] = tuple(buckets)
+
+    def _shard(self):
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = self.local.shard = self._new_shard()
+            with self.shards_lock:
+                self._retire_dead_shards()
+                self.shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_dead_shards(self):
+        """把已退出线程的分片并入已退出分片（调用方需持有 shards_lock）"""
+        alive = []
+        for thread, shard in self.shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._merge_into(self.retired, shard)
+        self.shards = alive
+
+    def inc(self, name, amount=1, **labels):
+        """计数器加 amount"""
+        key = (name, tuple(sorted(labels.items())))
+        counters = self._shard()['counters']
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """直方图记录一次观测值（秒）"""
+        key = (name, tuple(sorted(labels.items())))
+        histograms = self._shard()['histograms']
+        state = histograms.get(key)
+        bounds = self.buckets.get(name, self.DEFAULT_BUCKETS)
+        if state is None:
+            state = histograms[key] = [[0] * len(bounds), 0, 0.0]  # [各分桶计数, 总次数, 总和]
+        state[0][bisect.bisect_left(bounds, value)] += 1
+        state[1] += 1
+        state[2] += value
+
+    @staticmethod
+    def _merge_into(target, shard):
+        # list() 在C层一次性复制，避免写线程同时插入新键导致迭代出错
+        for key, value in list(shard['counters'].items()):
+            target['counters'][key] = target['counters'].get(key, 0) + value
+        for key, (bucket_counts, count, total) in list(shard['histograms'].items()):
+            merged = target['histograms'].get(key)
+            if merged is None:
+                target['histograms'][key] = [list(bucket_counts), count, total]
+            else:
+                merged[0] = [a + b for a, b in zip(merged[0], bucket_counts)]
+                merged[1] += count
+                merged[2] += total
+
+    def collect(self):
+        """汇总所有线程分片的当前值"""
+        merged = self._new_shard()
+        with self.shards_lock:
+            self._retire_dead_shards()
+            self._merge_into(merged, self.retired)
+            for _, shard in self.shards:
+                self._merge_into(merged, shard)
+        return merged
+
+    def _quantile(self, name, bucket_counts, count, quantile):
+        """按分桶线性插值估算分位数（与Prometheus histogram_quantile一致）"""
+        if count == 0:
+            return 0.0
+        bounds = self.buckets.get(name, self.DEFAULT_BUCKETS)
+        target = count * quantile
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(bounds, bucket_counts):
+            if bucket_count and cumulative + bucket_count >= target:
+                if bound == float('inf'):
+                    return lower
+                return lower + (bound - lower) * (target - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound if bound != float('inf') else lower
+        return lower
+
+    def histogram_summaries(self):
+        """各直方图的次数、平均值和 p50/p95/p99（毫秒），供JSON统计接口使用"""
+        summaries = {}
+        for (name, labels), (bucket_counts, count, total) in sorted(self.collect()['histograms'].items()):
+            label_text = ','.join(f"{key}={value}" for key, value in labels)
+            summaries.setdefault(name, {})[label_text] = {
+                'count': count,
+                'avg_ms': round(total / count * 1000, 1) if count else 0.0,
+                'p50_ms': round(self._quantile(name, bucket_counts, count, 0.50) * 1000, 1),
+                'p95_ms': round(self._quantile(name, bucket_counts, count, 0.95) * 1000, 1),
+                'p99_ms': round(self._quantile(name, bucket_counts, count, 0.99) * 1000, 1)
+            }
+        return summaries
+
+    @staticmethod
+    def _format_labels(labels, extra=None):
+        pairs = list(labels) + (list(extra) if extra else [])
+        if not pairs:
+            return ''
+        escaped = []
+        for key, value in pairs:
+            text = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{key}="{text}"')
+        return '{' + ','.join(escaped) + '}'
+
+    def render_prometheus(self):
+        """导出Prometheus文本格式"""
+        data = self.collect()
+        series = {}
+        for (name, labels), value in data['counters'].items():
+            series.setdefault(name, []).append((labels, value))
+        for (name, labels), value in data['histograms'].items():
+            series.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(series):
+            metric_type, help_text = self.descriptions.get(name, ('untyped', ''))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in sorted(series[name]):
+                if metric_type != 'histogram':
+                    lines.append(f"{name}{self._format_labels(labels)} {value}")
+                    continue
+                bucket_counts, count, total = value
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets.get(name, self.DEFAULT_BUCKETS), bucket_counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    lines.append(f"{name}_bucket{self._format_labels(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+# 全局指标注册表
+metrics_registry = MetricsRegistry()
+metrics_registry.describe('pan123_http_request_duration_seconds', 'histogram', 'Flask接口处理耗时')
+metrics_registry.describe('pan123_http_requests_total', 'counter', 'Flask接口请求数（按状态码）')
+metrics_registry.describe('pan123_upstream_request_duration_seconds', 'histogram', '上游服务（123云盘/TMDB/AI）请求耗时')
+metrics_registry.describe('pan123_upstream_retries_total', 'counter', '上游服务请求重试次数')
+metrics_registry.describe('pan123_upstream_rate_limited_total', 'counter', '上游服务返回429的次数')
+metrics_registry.describe('pan123_upstream_errors_total', 'counter', '上游服务请求失败次数')
+metrics_registry.describe('pan123_limiter_wait_seconds', 'histogram', '限速器等待耗时',
+                          buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf')))
+metrics_registry.describe('pan123_cache_requests_total', 'counter', '缓存查询次数（按命中/未命中）')
+
+
+class Trace:
+    """单次任务的追踪数据（Chrome trace-event 格式的事件列表）"""
+
+    def __init__(self, trace_id, name, max_events):
+        self.trace_id = trace_id
+        self.name = name
+        self.started_at = time.time()
+        self.finished_at = None
+        self.max_events = max_events
+        self.events = []
+        self.dropped = 0
+        self.thread_names = {}
+        self.lock = threading.Lock()
+
+    def add(self, event, thread):
+        """追加事件，超过上限时只计数不保存"""
+        with self.lock:
+            self.thread_names.setdefault(thread.ident, thread.name)
+            if len(self.events) >= self.max_events:
+                self.dropped += 1
+                return
+            self.events.append(event)
+
+
+class Tracer:
+    """
+    轻量级阶段追踪器
+
+    每个分组任务或刮削/重命名请求是一条追踪，阶段和上游调用是其中的 span。
+    当前所在的追踪和 span 保存在线程本地变量中，由 NamedExecutor 传递到工作线程，
+    未处于追踪中的线程调用 span 不会记录任何内容。
+    追踪可导出为 Chrome trace-event JSON，在 chrome://tracing 或 Perfetto 中查看关键路径。
+    """
+
+    MAX_EVENTS_PER_TRACE = 20000
+
+    def __init__(self, max_traces=20):
+        self.max_traces = max_traces
+        self.traces = OrderedDict()  # trace_id -> Trace，按开始时间排序
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.ids = itertools.count(1)
+
+    def current_context(self):
+        """当前线程的追踪上下文 (trace, span_id)，不在追踪中时为None"""
+        return getattr(self.local, 'context', None)
+
+    def set_context(self, context):
+        """绑定当前线程的追踪上下文，返回之前绑定的上下文"""
+        previous = getattr(self.local, 'context', None)
+        self.local.context = context
+        return previous
+
+    def begin_trace(self, trace_id, name, **args):
+        """开始一条追踪并绑定到当前线程，返回交给 end_trace 的句柄；未启用追踪时返回None"""
+        if not TRACING_ENABLED:
+            return None
+        trace = Trace(trace_id, name, self.MAX_EVENTS_PER_TRACE)
+        with self.lock:
+            self.traces.pop(trace_id, None)
+            self.traces[trace_id] = trace
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+        root_id = next(self.ids)
+        previous = self.set_context((trace, root_id))
+        return trace, root_id, time.time(), previous, args
+
+    def end_trace(self, handle, error=None):
+        """结束 begin_trace 开始的追踪，记录根 span 并恢复之前的上下文"""
+        if handle is None:
+            return
+        trace, root_id, start_time, previous, args = handle
+        trace.finished_at = time.time()
+        self._emit(trace, trace.name, 'task', start_time, trace.finished_at - start_time, root_id, None, args, error)
+        self.set_context(previous)
+
+    @contextmanager
+    def span(self, name, cat='stage', **args):
+        """记录一个阶段 span（不在追踪中时不做任何事）"""
+        context = self.current_context()
+        if context is None:
+            yield
+            return
+        trace, parent_id = context
+        span_id = next(self.ids)
+        self.local.context = (trace, span_id)
+        start_time = time.time()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.local.context = context
+            self._emit(trace, name, cat, start_time, time.time() - start_time, span_id, parent_id, args, error)
+
+    def record_span(self, name, cat, duration, **args):
+        """补记一个刚结束的 span（用于已在别处计时的上游请求和限速等待）"""
+        context = self.current_context()
+        if context is None:
+            return
+        trace, parent_id = context
+        self._emit(trace, name, cat, time.time() - duration, duration, next(self.ids), parent_id, args)
+
+    def flow_start(self, context):
+        """在提交线程上记录跨线程流的起点，返回流ID"""
+        if context is None:
+            return None
+        flow_id = next(self.ids)
+        thread = threading.current_thread()
+        context[0].add({'name': 'submit', 'cat': 'flow', 'ph': 's', 'id': flow_id, 'ts': int(time.time() * 1e6),
+                        'pid': os.getpid(), 'tid': thread.ident}, thread)
+        return flow_id
+
+    def flow_end(self, flow_id):
+        """在工作线程上记录跨线程流的终点（绑定到所在的 span）"""
+        context = self.current_context()
+        if flow_id is None or context is None:
+            return
+        thread = threading.current_thread()
+        context[0].add({'name': 'submit', 'cat': 'flow', 'ph': 'f', 'bp': 'e', 'id': flow_id,
+                        'ts': int(time.time() * 1e6), 'pid': os.getpid(), 'tid': thread.ident}, thread)
+
+    def _emit(self, trace, name, cat, start_time, duration, span_id, parent_id, args, error=None):
+        thread = threading.current_thread()
+        event_args = dict(args, span_id=span_id, parent_id=parent_id)
+        if error is not None:
+            event_args['error'] = str(error)
+        trace.add({'name': name, 'cat': cat, 'ph': 'X', 'ts': int(start_time * 1e6),
+                   'dur': max(1, int(duration * 1e6)), 'pid': os.getpid(), 'tid': thread.ident,
+                   'args': event_args}, thread)
+
+    def list_traces(self):
+        """最近追踪的摘要（新的在前）"""
+        with self.lock:
+            traces = list(self.traces.values())
+        now = time.time()
+        return [{
+            'trace_id': trace.trace_id,
+            'name': trace.name,
+            'started_at': trace.started_at,
+            'finished': trace.finished_at is not None,
+            'duration_seconds': round((trace.finished_at or now) - trace.started_at, 3),
+            'event_count': len(trace.events),
+            'dropped_events': trace.dropped
+        } for trace in reversed(traces)]
+
+    def export_chrome(self, trace_id):
+        """导出为 Chrome trace-event JSON 对象，追踪不存在时返回None"""
+        with self.lock:
+            trace = self.traces.get(trace_id)
+        if trace is None:
+            return None
+        with trace.lock:
+            events = list(trace.events)
+            thread_names = dict(trace.thread_names)
+            dropped = trace.dropped
+        pid = os.getpid()
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': f"pan123-scraper: {trace.name}"}}]
+        metadata.extend({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}}
+                        for tid, thread_name in thread_names.items())
+        return {
+            'traceEvents': metadata + events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'trace_id': trace.trace_id,
+                'name': trace.name,
+                'started_at': datetime.datetime.fromtimestamp(trace.started_at).isoformat(),
+                'finished': trace.finished_at is not None,
+                'dropped_events': dropped
+            }
+        }
+
+
+def traced(name=None, cat='stage'):
+    """把函数调用记录为当前追踪中的一个 span"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 全局追踪器
+tracer = Tracer(max_traces=max(1, TRACE_MAX_TRACES))
+
+
+def upstream_retry_sleep(upstream, seconds):
+    """记录一次上游重试并等待（可被任务取消打断）"""
+    metrics_registry.inc('pan123_upstream_retries_total', upstream=upstream)
+    with tracer.span(f"{upstream} retry backoff", 'retry', delay_seconds=seconds):
+        cancellable_sleep(seconds)
+
+
+def task_management_decorator(func):
+    """任务管理装饰器"""
+    def wrapper(*args, **kwargs):
+        try:
+            # 开始新任务
+            task_id = f"{func.__name__}_{int(time.time())}"
+            start_new_task(task_id)
+
+            # 清理操作相关缓存
+            operation_type = getattr(func, '_operation_type', 'unknown')
+            clear_operation_related_caches(operation_type=operation_type)
 
             # 执行函数
             result = func(*args, **kwargs)
@@ -2663,6 +4741,36 @@ def performance_monitor_decorator(endpoint_name=None):
     return decorator
 
 
+def pan123_request(method, url, **kwargs):
+    """
+    发送123云盘API请求，并记录延迟、429和错误指标
+
+    在返回响应之前记录，调用方随后 raise_for_status 或不校验响应时指标也完整；
+    连接失败等异常同样计入错误并继续抛出。
+    """
+    endpoint = urlparse(url).path
+    start_time = time.time()
+    try:
+        response = requests.request(method, url, **kwargs)
+    except requests.RequestException:
+        duration = time.time() - start_time
+        metrics_registry.observe('pan123_upstream_request_duration_seconds', duration,
+                                 upstream='123pan', endpoint=endpoint)
+        metrics_registry.inc('pan123_upstream_errors_total', upstream='123pan')
+        tracer.record_span(f"123pan {endpoint}", '123pan', duration, status='error')
+        raise
+
+    duration = time.time() - start_time
+    metrics_registry.observe('pan123_upstream_request_duration_seconds', duration,
+                             upstream='123pan', endpoint=endpoint)
+    tracer.record_span(f"123pan {endpoint}", '123pan', duration, status=response.status_code)
+    if response.status_code == 429:
+        metrics_registry.inc('pan123_upstream_rate_limited_total', upstream='123pan')
+    elif response.status_code != 200:
+        metrics_registry.inc('pan123_upstream_errors_total', upstream='123pan')
+    return response
+
+
 def validate_api_response(response):
     """
     验证123云盘API响应状态
@@ -2705,18 +4813,115 @@ def validate_api_response(response):
 # 日志系统初始化
 # ================================
 
-class QueueHandler(logging.Handler):
-    """自定义日志处理器，将日志消息添加到队列中供Web界面显示（Windows兼容性增强）"""
+class WebLogHandler(logging.Handler):
+    """自定义日志处理器，将日志消息添加到环形缓冲区供Web界面显示（Windows兼容性增强）"""
     def emit(self, record):
         try:
             log_entry = self.format(record)
             # 使用安全编码处理，避免Windows系统中的字符编码问题
             safe_log_entry = safe_log_message(log_entry)
-            log_queue.append(safe_log_entry)
+            log_ring.append(safe_log_entry, record.levelno)
         except Exception as e:
             # 如果日志处理失败，添加一个错误消息而不是崩溃
             error_msg = f"[日志处理错误: {str(e)}]"
-            log_queue.append(error_msg)
+            log_ring.append(error_msg, logging.ERROR)
+
+
+class AsyncLogQueueHandler(QueueHandler):
+    """
+    非阻塞的日志入队处理器
+
+    调用线程只把日志记录放进有界队列，格式化、编码处理、写文件和写Web缓冲区都在监听线程完成。
+    队列满时丢弃记录并计数，而不是阻塞业务线程。
+    """
+
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+        self._exception_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        """
+        在调用线程上固化日志内容：合并 %s 参数、渲染异常堆栈
+
+        参数可能是之后会被修改的可变对象，异常信息会让整个调用栈在队列中保持存活，
+        因此与标准库 QueueHandler.prepare 一样在入队前处理；时间戳、级别等格式仍由监听线程的处理器完成。
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RepeatedMessageFilter(logging.Filter):
+    """
+    重复日志限流过滤器
+
+    以日志器名和代码行定位"同一条"日志，INFO及以下级别每个时间窗口内最多放行 limit 条，
+    其余丢弃；窗口结束后的第一条会附带被抑制的条数。WARNING及以上级别不受限制。
+    带 extra={'repeat_limit_exempt': True} 的日志（如任务进度）不受限制。
+    """
+
+    def __init__(self, limit: int = 30, window_seconds: float = 60):
+        super().__init__()
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.lock = threading.Lock()
+        self.windows = {}  # (日志器名, 文件, 行号) -> [窗口开始时间, 已放行条数, 已抑制条数]
+        self.suppressed_total = 0
+
+    def filter(self, record):
+        if self.limit <= 0 or record.levelno >= logging.WARNING or getattr(record, 'repeat_limit_exempt', False):
+            return True
+
+        key = (record.name, record.pathname, record.lineno)
+        with self.lock:
+            state = self.windows.get(key)
+            if state is None or record.created - state[0] >= self.window_seconds:
+                suppressed = state[2] if state else 0
+                self.windows[key] = [record.created, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} （前{self.window_seconds:.0f}秒内同类日志已抑制 {suppressed} 条）"
+                return True
+            if state[1] < self.limit:
+                state[1] += 1
+                return True
+            state[2] += 1
+            self.suppressed_total += 1
+            return False
+
+
+def apply_log_settings():
+    """应用子系统日志级别和重复日志限流配置（配置加载和重载时调用）"""
+    for name, level in (LOG_LEVELS or {}).items():
+        logger_name = name if '.' in name or name == 'werkzeug' else f"pan123.{name}"
+        try:
+            logging.getLogger(logger_name).setLevel(str(level).upper())
+        except (ValueError, TypeError):
+            logging.warning(f"⚠️ 无效的日志级别配置: {name}={level}")
+    if repeated_log_filter:
+        repeated_log_filter.limit = LOG_REPEAT_LIMIT
+
+
+def get_logging_stats():
+    """获取日志管道统计信息"""
+    return {
+        'queue_size': queue_handler.queue.qsize() if queue_handler else 0,
+        'dropped': queue_handler.dropped if queue_handler else 0,
+        'suppressed_repeats': repeated_log_filter.suppressed_total if repeated_log_filter else 0,
+        'levels': {name: logging.getLevelName(logging.getLogger(name).getEffectiveLevel())
+                   for name in ('pan123.cloud', 'pan123.tmdb', 'pan123.ai', 'pan123.scrape')}
+    }
 
 
 def initialize_logging_system():
@@ -2726,6 +4931,7 @@ def initialize_logging_system():
     配置文件日志、控制台日志和Web界面日志队列
     """
     global root_logger, file_handler, console_handler, queue_handler
+    global web_log_handler, log_listener, repeated_log_filter
 
     # 配置根日志器
     root_logger = logging.getLogger()
@@ -2735,6 +4941,10 @@ def initialize_logging_system():
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
 
+    # 重复初始化时先停止旧的监听线程
+    if log_listener:
+        log_listener.stop()
+
     # 添加文件处理器（Windows兼容性：明确指定UTF-8编码）
     file_handler = RotatingFileHandler(
         'rename_log.log',
@@ -2743,7 +4953,6 @@ def initialize_logging_system():
         encoding='utf-8'  # 明确指定UTF-8编码，解决Windows中文字符问题
     )
     file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    root_logger.addHandler(file_handler)
 
     # 添加控制台处理器（Windows兼容性：设置错误处理）
     console_handler = logging.StreamHandler()
@@ -2754,15 +4963,24 @@ def initialize_logging_system():
             console_handler.stream.reconfigure(encoding='utf-8', errors='replace')
         except Exception:
             pass  # 如果重配置失败，继续使用默认设置
-    root_logger.addHandler(console_handler)
 
-    # 添加自定义队列处理器
-    queue_handler = QueueHandler()
-    queue_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    # 添加Web界面日志处理器
+    web_log_handler = WebLogHandler()
+    web_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    # 异步日志管道：根日志器只挂一个非阻塞的入队处理器，文件/控制台/Web输出由监听线程完成
+    # （Flask 自己的日志会传播到 root_logger，无需单独添加处理器）
+    queue_handler = AsyncLogQueueHandler(queue.Queue(maxsize=10000))
+    repeated_log_filter = RepeatedMessageFilter(limit=LOG_REPEAT_LIMIT)
+    queue_handler.addFilter(repeated_log_filter)
     root_logger.addHandler(queue_handler)
 
-    # 确保 Flask 自己的日志也通过 root_logger 处理
-    app.logger.addHandler(queue_handler)
+    log_listener = QueueListener(queue_handler.queue, file_handler, console_handler, web_log_handler,
+                                 respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)  # 退出时把队列中剩余的日志写完
+
+    apply_log_settings()
 
     # 禁用 Werkzeug 的访问日志
     logging.getLogger('werkzeug').setLevel(logging.ERROR)
@@ -2771,26 +4989,351 @@ def initialize_logging_system():
 # QPS限制器类和初始化
 # ================================
 
+class LimiterInstrumentation:
+    """
+    限速器使用情况统计
+
+    记录发放的许可数、每个调用方的等待时间、当前排队线程数、额外固定延迟，
+    以及最近一分钟的实际速率，用于和配置速率对比判断瓶颈是否在限速器。
+    """
+
+    RATE_WINDOW_SECONDS = 60
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.granted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.extra_delay_total = 0.0
+        self.grant_times = deque()
+        self.callers = {}  # 调用方函数名 -> [次数, 总等待时间]
+
+    def enter(self):
+        """线程开始等待许可"""
+        with self.lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def leave(self, wait_seconds, caller, granted=True):
+        """线程结束等待（granted为False表示等待被取消）"""
+        now = time.time()
+        with self.lock:
+            self.waiting -= 1
+            if not granted:
+                return
+            self.granted += 1
+            self.total_wait += wait_seconds
+            self.max_wait = max(self.max_wait, wait_seconds)
+            self.grant_times.append(now)
+            while self.grant_times and self.grant_times[0] < now - self.RATE_WINDOW_SECONDS:
+                self.grant_times.popleft()
+            caller_stats = self.callers.setdefault(caller, [0, 0.0])
+            caller_stats[0] += 1
+            caller_stats[1] += wait_seconds
+        metrics_registry.observe('pan123_limiter_wait_seconds', wait_seconds, limiter=self.name)
+        if wait_seconds >= 0.001:
+            tracer.record_span(f"limiter {self.name}", 'limiter', wait_seconds, caller=caller)
+
+    def add_extra_delay(self, seconds):
+        """记录限速之外的固定延迟"""
+        with self.lock:
+            self.extra_delay_total += seconds
+
+    def snapshot(self, configured_rate):
+        """获取统计快照：实际速率按最近一分钟（不足一分钟按运行时长）计算"""
+        now = time.time()
+        with self.lock:
+            while self.grant_times and self.grant_times[0] < now - self.RATE_WINDOW_SECONDS:
+                self.grant_times.popleft()
+            window = min(self.RATE_WINDOW_SECONDS, max(now - self.started_at, 1.0))
+            achieved_rate = len(self.grant_times) / window
+            return {
+                'configured_rate': round(configured_rate, 2),
+                'achieved_rate': round(achieved_rate, 2),
+                'utilization': round(achieved_rate / configured_rate, 3) if configured_rate > 0 else 0,
+                'granted': self.granted,
+                'avg_wait_ms': round(self.total_wait / self.granted * 1000, 1) if self.granted else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 1),
+                'total_wait_seconds': round(self.total_wait, 3),
+                'waiting': self.waiting,
+                'max_waiting': self.max_waiting,
+                'extra_delay_seconds': round(self.extra_delay_total, 3),
+                'wait_by_caller': {
+                    caller: {
+                        'count': count,
+                        'total_wait_seconds': round(total_wait, 3),
+                        'avg_wait_ms': round(total_wait / count * 1000, 1) if count else 0.0
+                    }
+                    for caller, (count, total_wait) in sorted(self.callers.items(), key=lambda item: -item[1][1])
+                }
+            }
+
+
 class QPSLimiter:
     """
     QPS（每秒查询数）限制器
 
     用于控制API请求频率，避免超过服务端限制
     """
-    def __init__(self, qps_limit):
+    def __init__(self, qps_limit, name='qps'):
+        self.name = name
         self.qps_limit = float(qps_limit)
         self.interval = 1.0 / self.qps_limit
         self.last_request_time = 0
         self.lock = threading.Lock()
+        self.instrumentation = LimiterInstrumentation(name)
 
     def acquire(self):
         """获取请求许可，如果需要会阻塞等待"""
+        caller = sys._getframe(1).f_code.co_name
+        start_time = time.time()
+        granted = False
+        self.instrumentation.enter()
+        try:
+            with self.lock:
+                current_time = time.time()
+                elapsed_time = current_time - self.last_request_time
+                if elapsed_time < self.interval:
+                    cancellable_sleep(self.interval - elapsed_time)
+                self.last_request_time = time.time()
+            granted = True
+        finally:
+            self.instrumentation.leave(time.time() - start_time, caller, granted)
+
+    def extra_delay(self, seconds):
+        """限速之外的固定延迟（计入统计，便于判断是否拖慢了扫描）"""
+        self.instrumentation.add_extra_delay(seconds)
+        cancellable_sleep(seconds)
+
+    def stats(self):
+        """获取限速器统计信息"""
+        return self.instrumentation.snapshot(self.qps_limit)
+
+
+class TokenBucketLimiter:
+    """
+    令牌桶限速器
+
+    与 QPSLimiter 不同，允许短时突发（桶容量），并且在锁外等待，不会让等待线程互相串行阻塞。
+    """
+    def __init__(self, rate, capacity=None, name='token_bucket'):
+        self.name = name
+        self.instrumentation = LimiterInstrumentation(name)
+        self.lock = threading.Lock()
+        self.tokens = 0.0
+        self.rate = 0.0
+        self.total_acquired = 0
+        self.total_wait_time = 0.0
+        self.paused_until = 0.0
+        self.last_refill = time.time()
+        self.configure(rate, capacity)
+        # 只在创建时装满桶；之后重新配置保留当前余额
+        self.tokens = self.capacity
+
+    def configure(self, rate, capacity=None):
+        """
+        更新速率（每秒令牌数）和桶容量
+
+        先按旧速率结算截至现在已累积的令牌，再按新容量截断，
+        不会因为余额为0（例如限流退避期间）而重新装满。
+        """
         with self.lock:
-            current_time = time.time()
-            elapsed_time = current_time - self.last_request_time
-            if elapsed_time < self.interval:
-                time.sleep(self.interval - elapsed_time)
-            self.last_request_time = time.time()
+            now = time.time()
+            if now > self.last_refill:
+                self.tokens += (now - self.last_refill) * self.rate
+                self.last_refill = now
+            self.rate = max(float(rate), 0.1)
+            self.capacity = max(float(capacity or rate), 1.0)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def pause(self, seconds):
+        """暂停发放令牌（用于服务端限流后的整体退避），暂停结束后才重新开始累积令牌"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.time() + seconds)
+            self.tokens = 0.0
+            self.last_refill = self.paused_until
+
+    def acquire(self):
+        """获取一个令牌，如果需要会阻塞等待"""
+        caller = sys._getframe(1).f_code.co_name
+        start_time = time.time()
+        granted = False
+        self.instrumentation.enter()
+        try:
+            while True:
+                with self.lock:
+                    now = time.time()
+                    if now < self.paused_until:
+                        wait_time = self.paused_until - now
+                    else:
+                        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.last_refill) * self.rate)
+                        self.last_refill = max(now, self.last_refill)
+                        if self.tokens >= 1:
+                            self.tokens -= 1
+                            self.total_acquired += 1
+                            self.total_wait_time += now - start_time
+                            granted = True
+                            return
+                        wait_time = (1 - self.tokens) / self.rate
+                cancellable_sleep(wait_time)
+        finally:
+            self.instrumentation.leave(time.time() - start_time, caller, granted)
+
+    def stats(self):
+        """获取限速器统计信息"""
+        with self.lock:
+            stats = {
+                'rate': self.rate,
+                'capacity': self.capacity,
+                'available_tokens': round(self.tokens, 2),
+                'total_acquired': self.total_acquired,
+                'total_wait_time': round(self.total_wait_time, 3),
+                'paused': time.time() < self.paused_until
+            }
+        stats.update(self.instrumentation.snapshot(self.rate))
+        return stats
+
+
+# 共享线程池的线程归属标记：用于识别同一线程池内的嵌套提交
+_executor_context = threading.local()
+
+
+class NamedExecutor:
+    """
+    进程级共享的有界命名线程池
+
+    每类资源（123云盘I/O、AI、TMDB、CPU）只有一个线程池，所有并发扇出点都向其提交任务，
+    总线程数不会随嵌套调用和并发用户数成倍增长。
+    在本线程池的工作线程内再次提交任务时直接在当前线程执行（caller-runs），避免父任务占满线程后等待子任务导致死锁。
+    """
+
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self.lock = threading.Lock()
+        self.counters = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'inline': 0,
+            'queued': 0,
+            'active': 0,
+            'max_queue_depth': 0,
+            'total_wait_time': 0.0,
+            'total_run_time': 0.0
+        }
+
+    def submit(self, fn, *args, **kwargs):
+        """提交任务，返回 concurrent.futures.Future"""
+        token = get_current_cancellation_token()
+        if getattr(_executor_context, 'pool_name', None) == self.name:
+            # 同一线程池内的嵌套提交：在当前线程直接执行
+            future = Future()
+            with self.lock:
+                self.counters['inline'] += 1
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        submit_time = time.time()
+        with self.lock:
+            self.counters['submitted'] += 1
+            self.counters['queued'] += 1
+            self.counters['max_queue_depth'] = max(self.counters['max_queue_depth'], self.counters['queued'])
+        trace_context = tracer.current_context()
+        flow_id = tracer.flow_start(trace_context)
+        span_name = f"{self.name}:{getattr(fn, '__name__', 'task')}"
+
+        def run():
+            _executor_context.pool_name = self.name
+            # 把提交方的取消令牌和追踪上下文传递到工作线程
+            previous_token = set_current_cancellation_token(token)
+            previous_trace_context = tracer.set_context(trace_context)
+            start_time = time.time()
+            with self.lock:
+                self.counters['queued'] -= 1
+                self.counters['active'] += 1
+                self.counters['total_wait_time'] += start_time - submit_time
+            failed = False
+            try:
+                if token is not None:
+                    token.raise_if_cancelled()
+                with tracer.span(span_name, 'executor', queue_wait_ms=round((start_time - submit_time) * 1000, 1)):
+                    tracer.flow_end(flow_id)
+                    return fn(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                set_current_cancellation_token(previous_token)
+                tracer.set_context(previous_trace_context)
+                with self.lock:
+                    self.counters['active'] -= 1
+                    self.counters['completed'] += 1
+                    self.counters['failed'] += 1 if failed else 0
+                    self.counters['total_run_time'] += time.time() - start_time
+
+        future = self.executor.submit(run)
+        # 任务在开始执行前被取消时，修正排队计数
+        future.add_done_callback(lambda f: self._on_cancelled() if f.cancelled() else None)
+        return future
+
+    def _on_cancelled(self):
+        """记录被取消的排队任务"""
+        with self.lock:
+            self.counters['queued'] -= 1
+
+    def resize(self, max_workers):
+        """调整线程数：新任务提交到新线程池，旧线程池执行完已提交的任务后自动退出"""
+        if max_workers == self.max_workers:
+            return
+        old_executor = self.executor
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{self.name}-pool")
+        self.max_workers = max_workers
+        old_executor.shutdown(wait=False)
+        logging.info(f"🔧 共享线程池 {self.name} 调整为 {max_workers} 个线程")
+
+    def stats(self):
+        """获取线程池统计信息（队列深度、活跃线程数、平均等待/执行时间）"""
+        with self.lock:
+            counters = self.counters.copy()
+        finished = counters['completed']
+        return dict(
+            counters,
+            max_workers=self.max_workers,
+            avg_wait_time=counters['total_wait_time'] / finished if finished > 0 else 0,
+            avg_run_time=counters['total_run_time'] / finished if finished > 0 else 0
+        )
+
+
+def _shared_executor_sizes():
+    """各资源类线程池的线程数（随配置变化）"""
+    return {
+        'cloud_io': max(1, MAX_WORKERS),  # 123云盘API（目录遍历等）
+        'ai': max(1, MAX_WORKERS),        # AI提取批次
+        'tmdb': max(1, MAX_WORKERS),      # TMDB搜索（实际请求并发还受 tmdb_request_semaphore 限制）
+        # 单个TMDB请求（策略并发扇出）：与逐文件处理的 tmdb 线程池分开，避免嵌套提交退化为在当前线程串行执行
+        'tmdb_request': max(1, TMDB_MAX_CONCURRENT_REQUESTS),
+        'cpu': max(1, os.cpu_count() or 1)
+    }
+
+
+# 全局共享线程池：按资源类划分
+shared_executors = {name: NamedExecutor(name, size) for name, size in _shared_executor_sizes().items()}
+
+
+def resize_shared_executors():
+    """按当前配置调整共享线程池大小"""
+    for name, size in _shared_executor_sizes().items():
+        shared_executors[name].resize(size)
+
 
 
 # 创建全局应用程序状态实例（在QPSLimiter定义之后）
@@ -2830,11 +5373,29 @@ def initialize_qps_limiters():
     """
     global qps_limiter, v2_list_limiter, rename_limiter, move_limiter, delete_limiter
 
-    qps_limiter = QPSLimiter(qps_limit=QPS_LIMIT)  # 通用限制器，使用配置值
-    v2_list_limiter = QPSLimiter(qps_limit=5)     # api/v2/file/list: 4 QPS (平衡性能和稳定性)
-    rename_limiter = QPSLimiter(qps_limit=1)       # api/v1/file/rename: 保守使用1 QPS
-    move_limiter = QPSLimiter(qps_limit=1)        # api/v1/file/move: 1 QPS (提高性能)
-    delete_limiter = QPSLimiter(qps_limit=1)       # api/v1/file/delete: 1 QPS (提高性能)
+    qps_limiter = QPSLimiter(qps_limit=QPS_LIMIT, name='general')  # 通用限制器，使用配置值
+    v2_list_limiter = QPSLimiter(qps_limit=5, name='v2_list')     # api/v2/file/list: 4 QPS (平衡性能和稳定性)
+    rename_limiter = QPSLimiter(qps_limit=1, name='rename')       # api/v1/file/rename: 保守使用1 QPS
+    move_limiter = QPSLimiter(qps_limit=1, name='move')        # api/v1/file/move: 1 QPS (提高性能)
+    delete_limiter = QPSLimiter(qps_limit=1, name='delete')       # api/v1/file/delete: 1 QPS (提高性能)
+
+
+def get_limiter_stats():
+    """
+    各限速器的预算使用情况
+
+    utilization 接近1说明请求被限速器卡住（可考虑调高对应限额）；
+    utilization 低而上游延迟高说明瓶颈在上游服务，调高限额无济于事。
+    """
+    limiters = {
+        'general (QPS_LIMIT)': qps_limiter,
+        'api/v2/file/list': v2_list_limiter,
+        'api/v1/file/rename': rename_limiter,
+        'api/v1/file/move': move_limiter,
+        'api/v1/file/delete': delete_limiter,
+        'tmdb': tmdb_client.rate_limiter
+    }
+    return {name: limiter.stats() for name, limiter in limiters.items() if limiter is not None}
 
 
 def get_access_token_from_api(client_id: str, client_secret: str):
@@ -2855,7 +5416,7 @@ def get_access_token_from_api(client_id: str, client_secret: str):
         logging.info(f"🔑 尝试获取访问令牌，URL: {url}")
         logging.info(f"🔑 客户端ID: {client_id[:10]}...")
         # logging.info(f"🔑 请求数据: {data}")
-        r = requests.post(url, json=data, headers=API_HEADERS)
+        r = pan123_request('POST', url, json=data, headers=API_HEADERS)
         logging.info(f"🔑 HTTP状态码: {r.status_code}")
         # logging.info(f"🔑 响应内容: {r.text}")
 
@@ -3016,7 +5577,7 @@ def create_folder_in_cloud(name: str, parent_id: int):
         try:
             logging.info(f"创建文件夹请求 (尝试 {attempt + 1}/{max_retries}): {data}")
             # 使用POST方法和JSON格式发送请求
-            r = requests.post(url, json=data, headers=API_HEADERS)
+            r = pan123_request('POST', url, json=data, headers=API_HEADERS)
             logging.info(f"HTTP响应状态码: {r.status_code}")
             logging.info(f"HTTP响应内容: {r.text}")
 
@@ -3040,13 +5601,13 @@ def create_folder_in_cloud(name: str, parent_id: int):
 
             # 其他访问令牌错误，继续重试逻辑
             if attempt < max_retries - 1:
-                time.sleep(CLOUD_API_RETRY_DELAY)
+                upstream_retry_sleep('123pan', CLOUD_API_RETRY_DELAY)
             else:
                 raise
         except requests.exceptions.RequestException as e:
             logging.error(f"请求失败 (尝试 {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(CLOUD_API_RETRY_DELAY)
+                upstream_retry_sleep('123pan', CLOUD_API_RETRY_DELAY)
             else:
                 raise  # Re-raise the last exception if all retries fail
 
@@ -3082,7 +5643,7 @@ def get_file_list_from_cloud(parent_file_id: int, limit: int, search_data=None,
     max_retries = CLOUD_API_MAX_RETRIES
     for attempt in range(max_retries):
         try:
-            r = requests.get(url, data=data, headers=API_HEADERS)
+            r = pan123_request('GET', url, data=data, headers=API_HEADERS)
             r.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
             result = validate_api_response(r)
 
@@ -3100,7 +5661,7 @@ def get_file_list_from_cloud(parent_file_id: int, limit: int, search_data=None,
         except requests.exceptions.RequestException as e:
             print(f"请求失败 (尝试 {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(CLOUD_API_RETRY_DELAY)
+                upstream_retry_sleep('123pan', CLOUD_API_RETRY_DELAY)
             else:
                 raise  # Re-raise the last exception if all retries fail
 
@@ -3422,9 +5983,8 @@ def _process_subfolders_sequential(subfolders, file_list, current_path, depth):
             if depth == 0 and len(subfolders) > 10 and (i + 1) % 5 == 0:
                 logging.info(f"📁 处理进度: {i + 1}/{len(subfolders)} 个子文件夹")
 
-            # 添加额外延迟以进一步减少API调用频率
-            import time
-            time.sleep(0.05)  # 50ms额外延迟
+            # 添加额外延迟以进一步减少API调用频率（计入列表接口限速器统计）
+            v2_list_limiter.extra_delay(0.05)  # 50ms额外延迟
 
             # 构建子文件夹的路径（避免重复API调用）
             subfolder_path = os.path.join(current_path, file_item['filename']) if current_path else file_item['filename']
@@ -3451,8 +6011,6 @@ def _process_subfolders_concurrent(subfolders, file_list, current_path, depth):
         subfolder_path = os.path.join(current_path, file_item['filename']) if current_path else file_item['filename']
         folder_path_cache[file_item['fileId']] = subfolder_path
 
-    # 使用适度的并发线程数以平衡性能和稳定性
-    max_workers = min(5, len(subfolders))  # 提高到5个线程
     completed_count = 0
 
     def process_single_subfolder(file_item):
@@ -3477,35 +6035,36 @@ def _process_subfolders_concurrent(subfolders, file_list, current_path, depth):
             logging.error(f"并发处理子文件夹 {file_item['fileId']} 失败: {e}")
             return []
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 分批提交任务以减少并发压力
-        batch_size = 5
-        for i in range(0, len(subfolders), batch_size):
-            batch = subfolders[i:i + batch_size]
-            future_to_folder = {executor.submit(process_single_subfolder, folder): folder for folder in batch}
+    # 提交到共享的123云盘I/O线程池，分批提交（每批最多5个）以减少并发压力
+    executor = shared_executors['cloud_io']
+    batch_size = 5
+    for i in range(0, len(subfolders), batch_size):
+        batch = subfolders[i:i + batch_size]
+        future_to_folder = {executor.submit(process_single_subfolder, folder): folder for folder in batch}
 
-            # 收集当前批次的结果
-            for future in as_completed(future_to_folder):
-                folder_item = future_to_folder[future]
-                try:
-                    subfolder_files = future.result()
-                    file_list.extend(subfolder_files)
-                    completed_count += 1
+        # 收集当前批次的结果
+        for future in as_completed(future_to_folder):
+            folder_item = future_to_folder[future]
+            try:
+                subfolder_files = future.result()
+                file_list.extend(subfolder_files)
+                completed_count += 1
 
-                    # 输出进度
-                    if completed_count % 5 == 0 or completed_count == len(subfolders):
-                        logging.info(f"📁 并发处理进度: {completed_count}/{len(subfolders)} 个子文件夹完成")
+                # 输出进度
+                if completed_count % 5 == 0 or completed_count == len(subfolders):
+                    logging.info(f"📁 并发处理进度: {completed_count}/{len(subfolders)} 个子文件夹完成")
 
-                except Exception as e:
-                    if "任务已被用户取消" in str(e):
-                        logging.info("🛑 并发处理被用户取消")
-                        raise
-                    logging.error(f"处理子文件夹 {folder_item['filename']} 时发生错误: {e}")
+            except Exception as e:
+                if "任务已被用户取消" in str(e):
+                    logging.info("🛑 并发处理被用户取消")
+                    raise
+                logging.error(f"处理子文件夹 {folder_item['filename']} 时发生错误: {e}")
 
-            # QPS控制已经在QPSLimiter中实现，无需批次间延迟
+        # QPS控制已经在QPSLimiter中实现，无需批次间延迟
 
 
 @ensure_valid_access_token
+@traced('rename')
 def rename(rename_dict: dict, use_batch_qps=False):
     """
     重命名文件
@@ -3514,10 +6073,8 @@ def rename(rename_dict: dict, use_batch_qps=False):
     """
 
     rename_limiter.acquire()
-    current_time = datetime.datetime.now()
-    formatted_time = current_time.strftime("%H:%M:%S")
-    print("rename:",formatted_time)
-    logging.info(f"开始重命名操作，重命名字典: {rename_dict}，使用批量QPS: {use_batch_qps}")
+    cloud_logger.info("开始重命名操作: %s 个文件，使用批量QPS: %s", len(rename_dict), use_batch_qps)
+    cloud_logger.debug("重命名字典: %s", rename_dict)
 
     url = BASE_API_URL + "/api/v1/file/rename"
     rename_list = []
@@ -3525,33 +6082,34 @@ def rename(rename_dict: dict, use_batch_qps=False):
         rename_list.append(f"{i}|{rename_dict[i]}")
     data = {"renameList": rename_list}
 
-    logging.info(f"重命名API URL: {url}")
-    logging.info(f"重命名数据: {data}")
-    logging.info(f"请求头: {API_HEADERS}")
+    # 请求详情只在DEBUG级别输出（请求头包含访问令牌）
+    cloud_logger.debug("重命名API URL: %s", url)
+    cloud_logger.debug("重命名数据: %s", data)
+    cloud_logger.debug("请求头: %s", API_HEADERS)
 
     max_retries = CLOUD_API_MAX_RETRIES
     for attempt in range(max_retries):
         try:
-            logging.info(f"发送重命名请求 (尝试 {attempt + 1}/{max_retries})")
+            cloud_logger.debug("发送重命名请求 (尝试 %s/%s)", attempt + 1, max_retries)
             # 使用JSON格式发送请求，符合API要求
-            r = requests.post(url, json=data, headers=API_HEADERS)
-            logging.info(f"HTTP响应状态码: {r.status_code}")
-            logging.info(f"HTTP响应内容: {r.text}")
+            r = pan123_request('POST', url, json=data, headers=API_HEADERS)
+            cloud_logger.debug("HTTP响应状态码: %s", r.status_code)
+            cloud_logger.debug("HTTP响应内容: %s", r.text)
 
             r.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
             result = validate_api_response(r)
-            logging.info(f"重命名API返回结果: {result}")
+            cloud_logger.debug("重命名API返回结果: %s", result)
             return result
         except (AccessTokenError, TokenLimitExceededError) as e:
-            logging.error(f"访问令牌错误 (尝试 {attempt + 1}/{max_retries}): {e}")
+            cloud_logger.error("访问令牌错误 (尝试 %s/%s): %s", attempt + 1, max_retries, e)
             if attempt < max_retries - 1:
-                time.sleep(CLOUD_API_RETRY_DELAY)
+                upstream_retry_sleep('123pan', CLOUD_API_RETRY_DELAY)
             else:
                 raise
         except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+            cloud_logger.error("请求失败 (尝试 %s/%s): %s", attempt + 1, max_retries, e)
             if attempt < max_retries - 1:
-                time.sleep(CLOUD_API_RETRY_DELAY)
+                upstream_retry_sleep('123pan', CLOUD_API_RETRY_DELAY)
             else:
                 raise  # Re-raise the last exception if all retries fail
 
@@ -3561,9 +6119,8 @@ def detail(file_id):
     # 使用通用QPS限制器控制detail API调用频率
     qps_limiter.acquire()
 
-    # 添加额外延迟以进一步减少API调用频率
-    import time
-    time.sleep(0.1)  # 100ms额外延迟
+    # 添加额外延迟以进一步减少API调用频率（计入限速器统计）
+    qps_limiter.extra_delay(0.1)  # 100ms额外延迟
 
     # current_time = datetime.datetime.now()
     # formatted_time = current_time.strftime("%H:%M:%S")
@@ -3573,7 +6130,7 @@ def detail(file_id):
     for attempt in range(max_retries):
         try:
             data = {"fileID": file_id}
-            r = requests.get(url, data=data, headers=API_HEADERS)
+            r = pan123_request('GET', url, data=data, headers=API_HEADERS)
             data = validate_api_response(r)
             if data["trashed"] == 1:
                 data["trashed"] = True
@@ -3587,7 +6144,7 @@ def detail(file_id):
         except requests.exceptions.RequestException as e:
             print(f"请求失败 (尝试 {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(CLOUD_API_RETRY_DELAY)
+                upstream_retry_sleep('123pan', CLOUD_API_RETRY_DELAY)
             else:
                 raise  # Re-raise the last exception if all retries fail
 
@@ -3603,7 +6160,7 @@ def trash(file_id_list: list):
     for attempt in range(max_retries):
         try:
             # 使用JSON格式发送请求，符合API要求
-            r = requests.post(url, json=data, headers=API_HEADERS)
+            r = pan123_request('POST', url, json=data, headers=API_HEADERS)
             logging.info(f"deleteAPI HTTP响应状态码: {r.status_code}")
             logging.info(f"deleteAPI HTTP响应内容: {r.text}")
             r.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
@@ -3621,7 +6178,7 @@ def trash(file_id_list: list):
         except requests.exceptions.RequestException as e:
             logging.error(f"delete请求失败 (尝试 {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(CLOUD_API_RETRY_DELAY)
+                upstream_retry_sleep('123pan', CLOUD_API_RETRY_DELAY)
             else:
                 return {"success": False, "message": f"请求失败: {str(e)}"}
 
@@ -3638,7 +6195,7 @@ def delete(file_id_list: list):
     for attempt in range(max_retries):
         try:
             trash(file_id_list)
-            r = requests.post(url, json=data, headers=API_HEADERS)
+            r = pan123_request('POST', url, json=data, headers=API_HEADERS)
             logging.info(f"deleteAPI HTTP响应状态码: {r.status_code}")
             logging.info(f"deleteAPI HTTP响应内容: {r.text}")
             r.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
@@ -3655,7 +6212,7 @@ def delete(file_id_list: list):
         except requests.exceptions.RequestException as e:
             logging.error(f"delete请求失败 (尝试 {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(CLOUD_API_RETRY_DELAY)
+                upstream_retry_sleep('123pan', CLOUD_API_RETRY_DELAY)
             else:
                 return {"success": False, "message": f"请求失败: {str(e)}"}
 
@@ -3672,7 +6229,7 @@ def move(file_id_list: list, to_parent_file_id: int):
     for attempt in range(max_retries):
         try:
             # 使用JSON格式发送请求，符合API要求
-            r = requests.post(url, json=data, headers=API_HEADERS)
+            r = pan123_request('POST', url, json=data, headers=API_HEADERS)
             logging.info(f"移动API HTTP响应状态码: {r.status_code}")
             logging.info(f"移动API HTTP响应内容: {r.text}")
             r.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
@@ -3690,7 +6247,7 @@ def move(file_id_list: list, to_parent_file_id: int):
         except requests.exceptions.RequestException as e:
             logging.error(f"移动请求失败 (尝试 {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(CLOUD_API_RETRY_DELAY)
+                upstream_retry_sleep('123pan', CLOUD_API_RETRY_DELAY)
             else:
                 return {"success": False, "message": f"请求失败: {str(e)}"}
 
@@ -3811,6 +6368,7 @@ def split_files_into_batches(files, batch_size):
 
 
 
+@traced('merge_duplicates')
 def merge_duplicate_named_groups(groups):
     """合并具有相同名称的分组（解决批处理导致的重复分组问题）"""
     if not groups or len(groups) < 2:
@@ -3897,6 +6455,7 @@ def merge_duplicate_named_groups(groups):
     logging.info(f"🎯 重复分组合并完成: {len(groups)} → {len(merged_groups)} 个分组")
     return merged_groups
 
+@traced('merge_series')
 def merge_same_series_groups(groups):
     """使用AI智能合并同一系列的分组，支持分批处理"""
     if not groups or len(groups) < 2:
@@ -4168,8 +6727,87 @@ def extract_series_base_name(group_name):
     logging.debug(f"系列名称提取: '{group_name}' -> '{base_name}'")
     return base_name
 
-def process_files_for_grouping(files, source_name):
-    """处理文件进行智能分组 - 优化版"""
+def group_files_from_metadata(files, source_name):
+    """
+    使用持久化元数据对已识别的文件进行本地分组，不调用AI
+
+    电视剧按 (TMDB剧集ID, 季号) 分组；属于TMDB合集的电影按合集分组。
+    未识别的文件、不属于合集的电影以及只有单个文件的分组仍交给AI处理。
+
+    Args:
+        files (list): 文件列表，包含 fileId、filename，可选 file_path
+        source_name (str): 来源名称
+
+    Returns:
+        tuple: (本地生成的分组列表, 仍需AI分组的文件列表)
+    """
+    paths = [f.get('file_path') or f['filename'] for f in files]
+    records = file_metadata_store.get_many(paths)
+    if not records:
+        return [], files
+
+    buckets = {}
+    for file_item, file_path in zip(files, paths):
+        record = records.get(file_path)
+        tmdb_info = record['tmdb_info'] if record else None
+        if not tmdb_info:
+            continue
+        file_info = record['file_info'] or {}
+
+        if file_info.get('media_type') != 'movie' and tmdb_info.get('name'):
+            season = int(file_info.get('season') or 1)
+            # 优先使用该季的首播年份，详情中没有季信息时使用剧集首播年份
+            season_air_date = next((s.get('air_date') for s in tmdb_info.get('seasons') or []
+                                    if s.get('season_number') == season and s.get('air_date')), None)
+            year = (season_air_date or tmdb_info.get('first_air_date') or '')[:4]
+            key = ('tv', tmdb_info.get('id'), season)
+            group_name = f"{tmdb_info['name']} ({year}) S{season:02d}" if year else f"{tmdb_info['name']} S{season:02d}"
+        elif tmdb_info.get('belongs_to_collection'):
+            collection = tmdb_info['belongs_to_collection']
+            key = ('collection', collection.get('id'))
+            group_name = collection.get('name') or ''
+        else:
+            continue
+
+        bucket = buckets.setdefault(key, {'group_name': group_name, 'fileIds': [], 'file_names': [], 'years': set()})
+        bucket['fileIds'].append(file_item['fileId'])
+        bucket['file_names'].append(file_item['filename'])
+        release_year = (tmdb_info.get('release_date') or '')[:4]
+        if key[0] == 'collection' and release_year:
+            bucket['years'].add(release_year)
+
+    groups = []
+    for key, bucket in buckets.items():
+        if len(bucket['fileIds']) < 2 or not bucket['group_name']:
+            continue
+        group_name = bucket['group_name']
+        if bucket['years']:
+            first_year, last_year = min(bucket['years']), max(bucket['years'])
+            group_name += f" ({first_year})" if first_year == last_year else f" ({first_year}-{last_year})"
+        groups.append({
+            'group_name': group_name,
+            'fileIds': bucket['fileIds'],
+            'file_names': bucket['file_names'],
+            'files': bucket['file_names'],
+            'folder_path': source_name,
+            'source': 'metadata_store'
+        })
+
+    grouped_ids = {file_id for group in groups for file_id in group['fileIds']}
+    remaining_files = [f for f in files if f['fileId'] not in grouped_ids]
+    if groups:
+        logging.info(f"🗄️ 根据元数据本地生成 {len(groups)} 个分组（{len(grouped_ids)} 个文件），剩余 {len(remaining_files)} 个文件交给AI")
+    return groups, remaining_files
+
+
+@traced('grouping_batch')
+def process_files_for_grouping(files, source_name, failures=None):
+    """
+    处理文件进行智能分组 - 优化版
+
+    传入 failures 列表时，AI调用失败或无结果的批次会追加到其中，
+    调用方据此判断结果是否完整（例如不把失败批次保存为检查点）。
+    """
     if not files:
         return []
 
@@ -4180,15 +6818,20 @@ def process_files_for_grouping(files, source_name):
     except:
         pass
 
+    # 🗄️ 已识别的文件先根据持久化元数据本地分组，只有剩余文件交给AI
+    metadata_groups, files = group_files_from_metadata(files, source_name)
+    if not files:
+        return metadata_groups
+
     # 批次处理逻辑 - 优化API调用次数
     MAX_BATCH_SIZE = CHUNK_SIZE  # 增加批处理大小，减少API调用次数
     if len(files) > MAX_BATCH_SIZE:
-        return _process_files_in_batches(files, MAX_BATCH_SIZE)
+        return metadata_groups + _process_files_in_batches(files, MAX_BATCH_SIZE, failures)
     else:
-        return _process_single_batch(files)
+        return metadata_groups + _process_single_batch(files, failures)
 
 
-def _process_files_in_batches(files, batch_size):
+def _process_files_in_batches(files, batch_size, failures=None):
     """分批处理文件"""
     batches = split_files_into_batches(files, batch_size)
     logging.info(f"📦 分批处理: {len(batches)} 批")
@@ -4201,7 +6844,7 @@ def _process_files_in_batches(files, batch_size):
             pass
 
         logging.info(f"📦 处理第 {i+1}/{len(batches)} 批: {len(batch_files)} 个文件")
-        batch_groups = _call_ai_for_grouping(batch_files)
+        batch_groups = _call_ai_for_grouping(batch_files, failures)
 
         if batch_groups:
             all_groups.extend(batch_groups if isinstance(batch_groups, list) else [batch_groups])
@@ -4211,14 +6854,14 @@ def _process_files_in_batches(files, batch_size):
     return all_groups
 
 
-def _process_single_batch(files):
+def _process_single_batch(files, failures=None):
     """处理单批文件"""
     logging.info(f"📊 单批处理 {len(files)} 个文件")
-    return _call_ai_for_grouping(files)
+    return _call_ai_for_grouping(files, failures)
 
 
-def _call_ai_for_grouping(files):
-    """调用AI进行分组并验证结果"""
+def _call_ai_for_grouping(files, failures=None):
+    """调用AI进行分组并验证结果（失败或无结果时返回空列表，并记录到 failures）"""
     file_list = [{'fileId': f['fileId'], 'filename': f['filename']} for f in files]
     user_input = repr(file_list)
 
@@ -4226,7 +6869,10 @@ def _call_ai_for_grouping(files):
     start_time = time.time()
 
     try:
-        raw_result = extract_movie_info_from_filename_enhanced(user_input, MAGIC_PROMPT, GROUPING_MODEL)
+        if ENABLE_MODEL_CASCADE:
+            raw_result = group_with_model_cascade(files)
+        else:
+            raw_result = extract_movie_info_from_filename_enhanced(user_input, MAGIC_PROMPT, GROUPING_MODEL)
         process_time = time.time() - start_time
 
         if raw_result:
@@ -4235,10 +6881,14 @@ def _call_ai_for_grouping(files):
             return _validate_and_enhance_groups(raw_result, files, "AI分组")
         else:
             logging.warning(f"⏱️ AI分组耗时: {process_time:.2f}秒 - 无结果")
+            if failures is not None:
+                failures.append('无结果')
             return []
     except Exception as e:
         process_time = time.time() - start_time
         logging.error(f"❌ AI分组失败: {process_time:.2f}秒 - {e}")
+        if failures is not None:
+            failures.append(str(e))
         return []
 
 
@@ -4547,6 +7197,7 @@ def evaluate_grouping_quality(grouping_result):
     total_items = len(grouping_result)
     valid_count = 0
     issues = []
+    item_scores = []  # 每个分组的分数，与输入顺序对齐
 
     for i, group in enumerate(grouping_result):
         item_score = 0
@@ -4554,6 +7205,7 @@ def evaluate_grouping_quality(grouping_result):
 
         if not isinstance(group, dict):
             item_issues.append("分组项不是字典格式")
+            item_scores.append(0)
             continue
 
         # 检查必需字段
@@ -4582,6 +7234,7 @@ def evaluate_grouping_quality(grouping_result):
             valid_count += 1
 
         total_score += item_score
+        item_scores.append(item_score)
         if item_issues:
             issues.extend([f"分组 {i+1}: {issue}" for issue in item_issues])
 
@@ -4590,6 +7243,7 @@ def evaluate_grouping_quality(grouping_result):
     return {
         "score": round(average_score, 2),
         "issues": issues,
+        "item_scores": item_scores,
         "valid_count": valid_count,
         "total_count": total_items,
         "valid_ratio": round(valid_count / total_items * 100, 2) if total_items > 0 else 0
@@ -4613,10 +7267,12 @@ def evaluate_extraction_quality(movie_info_list):
     total_items = len(movie_info_list)
     valid_count = 0
     issues = []
+    item_scores = []  # 每个项目的分数，与输入顺序对齐
 
     for i, item in enumerate(movie_info_list):
         if not isinstance(item, dict):
             issues.append(f"项目 {i+1}: 不是有效的字典格式")
+            item_scores.append(0)
             continue
 
         item_score = 0
@@ -4638,7 +7294,7 @@ def evaluate_extraction_quality(movie_info_list):
                         item_issues.append(f"年份格式错误: {item[field]}")
                 elif field == 'media_type':
                     # 验证媒体类型
-                    if item[field].lower() in ['movie', 'tv', 'tv_series', 'anime']:
+                    if item[field].lower() in ['movie', 'tv', 'tv_show', 'tv_series', 'anime']:
                         item_score += 15  # 媒体类型占15%权重
                     else:
                         item_issues.append(f"未知媒体类型: {item[field]}")
@@ -4665,6 +7321,7 @@ def evaluate_extraction_quality(movie_info_list):
             valid_count += 1
 
         total_score += item_score
+        item_scores.append(item_score)
         if item_issues:
             issues.extend([f"项目 {i+1}: {issue}" for issue in item_issues])
 
@@ -4673,33 +7330,47 @@ def evaluate_extraction_quality(movie_info_list):
     return {
         "score": round(average_score, 2),
         "issues": issues,
+        "item_scores": item_scores,
         "valid_count": valid_count,
         "total_count": total_items,
         "valid_ratio": round(valid_count / total_items * 100, 2) if total_items > 0 else 0
     }
 
 
-def evaluate_tmdb_match_quality(movie_info, tmdb_result):
-    """
-    评估TMDB搜索结果的匹配质量
+def _movie_match_features(movie_info):
+    """预计算提取信息的匹配特征（年份、规范化标题及其词集合、媒体类型、TMDB ID）"""
+    movie_title = str(movie_info.get('title', '')).lower().strip()
+    return {
+        'year': str(movie_info.get('year', '')),
+        'title': movie_title,
+        'words': set(movie_title.split()),
+        'media_type': str(movie_info.get('media_type', '')).lower(),
+        'tmdb_id': str(movie_info['tmdb_id']) if movie_info.get('tmdb_id') else ''
+    }
 
-    Args:
-        movie_info: 提取的电影信息
-        tmdb_result: TMDB搜索结果
 
-    Returns:
-        dict: 包含匹配质量分数和详细信息
-    """
-    if not tmdb_result or not movie_info:
-        return {"score": 0, "reasons": ["无搜索结果或输入信息"]}
+def _tmdb_candidate_features(tmdb_result):
+    """预计算TMDB候选条目的匹配特征"""
+    tmdb_title = str(tmdb_result.get('title') or tmdb_result.get('name', '')).lower().strip()
+    return {
+        'date': tmdb_result.get('release_date') or tmdb_result.get('first_air_date', ''),
+        'title': tmdb_title,
+        'words': set(tmdb_title.split()),
+        'is_movie': 'release_date' in tmdb_result,
+        'is_tv': 'first_air_date' in tmdb_result,
+        'id': str(tmdb_result.get('id', ''))
+    }
 
+
+def _score_match_features(movie, candidate):
+    """根据预计算的特征计算匹配分数（评分规则与 evaluate_tmdb_match_quality 一致）"""
     score = 0
     reasons = []
 
     try:
         # 年份匹配检查 (40%权重) - 更严格的年份匹配
-        movie_year = str(movie_info.get('year', ''))
-        tmdb_date = tmdb_result.get('release_date') or tmdb_result.get('first_air_date', '')
+        movie_year = movie['year']
+        tmdb_date = candidate['date']
         if tmdb_date and movie_year:
             tmdb_year = tmdb_date[:4]
             year_diff = abs(int(tmdb_year) - int(movie_year))
@@ -4720,8 +7391,8 @@ def evaluate_tmdb_match_quality(movie_info, tmdb_result):
                 reasons.append(f"年份差异过大: {movie_year} vs {tmdb_year} (严重扣分)")
 
         # 标题相似度检查 (40%权重)
-        movie_title = str(movie_info.get('title', '')).lower().strip()
-        tmdb_title = str(tmdb_result.get('title') or tmdb_result.get('name', '')).lower().strip()
+        movie_title = movie['title']
+        tmdb_title = candidate['title']
 
         if movie_title and tmdb_title:
             if movie_title == tmdb_title:
@@ -4732,9 +7403,7 @@ def evaluate_tmdb_match_quality(movie_info, tmdb_result):
                 reasons.append("标题部分匹配")
             else:
                 # 检查关键词匹配
-                movie_words = set(movie_title.split())
-                tmdb_words = set(tmdb_title.split())
-                common_words = movie_words.intersection(tmdb_words)
+                common_words = movie['words'].intersection(candidate['words'])
                 if len(common_words) >= 2:
                     score += 20
                     reasons.append(f"标题关键词匹配: {common_words}")
@@ -4745,9 +7414,9 @@ def evaluate_tmdb_match_quality(movie_info, tmdb_result):
                     reasons.append("标题无明显匹配")
 
         # 媒体类型匹配检查 (20%权重)
-        movie_type = str(movie_info.get('media_type', '')).lower()
-        is_movie_result = 'release_date' in tmdb_result
-        is_tv_result = 'first_air_date' in tmdb_result
+        movie_type = movie['media_type']
+        is_movie_result = candidate['is_movie']
+        is_tv_result = candidate['is_tv']
 
         if movie_type == 'movie' and is_movie_result:
             score += 20
@@ -4760,7 +7429,7 @@ def evaluate_tmdb_match_quality(movie_info, tmdb_result):
             reasons.append("媒体类型部分匹配")
 
         # TMDB ID直接匹配 (额外加分)
-        if movie_info.get('tmdb_id') and str(movie_info['tmdb_id']) == str(tmdb_result.get('id', '')):
+        if movie['tmdb_id'] and movie['tmdb_id'] == candidate['id']:
             score += 20
             reasons.append("TMDB ID直接匹配")
 
@@ -4773,24 +7442,84 @@ def evaluate_tmdb_match_quality(movie_info, tmdb_result):
     }
 
 
-def extract_movie_info_from_filename_enhanced(user_input_content, EXTRACTION_PROMPT, model=None, max_attempts=3, enable_quality_assessment=None):
+def evaluate_tmdb_match_quality_batch(movie_infos, candidate_lists):
     """
-    增强版电影信息提取函数，支持多次尝试和质量评估
+    批量评估多个文件的TMDB候选匹配质量
+
+    每个文件的特征只计算一次，同一批次中重复出现的候选条目（多个策略/多个文件返回同一条目）
+    按TMDB条目内容去重，也只计算一次特征，逐对评分只剩整数和集合比较。
+    刮削时 extract_movie_name_and_info 对整个批次调用一次。
 
     Args:
-        user_input_content: 输入的文件名内容
-        EXTRACTION_PROMPT: 提取提示词
-        model: 使用的AI模型
-        max_attempts: 最大尝试次数
-        enable_quality_assessment: 是否启用质量评估，None时根据提示词类型自动判断
+        movie_infos (list): 提取的电影信息列表
+        candidate_lists (list): 与 movie_infos 对齐的候选条目列表的列表
 
     Returns:
-        最佳质量的提取结果
+        list: 与输入对齐的评分结果列表的列表，每项格式同 evaluate_tmdb_match_quality
     """
-    logging.info(f"🎯 开始增强版电影信息提取，最大尝试次数: {max_attempts}")
+    candidate_features = {}
+    batch_scores = []
+    for movie_info, candidates in zip(movie_infos, candidate_lists):
+        if not movie_info:
+            batch_scores.append([{"score": 0, "reasons": ["无搜索结果或输入信息"]} for _ in candidates])
+            continue
 
-    # 如果没有指定模型，使用默认的MODEL；如果是MAGIC_PROMPT，使用GROUPING_MODEL
-    model = MODEL
+        movie = _movie_match_features(movie_info)
+        scores = []
+        for candidate in candidates:
+            if not candidate:
+                scores.append({"score": 0, "reasons": ["无搜索结果或输入信息"]})
+                continue
+            # 不同文件的搜索结果是不同的字典对象，按条目标识而不是对象身份去重
+            feature_key = (candidate.get('id'), candidate.get('title') or candidate.get('name'),
+                           candidate.get('release_date'), candidate.get('first_air_date'),
+                           'release_date' in candidate, 'first_air_date' in candidate)
+            features = candidate_features.get(feature_key)
+            if features is None:
+                features = candidate_features[feature_key] = _tmdb_candidate_features(candidate)
+            scores.append(_score_match_features(movie, features))
+        batch_scores.append(scores)
+    return batch_scores
+
+
+def evaluate_tmdb_match_quality(movie_info, tmdb_result):
+    """
+    评估TMDB搜索结果的匹配质量
+
+    Args:
+        movie_info: 提取的电影信息
+        tmdb_result: TMDB搜索结果
+
+    Returns:
+        dict: 包含匹配质量分数和详细信息
+    """
+    return evaluate_tmdb_match_quality_batch([movie_info], [[tmdb_result]])[0][0]
+
+
+# 固定的格式提醒后缀：保持逐字节不变，使系统提示词可以命中服务商的前缀缓存
+GROUPING_JSON_REMINDER = "\n\n**重要提醒**: 必须返回完整的JSON格式，包含group_name和完整的fileIds数组。"
+EXTRACTION_JSON_REMINDER = "\n\n**重要提醒**: 必须返回完整的JSON格式。"
+
+
+@traced('ai_extract', 'ai')
+def extract_movie_info_from_filename_enhanced(user_input_content, EXTRACTION_PROMPT, model=None, max_attempts=3, enable_quality_assessment=None):
+    """
+    增强版电影信息提取函数，支持多次尝试和质量评估
+
+    Args:
+        user_input_content: 输入的文件名内容
+        EXTRACTION_PROMPT: 提取提示词
+        model: 使用的AI模型
+        max_attempts: 最大尝试次数
+        enable_quality_assessment: 是否启用质量评估，None时根据提示词类型自动判断
+
+    Returns:
+        最佳质量的提取结果
+    """
+    logging.info(f"🎯 开始增强版电影信息提取，最大尝试次数: {max_attempts}")
+
+    # 如果没有指定模型，使用默认的MODEL；分组调用方会显式传入GROUPING_MODEL
+    model = model or MODEL
 
     # 判断是否为分组提示词
     is_grouping_prompt = "分组" in EXTRACTION_PROMPT or "group_name" in EXTRACTION_PROMPT or "fileIds" in EXTRACTION_PROMPT
@@ -4812,7 +7541,7 @@ def extract_movie_info_from_filename_enhanced(user_input_content, EXTRACTION_PRO
         strategies = [
             {
                 "name": "智能分组",
-                "prompt": EXTRACTION_PROMPT + "\n\n**重要提醒**: 必须返回完整的JSON格式，包含group_name和完整的fileIds数组。",
+                "prompt": EXTRACTION_PROMPT + GROUPING_JSON_REMINDER,
                 "model": model,
                 "temperature": 0.1
             }
@@ -4821,7 +7550,7 @@ def extract_movie_info_from_filename_enhanced(user_input_content, EXTRACTION_PRO
         strategies = [
             {
                 "name": "智能提取",
-                "prompt": EXTRACTION_PROMPT + "\n\n**重要提醒**: 必须返回完整的JSON格式。",
+                "prompt": EXTRACTION_PROMPT + EXTRACTION_JSON_REMINDER,
                 "model": model,
                 "temperature": 0.1  # 低温度，更确定性的结果
             }
@@ -4926,11 +7655,8 @@ def _single_extraction_attempt(user_input_content, prompt, model, temperature=0.
         try:
             logging.info(f"🔄 AI调用尝试 {retry + 1}/{max_retries}")
 
-            # 构建完整的提示词
-            full_prompt = f"{prompt}\n\n{user_input_content}"
-
-            # 使用改进的API调用函数
-            response_content = call_ai_api(full_prompt, model, temperature)
+            # 静态提示词作为system消息，可变的文件列表放在最后
+            response_content = call_ai_api(user_input_content, model, temperature, system_prompt=prompt)
 
             if response_content:
                 logging.info(f"✅ AI响应成功，长度: {len(response_content)} 字符")
@@ -4947,7 +7673,7 @@ def _single_extraction_attempt(user_input_content, prompt, model, temperature=0.
             # 如果失败且还有重试机会，等待后重试
             if retry < max_retries - 1:
                 logging.info(f"⏳ 等待 {retry_delay} 秒后重试...")
-                time.sleep(retry_delay)
+                upstream_retry_sleep('ai', retry_delay)
 
         except Exception as e:
             logging.warning(f"❌ 重试 {retry + 1}/{max_retries} 失败: {e}")
@@ -4980,6 +7706,407 @@ def _parse_ai_response(input_string):
     return None
 
 
+def align_extraction_results(file_paths, raw_result):
+    """
+    按文件名把AI返回的提取结果与输入文件对齐
+
+    AI结果中的 file_name 字段可能是完整路径也可能只是文件名；无法按名称对齐的结果
+    只有在数量与剩余空位完全一致时才按顺序填充，避免错位。
+
+    Args:
+        file_paths (list): 输入文件路径列表
+        raw_result: AI返回的解析结果
+
+    Returns:
+        list: 与 file_paths 按位置对齐的结果，未对齐的位置为 None
+    """
+    items = [item for item in raw_result if isinstance(item, dict)] if isinstance(raw_result, list) else []
+    aligned = [None] * len(file_paths)
+
+    indexes_by_path = {}
+    indexes_by_basename = {}
+    for i, file_path in enumerate(file_paths):
+        indexes_by_path.setdefault(file_path, []).append(i)
+        indexes_by_basename.setdefault(os.path.basename(file_path), []).append(i)
+
+    def take_free_index(candidates):
+        while candidates:
+            index = candidates.pop(0)
+            if aligned[index] is None:
+                return index
+        return None
+
+    unmatched = []
+    for item in items:
+        name = str(item.get('file_name') or '').strip()
+        index = take_free_index(indexes_by_path.get(name, []))
+        if index is None and name:
+            index = take_free_index(indexes_by_basename.get(os.path.basename(name), []))
+        if index is None:
+            unmatched.append(item)
+        else:
+            aligned[index] = item
+
+    empty_indexes = [i for i, item in enumerate(aligned) if item is None]
+    if unmatched and len(unmatched) == len(empty_indexes):
+        for index, item in zip(empty_indexes, unmatched):
+            aligned[index] = item
+
+    return aligned
+
+
+def _is_valid_extraction_item(item):
+    """检查单个提取结果是否可用（有标题，季/集号可转换为整数）"""
+    if not isinstance(item, dict):
+        return False
+    title = item.get('title') or item.get('original_title')
+    if not isinstance(title, str) or not title.strip():
+        return False
+    for key in ('season', 'episode'):
+        value = item.get(key)
+        if value not in (None, ''):
+            try:
+                int(value)
+            except (ValueError, TypeError):
+                return False
+    return True
+
+
+def extract_movie_info_per_item(file_paths, model=None, max_rounds=None):
+    """
+    逐项重试的电影信息提取
+
+    第一轮发送全部文件；之后每一轮只重新发送缺失或未通过校验的文件，
+    而不是整批重试，减少浪费的token和长尾延迟。
+    启用 ENABLE_SCRAPING_QUALITY_ASSESSMENT 时，单项质量分数低于有效线（70）的文件也会重试，
+    最终保留各轮中分数最高的结果。
+
+    Args:
+        file_paths (list): 文件路径列表
+        model (str, optional): 使用的AI模型，默认 MODEL
+        max_rounds (int, optional): 最大轮数，默认 AI_MAX_RETRIES
+
+    Returns:
+        list: 与 file_paths 按位置对齐的提取结果，失败的位置为 None
+    """
+    model = model or MODEL
+    max_rounds = max_rounds or AI_MAX_RETRIES
+    system_prompt = EXTRACTION_PROMPT + EXTRACTION_JSON_REMINDER
+
+    aligned = [None] * len(file_paths)
+    best_scores = [-1] * len(file_paths)
+    pending = list(range(len(file_paths)))
+    use_quality_assessment = ENABLE_SCRAPING_QUALITY_ASSESSMENT
+
+    for round_index in range(max_rounds):
+        if not pending:
+            break
+        check_task_cancelled()
+
+        pending_paths = [file_paths[i] for i in pending]
+        logging.info(f"🔄 AI提取第 {round_index + 1}/{max_rounds} 轮: {len(pending_paths)} 个文件")
+
+        response_content = call_ai_api("\n".join(pending_paths), model, 0.1, system_prompt=system_prompt)
+        parsed_result = _parse_ai_response(response_content) if response_content else None
+        round_aligned = align_extraction_results(pending_paths, parsed_result)
+        if use_quality_assessment:
+            round_scores = evaluate_extraction_quality([item or {} for item in round_aligned])['item_scores']
+        else:
+            round_scores = [100] * len(round_aligned)
+
+        still_pending = []
+        for index, item, item_score in zip(pending, round_aligned, round_scores):
+            if not _is_valid_extraction_item(item):
+                still_pending.append(index)
+                continue
+            if item_score > best_scores[index]:
+                aligned[index] = item
+                best_scores[index] = item_score
+            if best_scores[index] < 70:
+                # 质量不达标：保留目前最好的结果，下一轮重试
+                still_pending.append(index)
+
+        logging.info(f"📊 第 {round_index + 1} 轮: {len(pending) - len(still_pending)} 个文件提取成功，{len(still_pending)} 个待重试")
+        pending = still_pending
+
+        if pending and round_index < max_rounds - 1:
+            upstream_retry_sleep('ai', AI_RETRY_DELAY)
+
+    if pending:
+        low_quality = sum(1 for index in pending if aligned[index] is not None)
+        logging.warning(f"⚠️ {len(pending)} 个文件在 {max_rounds} 轮后仍未提取成功或质量不达标"
+                        f"（其中 {low_quality} 个使用最佳结果）")
+
+    extracted = [item for item in aligned if item is not None]
+    if extracted:
+        log_extraction_summary(extracted, "\n".join(file_paths))
+
+    return aligned
+
+
+def _run_cascade_tier(func, *args, **kwargs):
+    """
+    执行一层级联调用并采集耗时和token用量
+
+    Returns:
+        tuple: (调用结果, 耗时秒数, token用量)
+    """
+    start_ai_usage_capture()
+    start_time = time.time()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        duration = time.time() - start_time
+        usage = stop_ai_usage_capture()
+    return result, duration, usage
+
+
+def extract_with_model_cascade(file_paths):
+    """
+    使用模型级联提取文件信息：快速模型处理整批，只有单项质量分数低于阈值的文件交给强模型
+
+    Args:
+        file_paths (list): 文件路径列表
+
+    Returns:
+        list: 与 file_paths 按位置对齐的提取结果，提取失败的位置为 None
+    """
+    fast_model = CASCADE_FAST_MODEL or MODEL
+    strong_model = CASCADE_STRONG_MODEL or MODEL
+
+    def score(items):
+        return evaluate_extraction_quality([item or {} for item in items])['item_scores']
+
+    logging.info(f"🪜 模型级联提取: {len(file_paths)} 个文件，快速模型 {fast_model}")
+    aligned, duration, usage = _run_cascade_tier(extract_movie_info_per_item, file_paths, fast_model)
+    fast_scores = score(aligned)
+    escalate = [i for i, item_score in enumerate(fast_scores) if item_score < CASCADE_ESCALATION_THRESHOLD]
+    performance_monitor.record_cascade_tier('fast', fast_model, len(file_paths), duration, usage, escalated=len(escalate))
+
+    if not escalate:
+        logging.info(f"✅ 快速模型结果全部达标，耗时 {duration:.2f}秒")
+        return aligned
+    if strong_model == fast_model:
+        logging.info(f"⏭️ 强模型与快速模型相同，跳过升级（{len(escalate)} 个低分文件）")
+        return aligned
+
+    logging.info(f"⬆️ {len(escalate)}/{len(file_paths)} 个文件低于阈值 {CASCADE_ESCALATION_THRESHOLD}，升级到强模型 {strong_model}")
+    check_task_cancelled()
+    escalated_paths = [file_paths[i] for i in escalate]
+    strong_aligned, duration, usage = _run_cascade_tier(extract_movie_info_per_item, escalated_paths, strong_model)
+    strong_scores = score(strong_aligned)
+    performance_monitor.record_cascade_tier('strong', strong_model, len(escalated_paths), duration, usage)
+
+    # 强模型结果只在分数不低于快速模型时替换
+    for position, index in enumerate(escalate):
+        if strong_aligned[position] is not None and strong_scores[position] >= fast_scores[index]:
+            aligned[index] = strong_aligned[position]
+
+    return aligned
+
+
+def _normalize_group_list(raw_groups):
+    """将AI返回的分组结果统一为分组字典列表"""
+    if not raw_groups:
+        return []
+    if isinstance(raw_groups, dict):
+        return [raw_groups]
+    if isinstance(raw_groups, list) and raw_groups and isinstance(raw_groups[0], list):
+        return raw_groups[0]
+    return raw_groups if isinstance(raw_groups, list) else []
+
+
+def group_with_model_cascade(files):
+    """
+    使用模型级联进行智能分组：快速模型处理整批，只有低分分组包含的文件交给强模型重新分组
+
+    Args:
+        files (list): 文件列表，包含 fileId 和 filename
+
+    Returns:
+        list: 合并后的原始分组列表（未经 _validate_and_enhance_groups 处理）
+    """
+    fast_model = CASCADE_FAST_MODEL or GROUPING_MODEL
+    strong_model = CASCADE_STRONG_MODEL or GROUPING_MODEL
+
+    def to_input(file_items):
+        return repr([{'fileId': f['fileId'], 'filename': f['filename']} for f in file_items])
+
+    logging.info(f"🪜 模型级联分组: {len(files)} 个文件，快速模型 {fast_model}")
+    raw_result, duration, usage = _run_cascade_tier(
+        extract_movie_info_from_filename_enhanced, to_input(files), MAGIC_PROMPT, fast_model,
+        max_attempts=1, enable_quality_assessment=False
+    )
+    groups = _normalize_group_list(raw_result)
+
+    if groups:
+        group_scores = evaluate_grouping_quality(groups)['item_scores']
+        kept_groups = [g for g, item_score in zip(groups, group_scores) if item_score >= CASCADE_ESCALATION_THRESHOLD]
+        low_groups = [g for g, item_score in zip(groups, group_scores)
+                      if item_score < CASCADE_ESCALATION_THRESHOLD and isinstance(g, dict)]
+        escalate_ids = {str(file_id) for g in low_groups for file_id in (g.get('fileIds') or g.get('files') or [])}
+        escalate_files = [f for f in files if str(f['fileId']) in escalate_ids]
+    else:
+        # 快速模型完全失败时整批升级
+        kept_groups, low_groups, escalate_files = [], [], list(files)
+
+    performance_monitor.record_cascade_tier('fast', fast_model, len(files), duration, usage, escalated=len(escalate_files))
+
+    if not escalate_files or strong_model == fast_model:
+        return kept_groups + low_groups
+
+    logging.info(f"⬆️ {len(escalate_files)}/{len(files)} 个文件所在分组低于阈值 {CASCADE_ESCALATION_THRESHOLD}，升级到强模型 {strong_model}")
+    check_task_cancelled()
+    raw_result, duration, usage = _run_cascade_tier(
+        extract_movie_info_from_filename_enhanced, to_input(escalate_files), MAGIC_PROMPT, strong_model,
+        max_attempts=1, enable_quality_assessment=False
+    )
+    strong_groups = _normalize_group_list(raw_result)
+    performance_monitor.record_cascade_tier('strong', strong_model, len(escalate_files), duration, usage)
+
+    # 强模型失败时保留快速模型的低分分组，交给后续验证过滤
+    return kept_groups + (strong_groups or low_groups)
+
+
+class InFlightDeduplicator:
+    """
+    并发请求去重器
+
+    相同键的并发调用只真正执行一次，其余调用方等待并共享同一个结果（或异常）。
+    执行方因自身任务被取消而失败时，取消不会传递给等待方：等待方之一重新执行该调用。
+    等待方在等待期间检查自己的取消令牌。
+    """
+
+    # 等待方检查自身取消令牌的间隔（秒）
+    FOLLOWER_POLL_INTERVAL = 0.2
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.stats_counters = {'executed': 0, 'shared': 0, 'leader_cancelled': 0}
+
+    def run(self, key, func, *args, **kwargs):
+        """
+        执行或加入相同键的调用
+
+        Args:
+            key: 去重键（需可哈希）
+            func: 实际执行的函数
+        """
+        token = get_current_cancellation_token()
+        while True:
+            if token is not None:
+                token.raise_if_cancelled()
+            with self.lock:
+                call = self.in_flight.get(key)
+                is_leader = call is None
+                if is_leader:
+                    call = {'event': threading.Event(), 'result': None, 'error': None}
+                    self.in_flight[key] = call
+                    self.stats_counters['executed'] += 1
+                else:
+                    self.stats_counters['shared'] += 1
+
+            if is_leader:
+                break
+
+            if token is None:
+                call['event'].wait()
+            else:
+                while not call['event'].wait(self.FOLLOWER_POLL_INTERVAL):
+                    token.raise_if_cancelled()
+            if isinstance(call['error'], TaskCancelledException):
+                # 执行方所属任务被取消：与本任务无关，重新执行（或加入新的执行方）
+                with self.lock:
+                    self.stats_counters['leader_cancelled'] += 1
+                continue
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = func(*args, **kwargs)
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            call['event'].set()
+
+    def stats(self):
+        """获取去重统计"""
+        with self.lock:
+            return dict(self.stats_counters, in_flight=len(self.in_flight))
+
+
+# 全局TMDB搜索去重器：跨批次、跨线程共享进行中的相同搜索
+tmdb_search_deduplicator = InFlightDeduplicator()
+
+
+def _tmdb_search_key(movie_info):
+    """生成TMDB搜索去重键：只包含会影响搜索和评分的字段"""
+    def normalize(value):
+        return re.sub(r'[\s._\-:：·]+', ' ', str(value or '')).strip().lower()
+
+    return (
+        normalize(movie_info.get('title')),
+        normalize(movie_info.get('original_title')),
+        str(movie_info.get('year', '') or '')[:4],
+        str(movie_info.get('media_type', 'movie') or 'movie').lower(),
+        str(movie_info.get('tmdb_id', '') or '')
+    )
+
+
+def search_movie_in_tmdb_deduplicated(movie_info, max_strategies=5):
+    """
+    去重版TMDB搜索
+
+    同一剧集的多个文件（标题、年份、媒体类型相同）只搜索一次：先查短期结果缓存，
+    再通过 tmdb_search_deduplicator 合并并发中的相同搜索。
+
+    Returns:
+        最佳匹配的TMDB结果
+    """
+    search_key = _tmdb_search_key(movie_info)
+    memo_key = f"search_{hashlib.sha1(repr(search_key).encode('utf-8')).hexdigest()}"
+
+    if memo_key in tmdb_search_memo:
+        cached = tmdb_search_memo.get(memo_key)
+        return cached or None
+
+    result = tmdb_search_deduplicator.run(
+        search_key, search_movie_in_tmdb_enhanced, movie_info, max_strategies=max_strategies
+    )
+    # 未找到结果也记录下来，避免同一批次的其他文件重复搜索
+    tmdb_search_memo.put(memo_key, result or {})
+    return result
+
+
+def _resolve_candidates_from_title_index(movie_info, search_type, max_candidates=3):
+    """
+    通过离线标题索引解析候选TMDB ID，只对候选ID请求详情（详情带持久化缓存）
+
+    Returns:
+        list: TMDB详情列表（与搜索结果字段兼容）
+    """
+    candidate_ids = []
+    titles = [movie_info.get('original_title'), movie_info.get('title')]
+    for title in dict.fromkeys(t for t in titles if t):
+        for candidate in tmdb_title_index.lookup(title, search_type, limit=max_candidates):
+            if candidate['id'] not in candidate_ids:
+                candidate_ids.append(candidate['id'])
+
+    details = []
+    for tmdb_id in candidate_ids[:max_candidates]:
+        detail = get_tmdb_details_by_id(tmdb_id, search_type)
+        if detail:
+            details.append(detail)
+    return details
+
+
+@traced('tmdb_search', 'tmdb')
 def search_movie_in_tmdb_enhanced(movie_info, max_strategies=5):
     """
     增强版TMDB搜索函数，支持多种搜索策略和质量评估
@@ -4991,10 +8118,10 @@ def search_movie_in_tmdb_enhanced(movie_info, max_strategies=5):
     Returns:
         最佳匹配的TMDB结果
     """
-    logging.info(f"🔍 开始增强版TMDB搜索: {movie_info.get('title', 'Unknown')}")
+    tmdb_logger.info("🔍 开始增强版TMDB搜索: %s", movie_info.get('title', 'Unknown'))
 
     if not movie_info:
-        logging.error("❌ 输入的电影信息为空")
+        tmdb_logger.error("❌ 输入的电影信息为空")
         return None
 
     try:
@@ -5039,118 +8166,607 @@ def search_movie_in_tmdb_enhanced(movie_info, max_strategies=5):
             }
         ]
 
-        best_result = None
-        best_quality = {"score": 0}
-        all_results = []
+        best_result = None
+        best_quality = {"score": 0}
+        all_results = []
+
+        def score_strategy_results(strategy, search_results):
+            """评估单个策略的搜索结果并更新最佳匹配"""
+            nonlocal best_result, best_quality
+            top_results = search_results[:5]  # 只评估前5个结果
+            qualities = evaluate_tmdb_match_quality_batch([movie_info], [top_results])[0]
+            for result, quality in zip(top_results, qualities):
+
+                # 根据策略优先级调整分数
+                adjusted_score = quality["score"] * (1.0 - (strategy["priority"] - 1) * 0.1)
+
+                result_info = {
+                    "result": result,
+                    "quality": quality,
+                    "adjusted_score": adjusted_score,
+                    "strategy": strategy["name"],
+                    "query": strategy["query"]
+                }
+
+                all_results.append(result_info)
+
+                # 更新最佳结果
+                if adjusted_score > best_quality.get("score", 0):
+                    best_result = result
+                    best_quality = quality
+                    best_quality["adjusted_score"] = adjusted_score
+                    best_quality["strategy"] = strategy["name"]
+
+                    tmdb_logger.info("🎯 更新最佳匹配: %s - 分数: %.1f", strategy['name'], adjusted_score)
+
+        valid_strategies = []
+        for strategy in search_strategies[:max_strategies]:
+            if not strategy["query"] or len(strategy["query"].strip()) < 2:
+                tmdb_logger.info("⏭️ 跳过策略 '%s': 查询词太短", strategy['name'])
+                continue
+            valid_strategies.append(strategy)
+
+        # 📚 离线标题索引：本地解析候选ID，只通过网络获取详情
+        if ENABLE_TMDB_TITLE_INDEX and tmdb_title_index.available():
+            index_candidates = _resolve_candidates_from_title_index(movie_info, search_type)
+            if index_candidates:
+                index_strategy = {"name": "离线索引匹配", "query": original_title or title, "priority": 1}
+                score_strategy_results(index_strategy, index_candidates)
+            if best_quality.get("adjusted_score", 0) >= 85:
+                tmdb_logger.info("✅ 离线索引找到高质量匹配，跳过网络搜索")
+                valid_strategies = []
+
+        if ENABLE_PARALLEL_TMDB_STRATEGIES and len(valid_strategies) > 1:
+            # 并发模式：同时发起前N个不同查询，结果到达即评分，高质量匹配出现后取消其余策略
+            distinct_strategies = []
+            seen_queries = set()
+            for strategy in valid_strategies:
+                query_key = strategy["query"].strip().lower()
+                if query_key in seen_queries:
+                    continue
+                seen_queries.add(query_key)
+                distinct_strategies.append(strategy)
+            distinct_strategies = distinct_strategies[:max(1, TMDB_PARALLEL_STRATEGY_COUNT)]
+
+            # 提交到独立的TMDB请求线程池（逐文件处理本身运行在 tmdb 线程池中，同池嵌套提交会在当前线程串行执行）
+            tmdb_logger.info("⚡ 并发执行 %s 个TMDB搜索策略", len(distinct_strategies))
+            future_to_strategy = {
+                shared_executors['tmdb_request'].submit(_perform_tmdb_search, strategy["query"], search_type, LANGUAGE): strategy
+                for strategy in distinct_strategies
+            }
+            for future in as_completed(future_to_strategy):
+                strategy = future_to_strategy[future]
+                try:
+                    search_results = future.result()
+                except Exception as e:
+                    tmdb_logger.error("❌ 策略 '%s' 执行失败: %s", strategy['name'], e)
+                    continue
+
+                if not search_results:
+                    tmdb_logger.info("❌ 策略 '%s' 无搜索结果", strategy['name'])
+                    continue
+
+                score_strategy_results(strategy, search_results)
+
+                if best_quality.get("adjusted_score", 0) >= 85:
+                    cancelled = sum(1 for pending in future_to_strategy if pending.cancel())
+                    tmdb_logger.info("✅ 找到高质量匹配，提前返回（取消 %s 个未开始的策略）", cancelled)
+                    break
+        else:
+            for i, strategy in enumerate(valid_strategies):
+                tmdb_logger.info("🔍 策略 %s: %s - 查询: '%s'", i+1, strategy['name'], strategy['query'])
+
+                try:
+                    # 执行TMDB搜索
+                    search_results = _perform_tmdb_search(strategy["query"], search_type, LANGUAGE)
+
+                    if not search_results:
+                        tmdb_logger.info("❌ 策略 '%s' 无搜索结果", strategy['name'])
+                        continue
+
+                    score_strategy_results(strategy, search_results)
+
+                    # 如果找到高质量匹配，可以提前返回
+                    if best_quality.get("adjusted_score", 0) >= 85:
+                        tmdb_logger.info("✅ 找到高质量匹配，提前返回")
+                        break
+
+                except Exception as e:
+                    tmdb_logger.error("❌ 策略 '%s' 执行失败: %s", strategy['name'], e)
+                    continue
+
+        # 记录搜索结果总结
+        if all_results:
+            tmdb_logger.info("📊 TMDB搜索总结 (共 %s 个候选结果):", len(all_results))
+            # 按分数排序显示前3个结果
+            sorted_results = sorted(all_results, key=lambda x: x["adjusted_score"], reverse=True)
+            for i, result_info in enumerate(sorted_results[:3]):
+                result = result_info["result"]
+                title_display = result.get('title') or result.get('name', 'Unknown')
+                year_display = (result.get('release_date') or result.get('first_air_date', ''))[:4]
+                tmdb_logger.info("  %s. %s (%s) - 分数: %.1f - 策略: %s", i+1, title_display, year_display, result_info['adjusted_score'], result_info['strategy'])
+
+        if best_result:
+            title_display = best_result.get('title') or best_result.get('name', 'Unknown')
+            year_display = (best_result.get('release_date') or best_result.get('first_air_date', ''))[:4]
+            tmdb_logger.info("🏆 最终选择: %s (%s) - 分数: %.1f", title_display, year_display, best_quality.get('adjusted_score', 0))
+            tmdb_logger.info("🔍 匹配原因: %s", ', '.join(best_quality.get('reasons', [])))
+        else:
+            tmdb_logger.warning("❌ 未找到合适的TMDB匹配结果")
+
+        return best_result
+
+    except Exception as e:
+        tmdb_logger.error("❌ TMDB搜索过程出错: %s", e)
+        traceback.print_exc()
+        return None
+
+
+class LatencyHistogram:
+    """
+    固定分桶的延迟直方图（毫秒）
+
+    只记录每个分桶的计数，内存占用固定，可按分桶上界估算分位数。
+    """
+
+    BUCKET_BOUNDS_MS = (25, 50, 100, 200, 400, 800, 1600, 3200, 6400, float('inf'))
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空直方图"""
+        with self.lock:
+            self.bucket_counts = [0] * len(self.BUCKET_BOUNDS_MS)
+            self.count = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+
+    def observe(self, duration_seconds):
+        """记录一次耗时（秒）"""
+        duration_ms = duration_seconds * 1000
+        with self.lock:
+            for index, bound in enumerate(self.BUCKET_BOUNDS_MS):
+                if duration_ms <= bound:
+                    self.bucket_counts[index] += 1
+                    break
+            self.count += 1
+            self.total_ms += duration_ms
+            self.max_ms = max(self.max_ms, duration_ms)
+
+    def _percentile_locked(self, percentile):
+        """按分桶上界估算分位数（调用方需持有锁）"""
+        if self.count == 0:
+            return 0.0
+        target = self.count * percentile / 100.0
+        cumulative = 0
+        for bound, bucket_count in zip(self.BUCKET_BOUNDS_MS, self.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return self.max_ms if bound == float('inf') else min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self):
+        """获取直方图快照"""
+        with self.lock:
+            buckets = {
+                ('+Inf' if bound == float('inf') else f"le_{int(bound)}ms"): bucket_count
+                for bound, bucket_count in zip(self.BUCKET_BOUNDS_MS, self.bucket_counts)
+            }
+            return {
+                'count': self.count,
+                'avg_ms': round(self.total_ms / self.count, 1) if self.count else 0.0,
+                'max_ms': round(self.max_ms, 1),
+                'p50_ms': round(self._percentile_locked(50), 1),
+                'p95_ms': round(self._percentile_locked(95), 1),
+                'p99_ms': round(self._percentile_locked(99), 1),
+                'buckets': buckets
+            }
+
+
+class TMDBClient:
+    """
+    TMDB HTTP客户端
+
+    - 复用 keep-alive 连接池（requests.Session）
+    - 令牌桶限速（TMDB_RATE_LIMIT / TMDB_RATE_BURST）
+    - 全局并发上限（tmdb_request_semaphore）
+    - 429 时按 Retry-After 暂停整个令牌桶后重试
+    - 按接口模板统计延迟直方图
+    """
+
+    def __init__(self, rate_limit, burst):
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.rate_limiter = TokenBucketLimiter(rate_limit, burst, name='tmdb')
+        self.lock = threading.Lock()
+        self.latency_histograms = {}
+        self.counters = {'requests': 0, 'retries': 0, 'throttled_429': 0, 'errors': 0}
+
+    @staticmethod
+    def endpoint_template(path):
+        """将具体路径归一化为接口模板，例如 /tv/123/season/2 -> /tv/{id}/season/{id}"""
+        parts = [part for part in path.split('/') if part]
+        if parts and parts[0] == 'find':
+            return '/find/{external_id}'
+        return '/' + '/'.join('{id}' if part.isdigit() else part for part in parts)
+
+    @staticmethod
+    def _parse_retry_after(value):
+        """解析Retry-After头（秒数或HTTP日期），无法解析时返回None"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            from email.utils import parsedate_to_datetime
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _record(self, endpoint, duration, counter=None):
+        """记录单次请求的延迟和计数"""
+        with self.lock:
+            histogram = self.latency_histograms.get(endpoint)
+            if histogram is None:
+                histogram = self.latency_histograms[endpoint] = LatencyHistogram()
+            self.counters['requests'] += 1
+            if counter:
+                self.counters[counter] += 1
+        histogram.observe(duration)
+        metrics_registry.observe('pan123_upstream_request_duration_seconds', duration, upstream='tmdb', endpoint=endpoint)
+        tracer.record_span(f"tmdb {endpoint}", 'tmdb', duration, result=counter or 'ok')
+        if counter == 'throttled_429':
+            metrics_registry.inc('pan123_upstream_rate_limited_total', upstream='tmdb')
+        elif counter == 'errors':
+            metrics_registry.inc('pan123_upstream_errors_total', upstream='tmdb')
+
+    def get(self, path, params=None):
+        """
+        发送TMDB GET请求（含限速、重试和429处理）
+
+        Args:
+            path (str): 接口路径
+            params (dict, optional): 查询参数（无需包含api_key）
+
+        Returns:
+            requests.Response or None: 成功或404时返回响应；重试耗尽后返回None
+        """
+        url = f"{TMDB_API_URL_BASE}{path}"
+        request_params = dict(params or {}, api_key=TMDB_API_KEY)
+        endpoint = self.endpoint_template(path)
+
+        for attempt in range(TMDB_MAX_RETRIES):
+            check_task_cancelled()
+            if attempt > 0:
+                with self.lock:
+                    self.counters['retries'] += 1
+                metrics_registry.inc('pan123_upstream_retries_total', upstream='tmdb')
+
+            self.rate_limiter.acquire()
+            # 获取全局并发许可，保持对TMDB的礼貌访问
+            semaphore = tmdb_request_semaphore
+            start_time = time.time()
+            try:
+                with semaphore:
+                    response = self.session.get(url, params=request_params, timeout=TMDB_API_TIMEOUT)
+            except requests.RequestException as e:
+                self._record(endpoint, time.time() - start_time, 'errors')
+                tmdb_logger.warning("TMDB API调用失败 %s (尝试 %s/%s): %s", path, attempt + 1, TMDB_MAX_RETRIES, e)
+                if attempt < TMDB_MAX_RETRIES - 1:
+                    cancellable_sleep(TMDB_RETRY_DELAY)
+                continue
+
+            if response.status_code == 429:
+                self._record(endpoint, time.time() - start_time, 'throttled_429')
+                retry_after = self._parse_retry_after(response.headers.get('Retry-After'))
+                wait_seconds = min(retry_after if retry_after is not None else TMDB_RETRY_DELAY, 60)
+                # 暂停整个令牌桶，让所有线程一起退避
+                self.rate_limiter.pause(wait_seconds)
+                tmdb_logger.warning("⏳ TMDB限流(429) %s，%.1f秒后重试 (尝试 %s/%s)", path, wait_seconds, attempt + 1, TMDB_MAX_RETRIES)
+                continue
+
+            self._record(endpoint, time.time() - start_time)
+            if response.status_code == 404:
+                return response
+
+            try:
+                response.raise_for_status()
+                return response
+            except requests.RequestException as e:
+                with self.lock:
+                    self.counters['errors'] += 1
+                metrics_registry.inc('pan123_upstream_errors_total', upstream='tmdb')
+                tmdb_logger.warning("TMDB API调用失败 %s (尝试 %s/%s): %s", path, attempt + 1, TMDB_MAX_RETRIES, e)
+                if attempt < TMDB_MAX_RETRIES - 1:
+                    cancellable_sleep(TMDB_RETRY_DELAY)
+
+        return None
+
+    def stats(self):
+        """获取客户端统计信息"""
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = dict(self.latency_histograms)
+        return dict(
+            counters,
+            rate_limiter=self.rate_limiter.stats(),
+            endpoints={endpoint: histogram.snapshot() for endpoint, histogram in sorted(histograms.items())}
+        )
+
+    def reset_stats(self):
+        """重置客户端统计信息"""
+        with self.lock:
+            self.latency_histograms = {}
+            self.counters = {key: 0 for key in self.counters}
+
+
+# 全局TMDB客户端（所有TMDB请求都经由 tmdb_api_get -> tmdb_client）
+tmdb_client = TMDBClient(TMDB_RATE_LIMIT, TMDB_RATE_BURST)
+
+
+def tmdb_api_get(path, params=None):
+    """
+    带持久化缓存的TMDB GET请求
+
+    Args:
+        path (str): 接口路径，例如 '/search/tv'、'/movie/123'
+        params (dict, optional): 查询参数（无需包含api_key）
+
+    Returns:
+        dict or None: 响应JSON；资源不存在（404）或请求最终失败时返回None
+    """
+    params = dict(params or {})
+    hit, cached_response = tmdb_response_cache.get(path, params)
+    if hit:
+        return cached_response
+
+    response = tmdb_client.get(path, params)
+    if response is None:
+        return None
+
+    if response.status_code == 404:
+        # 负缓存：避免对不存在的资源重复请求
+        tmdb_response_cache.put(path, params, None, negative=True)
+        return None
+
+    try:
+        data = response.json()
+    except ValueError as e:
+        tmdb_logger.warning("TMDB API响应解析失败 %s: %s", path, e)
+        return None
+
+    # 搜索和/find的结果列表全部为空时按负缓存处理
+    result_lists = [value for key, value in data.items() if key.endswith('results')] if isinstance(data, dict) else []
+    is_empty = bool(result_lists) and not any(result_lists)
+    tmdb_response_cache.put(path, params, data, negative=is_empty)
+    return data
+
+
+def _perform_tmdb_search(query, media_type_search, language):
+    """
+    执行单次TMDB API搜索
+    """
+    if media_type_search not in ('movie', 'tv'):
+        return []
+
+    data = tmdb_api_get(f"/search/{media_type_search}", {"query": query, "language": language})
+    return data.get('results', []) if data else []
+
+
+def get_tmdb_details_by_id(tmdb_id, media_type):
+    """
+    通过TMDB ID获取详情（带缓存）
+
+    Args:
+        tmdb_id: TMDB ID
+        media_type (str): 'movie' 或 'tv'
+
+    Returns:
+        dict or None: TMDB详情，ID不存在或请求失败时返回None
+    """
+    return tmdb_api_get(f"/{media_type}/{tmdb_id}", {"language": LANGUAGE})
 
-        for i, strategy in enumerate(search_strategies[:max_strategies]):
-            if not strategy["query"] or len(strategy["query"].strip()) < 2:
-                logging.info(f"⏭️ 跳过策略 '{strategy['name']}': 查询词太短")
-                continue
 
-            logging.info(f"🔍 策略 {i+1}: {strategy['name']} - 查询: '{strategy['query']}'")
+def find_tmdb_by_imdb_id(imdb_id):
+    """
+    通过TMDB /find 接口用IMDb ID查找条目（带缓存）
 
-            try:
-                # 执行TMDB搜索
-                search_results = _perform_tmdb_search(strategy["query"], search_type, LANGUAGE)
+    Returns:
+        tuple: (媒体类型 'movie'/'tv', TMDB条目)，未找到时返回 (None, None)
+    """
+    data = tmdb_api_get(f"/find/{imdb_id}", {"language": LANGUAGE, "external_source": "imdb_id"})
+    if not data:
+        return None, None
 
-                if not search_results:
-                    logging.info(f"❌ 策略 '{strategy['name']}' 无搜索结果")
-                    continue
+    if data.get('movie_results'):
+        return 'movie', data['movie_results'][0]
+    if data.get('tv_results'):
+        return 'tv', data['tv_results'][0]
+    if data.get('tv_episode_results'):
+        # 单集的IMDb ID：回溯到所属剧集
+        show_id = data['tv_episode_results'][0].get('show_id')
+        show = get_tmdb_details_by_id(show_id, 'tv') if show_id else None
+        if show:
+            return 'tv', show
 
-                # 评估每个搜索结果
-                for result in search_results[:5]:  # 只评估前5个结果
-                    quality = evaluate_tmdb_match_quality(movie_info, result)
+    return None, None
 
-                    # 根据策略优先级调整分数
-                    adjusted_score = quality["score"] * (1.0 - (strategy["priority"] - 1) * 0.1)
 
-                    result_info = {
-                        "result": result,
-                        "quality": quality,
-                        "adjusted_score": adjusted_score,
-                        "strategy": strategy["name"],
-                        "query": strategy["query"]
-                    }
+def resolve_tagged_file(file_info):
+    """
+    直接解析文件名中已带有的TMDB/IMDb ID，跳过AI提取和多策略搜索
 
-                    all_results.append(result_info)
+    Args:
+        file_info (dict): parse_filename_locally 的解析结果
 
-                    # 更新最佳结果
-                    if adjusted_score > best_quality.get("score", 0):
-                        best_result = result
-                        best_quality = quality
-                        best_quality["adjusted_score"] = adjusted_score
-                        best_quality["strategy"] = strategy["name"]
+    Returns:
+        dict or None: 解析成功时返回TMDB条目，并同步修正 file_info 的 media_type
+    """
+    tmdb_id = file_info.get('tmdb_id', '')
+    imdb_id = file_info.get('imdb_id', '')
+    is_episode = file_info.get('episode') is not None
+
+    if tmdb_id:
+        # 同一个数字ID在movie和tv下可能都存在，按文件名是否含剧集信息决定优先类型
+        type_order = ['tv', 'movie'] if is_episode else ['movie', 'tv']
+        for media_type in type_order:
+            tmdb_result = get_tmdb_details_by_id(tmdb_id, media_type)
+            if tmdb_result:
+                break
+        else:
+            return None
+    elif imdb_id:
+        media_type, tmdb_result = find_tmdb_by_imdb_id(imdb_id)
+        if not tmdb_result:
+            return None
+    else:
+        return None
 
-                        logging.info(f"🎯 更新最佳匹配: {strategy['name']} - 分数: {adjusted_score:.1f}")
+    if media_type == 'movie':
+        file_info['media_type'] = 'movie'
+    elif file_info.get('media_type') not in ('tv_show', 'anime'):
+        file_info['media_type'] = 'tv_show'
+    file_info['tmdb_id'] = str(tmdb_result.get('id', tmdb_id))
 
-                # 如果找到高质量匹配，可以提前返回
-                if best_quality.get("adjusted_score", 0) >= 85:
-                    logging.info(f"✅ 找到高质量匹配，提前返回")
-                    break
+    return tmdb_result
 
-            except Exception as e:
-                logging.error(f"❌ 策略 '{strategy['name']}' 执行失败: {e}")
-                continue
 
-        # 记录搜索结果总结
-        if all_results:
-            logging.info(f"📊 TMDB搜索总结 (共 {len(all_results)} 个候选结果):")
-            # 按分数排序显示前3个结果
-            sorted_results = sorted(all_results, key=lambda x: x["adjusted_score"], reverse=True)
-            for i, result_info in enumerate(sorted_results[:3]):
-                result = result_info["result"]
-                title_display = result.get('title') or result.get('name', 'Unknown')
-                year_display = (result.get('release_date') or result.get('first_air_date', ''))[:4]
-                logging.info(f"  {i+1}. {title_display} ({year_display}) - 分数: {result_info['adjusted_score']:.1f} - 策略: {result_info['strategy']}")
+# TMDB show详情的append_to_response最多支持20个附加项
+TMDB_APPEND_TO_RESPONSE_LIMIT = 20
 
-        if best_result:
-            title_display = best_result.get('title') or best_result.get('name', 'Unknown')
-            year_display = (best_result.get('release_date') or best_result.get('first_air_date', ''))[:4]
-            logging.info(f"🏆 最终选择: {title_display} ({year_display}) - 分数: {best_quality.get('adjusted_score', 0):.1f}")
-            logging.info(f"🔍 匹配原因: {', '.join(best_quality.get('reasons', []))}")
-        else:
-            logging.warning(f"❌ 未找到合适的TMDB匹配结果")
+# 季度数据去重器：同一(剧集, 季)的并发查询只请求一次
+tmdb_season_deduplicator = InFlightDeduplicator()
 
-        return best_result
 
-    except Exception as e:
-        logging.error(f"❌ TMDB搜索过程出错: {e}")
-        traceback.print_exc()
-        return None
+def _store_tv_season(show_id, season_number, season_data):
+    """将季度数据精简为集数索引并写入季度缓存"""
+    episodes = {}
+    for episode in (season_data or {}).get('episodes') or []:
+        episode_number = episode.get('episode_number')
+        if isinstance(episode_number, int):
+            episodes[episode_number] = {
+                'id': episode.get('id'),
+                'name': episode.get('name', ''),
+                'air_date': episode.get('air_date', ''),
+                'runtime': episode.get('runtime')
+            }
+
+    entry = {
+        'exists': season_data is not None,
+        'name': (season_data or {}).get('name', ''),
+        'air_date': (season_data or {}).get('air_date', ''),
+        'episodes': episodes
+    }
+    tmdb_season_memo.put(f"{show_id}_{season_number}", entry)
+    return entry
 
 
-def _perform_tmdb_search(query, media_type_search, language):
+def prefetch_tv_seasons(show_seasons):
     """
-    执行单次TMDB API搜索
+    批量预取剧集的季度数据
+
+    每部剧只请求一次 /tv/{id}，通过 append_to_response=season/N,... 一并取回本批次涉及的所有季。
+
+    Args:
+        show_seasons (dict): {剧集TMDB ID: 季号集合}
+
+    Returns:
+        int: 实际发出的TMDB请求数
     """
-    if media_type_search == 'movie':
-        url = f"{TMDB_API_URL_BASE}/search/movie"
-    elif media_type_search == 'tv':
-        url = f"{TMDB_API_URL_BASE}/search/tv"
-    else:
-        return []
+    request_count = 0
+    for show_id, season_numbers in show_seasons.items():
+        missing = sorted(n for n in season_numbers if f"{show_id}_{n}" not in tmdb_season_memo)
+        for start in range(0, len(missing), TMDB_APPEND_TO_RESPONSE_LIMIT):
+            chunk = missing[start:start + TMDB_APPEND_TO_RESPONSE_LIMIT]
+            data = tmdb_api_get(f"/tv/{show_id}", {
+                "language": LANGUAGE,
+                "append_to_response": ",".join(f"season/{n}" for n in chunk)
+            })
+            request_count += 1
+            if data is None:
+                # 请求失败时不写入缓存，后续按需单独查询
+                continue
+            for season_number in chunk:
+                # 响应中没有该季说明剧集不存在这一季
+                _store_tv_season(show_id, season_number, data.get(f"season/{season_number}"))
+    return request_count
 
-    params = {
-        "api_key": TMDB_API_KEY,
-        "query": query,
-        "language": language,
-    }
 
-    max_retries = TMDB_MAX_RETRIES
-    retry_delay = TMDB_RETRY_DELAY
+def get_tv_season(show_id, season_number):
+    """
+    获取单季数据（优先使用季度缓存，未命中时请求 /tv/{id}/season/{n}）
 
-    for attempt in range(max_retries):
+    Returns:
+        dict or None: {'exists', 'name', 'air_date', 'episodes': {集号: 单集信息}}；请求失败时返回None
+    """
+    cache_key = f"{show_id}_{season_number}"
+    if cache_key in tmdb_season_memo:
+        return tmdb_season_memo.get(cache_key)
+
+    def fetch_season():
+        data = tmdb_api_get(f"/tv/{show_id}/season/{season_number}", {"language": LANGUAGE})
+        return _store_tv_season(show_id, season_number, data) if data else None
+
+    return tmdb_season_deduplicator.run(cache_key, fetch_season)
+
+
+def validate_tv_episodes(results):
+    """
+    用季度缓存校验本批次电视剧文件的集数，并补充单集标题
+
+    校验结果写入 result['episode_validated']（True/False），单集标题写入 file_info['episode_title']。
+    无法获取季度数据时不做标记。
+    """
+    tv_results = []
+    show_seasons = {}
+    for result in results:
+        file_info = result.get('file_info')
+        tmdb_info = result.get('tmdb_info')
+        if (result.get('status') != 'success' or not isinstance(file_info, dict) or not tmdb_info
+                or file_info.get('media_type', 'movie') == 'movie' or file_info.get('episode') is None):
+            continue
         try:
-            response = requests.get(url, params=params, timeout=TMDB_API_TIMEOUT)
-            response.raise_for_status()
-            return response.json().get('results', [])
-        except requests.RequestException as e:
-            logging.warning(f"TMDB API调用失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
+            season_number = int(file_info.get('season', 1) or 1)
+            episode_number = int(file_info.get('episode'))
+        except (TypeError, ValueError):
+            continue
+        show_id = tmdb_info.get('id')
+        if not show_id:
+            continue
+        tv_results.append((result, show_id, season_number, episode_number))
+        show_seasons.setdefault(show_id, set()).add(season_number)
 
-    return []
+    if not tv_results:
+        return
+
+    request_count = prefetch_tv_seasons(show_seasons)
+
+    validated = 0
+    missing = 0
+    for result, show_id, season_number, episode_number in tv_results:
+        season = get_tv_season(show_id, season_number)
+        if season is None:
+            continue
+        episode = season['episodes'].get(episode_number)
+        if episode:
+            result['file_info']['episode_title'] = episode['name']
+            result['episode_validated'] = True
+            validated += 1
+        else:
+            result['episode_validated'] = False
+            missing += 1
+            logging.warning(f"⚠️ TMDB中不存在 S{season_number:02d}E{episode_number:02d}: {result['original_name']}")
+
+    season_count = sum(len(seasons) for seasons in show_seasons.values())
+    logging.info(f"📺 季度数据校验: {len(show_seasons)} 部剧 {season_count} 季（{request_count} 次请求），"
+                 f"{validated} 集已确认，{missing} 集未找到")
 
 
 def _simplify_title(title):
@@ -5187,6 +8803,234 @@ def _extract_keywords(title):
     return ' '.join(keywords)
 
 
+# ================================
+# 本地文件名解析（AI提取前的快速路径）
+# ================================
+
+# 预编译的文件名解析正则
+_LOCAL_TMDB_ID_RE = re.compile(r'[\[{(]\s*tmdb(?:id)?\s*[-=:]\s*(\d+)\s*[\]})]', re.IGNORECASE)
+_LOCAL_IMDB_ID_RE = re.compile(r'(?<![a-z0-9])(tt\d{7,8})(?![0-9])', re.IGNORECASE)
+_LOCAL_SEASON_EPISODE_RE = re.compile(r'(?<![a-z0-9])S(\d{1,2})[ ._-]?E(\d{1,4})(?!\d)', re.IGNORECASE)
+_LOCAL_NXM_EPISODE_RE = re.compile(r'(?<![0-9a-z])(\d{1,2})x(\d{2,3})(?![0-9a-z])', re.IGNORECASE)
+_LOCAL_CN_SEASON_RE = re.compile(r'第\s*([0-9一二三四五六七八九十]+)\s*季')
+_LOCAL_CN_EPISODE_RE = re.compile(r'第\s*(\d{1,4})\s*[集话話]')
+_LOCAL_EP_RE = re.compile(r'(?<![a-z])EP?\s?(\d{1,4})(?!\d)', re.IGNORECASE)
+_LOCAL_ANIME_EPISODE_RE = re.compile(r'\s-\s(\d{1,4})(?:v\d)?(?=\s|\[|\(|$)')
+_LOCAL_BRACKET_EPISODE_RE = re.compile(r'\[(\d{1,4})(?:v\d)?\]')
+_LOCAL_YEAR_RE = re.compile(r'(?<![0-9])(19[0-9]{2}|20[0-9]{2})(?![0-9]|p)', re.IGNORECASE)
+_LOCAL_RESOLUTION_RE = re.compile(r'(?<![0-9a-z])(4320p|2160p|1440p|1080[pi]|720p|576p|480p|4K|8K|UHD)(?![0-9a-z])', re.IGNORECASE)
+_LOCAL_LEADING_GROUP_RE = re.compile(r'^\s*(?:\[[^\]]*\]|【[^】]*】)\s*')
+_LOCAL_BRACKETS_RE = re.compile(r'\[[^\]]*\]|【[^】]*】|\{[^}]*\}')
+_LOCAL_NOISE_RE = re.compile(
+    r'(?<![0-9a-z])(?:bluray|blu-ray|bdrip|brrip|web-?dl|webrip|web|hdtv|hdrip|dvdrip|remux|'
+    r'x264|x265|h\.?264|h\.?265|hevc|avc|av1|10bit|8bit|hdr10\+?|hdr|dovi|dv|'
+    r'aac|ac3|eac3|ddp?\d\.\d|dts(?:-hd)?|truehd|atmos|flac|'
+    r'proper|repack|extended|uncut|remastered|imax|complete|'
+    r'chs|cht|eng|gb|big5|简繁|中字|国语|粤语)(?![0-9a-z])',
+    re.IGNORECASE
+)
+_LOCAL_SEPARATOR_RE = re.compile(r'[._]+')
+# 季文件夹（"S01"、"Season 1"、"第一季"、"Specials"）：不是剧名，回退取标题时跳过
+_LOCAL_SEASON_FOLDER_RE = re.compile(
+    r'^(?:(?:s|season)[ ._-]*(\d{1,2})|第\s*([0-9一二三四五六七八九十]+)\s*季|specials?)$',
+    re.IGNORECASE
+)
+_LOCAL_WHITESPACE_RE = re.compile(r'\s+')
+
+_CN_DIGITS = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
+
+
+def _cn_number_to_int(text):
+    """将简单的中文数字（一至九十九）或阿拉伯数字转换为整数"""
+    if text.isdigit():
+        return int(text)
+    if text == '十':
+        return 10
+    if text.startswith('十'):
+        return 10 + _CN_DIGITS.get(text[1:], 0)
+    if '十' in text:
+        tens, _, ones = text.partition('十')
+        return _CN_DIGITS.get(tens, 0) * 10 + _CN_DIGITS.get(ones, 0)
+    return _CN_DIGITS.get(text, 0)
+
+
+def _clean_local_title(text, cut_noise=True):
+    """
+    将文件名片段清理为标题：去掉方括号标记、分隔符和技术性后缀
+
+    cut_noise 为False时不在技术词处截断：片段已截取到年份/季集标记之前时，
+    其中的 "Web"、"DV" 等词属于标题本身（如 "The.Web.2020"）。
+    截断后标题为空时保留原文。
+    """
+    text = _LOCAL_BRACKETS_RE.sub(' ', text)
+    text = _LOCAL_SEPARATOR_RE.sub(' ', text)
+    noise = _LOCAL_NOISE_RE.search(text) if cut_noise else None
+    if noise and text[:noise.start()].strip():
+        text = text[:noise.start()]
+    text = re.sub(r'[()\-~+]+\s*$', '', text.strip())
+    return _LOCAL_WHITESPACE_RE.sub(' ', text).strip(' -')
+
+
+def parse_filename_locally(file_path):
+    """
+    使用预编译正则规则解析文件名，作为AI提取前的快速路径
+
+    返回与 extract_movie_info_from_filename_enhanced 相同结构的字典，
+    并附带 confidence（0-100）字段，调用方根据置信度决定是否还需要AI提取。
+
+    Args:
+        file_path (str): 文件路径（可包含父文件夹）
+
+    Returns:
+        dict: 解析结果，包含 title/year/media_type/season/episode/tmdb_id 等字段
+    """
+    basename = os.path.basename(file_path)
+    stem, _ = os.path.splitext(basename)
+    parent_name = os.path.basename(os.path.dirname(file_path))
+
+    tmdb_match = _LOCAL_TMDB_ID_RE.search(basename) or _LOCAL_TMDB_ID_RE.search(parent_name)
+    imdb_match = _LOCAL_IMDB_ID_RE.search(basename) or _LOCAL_IMDB_ID_RE.search(parent_name)
+    resolution_match = _LOCAL_RESOLUTION_RE.search(stem)
+
+    season = None
+    episode = None
+    is_anime_style = False
+    explicit_season = False
+    cut_positions = []
+
+    imdb_in_stem = _LOCAL_IMDB_ID_RE.search(stem)
+    if imdb_in_stem:
+        cut_positions.append(imdb_in_stem.start())
+
+    se_match = _LOCAL_SEASON_EPISODE_RE.search(stem) or _LOCAL_NXM_EPISODE_RE.search(stem)
+    if se_match:
+        season, episode = int(se_match.group(1)), int(se_match.group(2))
+        explicit_season = True
+        cut_positions.append(se_match.start())
+    else:
+        cn_episode = _LOCAL_CN_EPISODE_RE.search(stem)
+        cn_season = _LOCAL_CN_SEASON_RE.search(stem) or _LOCAL_CN_SEASON_RE.search(parent_name)
+        if cn_episode:
+            episode = int(cn_episode.group(1))
+            cut_positions.append(cn_episode.start())
+            if cn_season:
+                season = _cn_number_to_int(cn_season.group(1)) or 1
+                explicit_season = True
+                if cn_season.string is stem:
+                    cut_positions.append(cn_season.start())
+        else:
+            anime_match = _LOCAL_ANIME_EPISODE_RE.search(stem) or _LOCAL_BRACKET_EPISODE_RE.search(stem)
+            if anime_match and not _LOCAL_YEAR_RE.fullmatch(anime_match.group(1)):
+                episode = int(anime_match.group(1))
+                is_anime_style = True
+                cut_positions.append(anime_match.start())
+            else:
+                ep_match = _LOCAL_EP_RE.search(stem)
+                if ep_match:
+                    episode = int(ep_match.group(1))
+                    cut_positions.append(ep_match.start())
+
+    # 年份：取标题之后出现的第一个合法年份，避免把以年份开头的标题当成年份
+    year = ''
+    for year_match in _LOCAL_YEAR_RE.finditer(stem):
+        if year_match.start() == 0 and len(stem) > 4:
+            continue
+        candidate = int(year_match.group(1))
+        if 1900 <= candidate <= datetime.datetime.now().year + 1:
+            year = year_match.group(1)
+            cut_positions.append(year_match.start())
+            break
+
+    if resolution_match:
+        cut_positions.append(resolution_match.start())
+
+    # 标题：去掉开头的发布组标记后，截取到第一个结构化标记之前
+    title_source = _LOCAL_LEADING_GROUP_RE.sub('', stem)
+    offset = len(stem) - len(title_source)
+    # 标记位于开头（如 "EP01.mkv"、"S01E01.mkv"）时标题为空，稍后回退到文件夹名称
+    valid_cuts = [pos - offset for pos in cut_positions if pos - offset >= 0]
+    raw_title = title_source[:min(valid_cuts)] if valid_cuts else title_source
+    # 技术词只在年份/季集/分辨率标记之后出现才是噪声；有这些标记时标题已截取在其之前
+    title = _clean_local_title(raw_title, cut_noise=not valid_cuts)
+
+    # 文件名本身没有标题（如 "11.mp4"、"EP01.mkv"）时，回退到父文件夹名称（跳过 "S01" 这类季文件夹）
+    used_parent_title = False
+    if not title or title.isdigit():
+        folder_path = os.path.dirname(file_path)
+        title_folder = parent_name
+        folder_season = None
+        while title_folder:
+            season_folder = _LOCAL_SEASON_FOLDER_RE.match(title_folder.strip())
+            if not season_folder:
+                break
+            if folder_season is None:
+                if season_folder.group(1):
+                    folder_season = int(season_folder.group(1))
+                elif season_folder.group(2):
+                    folder_season = _cn_number_to_int(season_folder.group(2))
+            parent_path = os.path.dirname(folder_path)
+            if parent_path == folder_path:
+                title_folder = ''
+                break
+            folder_path = parent_path
+            title_folder = os.path.basename(folder_path)
+        parent_info = parse_filename_locally(title_folder + '.dir') if title_folder else None
+        if parent_info and parent_info['title']:
+            title = parent_info['title']
+            year = year or parent_info['year']
+            season = season or folder_season or parent_info['season']
+            if episode is None and stem.strip().isdigit():
+                episode = int(stem.strip())
+            used_parent_title = True
+
+    if episode is not None:
+        media_type = 'anime' if is_anime_style else 'tv_show'
+        season = season or 1
+    else:
+        media_type = 'movie'
+
+    # 置信度评估
+    confidence = 0
+    # 纯数字标题（如 "1917"）只有在另有年份时才认为可信
+    if title and len(title) >= 2 and (not title.isdigit() or (year and title != year)):
+        confidence += 40
+        if len(title) > 60 or _LOCAL_NOISE_RE.search(title):
+            confidence -= 20
+    if media_type == 'movie':
+        if year:
+            confidence += 40
+    else:
+        if explicit_season:
+            confidence += 40
+        elif episode is not None:
+            confidence += 25
+        if year:
+            confidence += 10
+    if tmdb_match or imdb_match:
+        confidence += 30
+    if used_parent_title:
+        confidence -= 15
+    confidence = max(0, min(100, confidence))
+
+    return {
+        'file_name': file_path,
+        'title': title,
+        'original_title': title,
+        'year': year,
+        'media_type': media_type,
+        'tmdb_id': tmdb_match.group(1) if tmdb_match else '',
+        'imdb_id': imdb_match.group(1).lower() if imdb_match else '',
+        'anidb_id': '',
+        'douban_id': '',
+        'season': season,
+        'episode': episode,
+        'resolution': resolution_match.group(1) if resolution_match else '',
+        'confidence': confidence,
+        'source': 'local_parser'
+    }
+
+
+@traced('scrape_batch')
 def extract_movie_name_and_info(chunk):
     """
     优化版电影信息提取和TMDB匹配主函数
@@ -5199,7 +9043,6 @@ def extract_movie_name_and_info(chunk):
     fids = [item['fileId'] for item in chunk]
     names = [item['file_path'] for item in chunk]
     sizes = [item['size_gb'] for item in chunk]
-    user_input_content = "\n".join(names)
 
     logging.info(f"🎬 开始处理批次: {len(names)} 个文件")
 
@@ -5211,7 +9054,7 @@ def extract_movie_name_and_info(chunk):
     current_time = time.time()
 
     for fid, name, size in zip(fids, names, sizes):
-        cache_key = f"scrape_{hash(name)}"
+        cache_key = f"scrape_{FileMetadataStore.make_key(name)}"
 
         if cache_key in scraping_cache:
             cache_entry = scraping_cache[cache_key]
@@ -5236,44 +9079,96 @@ def extract_movie_name_and_info(chunk):
         return results
 
     logging.info(f"🔄 需要重新处理 {len(uncached_names)} 个文件")
-    user_input_content = "\n".join(uncached_names)
 
-    # 🚀 优化：减少重试次数从3次到2次，提高速度
-    movie_info = extract_movie_info_from_filename_enhanced(
-        user_input_content,
-        EXTRACTION_PROMPT,
-        max_attempts=3  # 从3减少到2，平衡准确性和速度
-    )
+    resolved_items = []  # (文件项, 提取信息, 已确定的TMDB条目) 列表
+    ai_items = []
 
-    if not movie_info:
-        logging.warning("❌ 没有从文件名中提取到任何电影信息")
-        # 为每个文件创建失败结果
-        for fid, original_filename, size in zip(fids, names, sizes):
-            results.append({
-                'fileId': fid,
-                'original_name': os.path.basename(original_filename),
-                'suggested_name': '',
-                'size': size,
-                'tmdb_info': None,
-                'file_info': None,
-                'status': 'extraction_failed'
-            })
-        return results
+    # 🗄️ 持久化元数据存储：之前已识别过的文件直接复用解析结果和TMDB匹配
+    stored_metadata = file_metadata_store.get_many([item['file_path'] for item in uncached_items])
+    unknown_items = []
+    for item in uncached_items:
+        record = stored_metadata.get(item['file_path'])
+        if record and record['file_info']:
+            resolved_items.append((item, record['file_info'], record['tmdb_info']))
+        else:
+            unknown_items.append(item)
+    if stored_metadata:
+        logging.info(f"🗄️ 从元数据存储获得 {len(resolved_items)} 个文件的信息")
+
+    # 🏷️ 已带TMDB/IMDb ID的文件：直接按ID解析，不经过AI提取和多策略搜索
+    pending_items = []
+    for item in unknown_items:
+        local_info = parse_filename_locally(item['file_path'])
+        tmdb_result = None
+        if local_info['tmdb_id'] or local_info['imdb_id']:
+            tmdb_result = resolve_tagged_file(local_info)
+        if tmdb_result:
+            resolved_items.append((item, local_info, tmdb_result))
+        else:
+            pending_items.append((item, local_info))
+    tagged_count = len(unknown_items) - len(pending_items)
+    if tagged_count:
+        logging.info(f"🏷️ 通过文件名中的ID直接解析 {tagged_count} 个文件")
+
+    # ⚡ 本地规则解析快速路径：高置信度的文件直接使用解析结果，只有低置信度的文件交给AI
+    if ENABLE_LOCAL_FILENAME_PARSER:
+        local_hits = 0
+        for item, local_info in pending_items:
+            if local_info['confidence'] >= LOCAL_PARSER_CONFIDENCE_THRESHOLD:
+                resolved_items.append((item, local_info, None))
+                local_hits += 1
+            else:
+                ai_items.append(item)
+        logging.info(f"⚡ 本地解析命中 {local_hits} 个文件，{len(ai_items)} 个文件需要AI提取")
+    else:
+        ai_items = [item for item, _ in pending_items]
 
-    logging.info(f"✅ 成功提取 {len(movie_info)} 个文件的信息")
+    if ai_items:
+        ai_paths = [item['file_path'] for item in ai_items]
+
+        if ENABLE_MODEL_CASCADE:
+            # 🪜 模型级联：快速模型处理整批，低分文件升级到强模型
+            aligned_info = extract_with_model_cascade(ai_paths)
+        else:
+            # 🎯 逐项重试：结果按文件名对齐，只重新发送缺失或无效的文件
+            aligned_info = extract_movie_info_per_item(ai_paths)
+
+        extracted_count = sum(1 for file_info in aligned_info if file_info is not None)
+        if extracted_count:
+            logging.info(f"✅ 成功提取 {extracted_count} 个文件的信息")
+        else:
+            logging.warning("❌ 没有从文件名中提取到任何电影信息")
+
+        for item, file_info in zip(ai_items, aligned_info):
+            if file_info is not None:
+                resolved_items.append((item, file_info, None))
+            else:
+                # 为提取失败的文件创建失败结果
+                results.append({
+                    'fileId': item['fileId'],
+                    'original_name': os.path.basename(item['file_path']),
+                    'suggested_name': '',
+                    'size': item['size_gb'],
+                    'tmdb_info': None,
+                    'file_info': None,
+                    'status': 'extraction_failed'
+                })
+
+    if not resolved_items:
+        return results
 
     # 🚀 并行处理每个文件的信息
     def process_single_file(args):
         """处理单个文件的TMDB搜索和命名"""
-        i, fid, file_info, size, original_filename = args
+        i, fid, file_info, size, original_filename, resolved_tmdb = args
         file_basename = os.path.basename(original_filename)
-        logging.info(f"🔄 处理文件 {i+1}/{len(fids)}: {file_basename}")
+        scrape_logger.info("🔄 处理文件 %s/%s: %s", i+1, len(resolved_items), file_basename)
 
         # 为 file_info 添加 file_name 字段，用于后续处理
         if isinstance(file_info, dict):
             file_info['file_name'] = original_filename
         else:
-            logging.warning(f"⚠️ 文件 {file_basename} 的提取信息格式异常")
+            scrape_logger.warning("⚠️ 文件 %s 的提取信息格式异常", file_basename)
             return {
                 'fileId': fid,
                 'original_name': file_basename,
@@ -5286,27 +9181,22 @@ def extract_movie_name_and_info(chunk):
 
         try:
             # 🎯 检查是否包含TMDB ID，如果有则优先验证但仍进行搜索
-            tmdb_id = file_info.get('tmdb_id', '')
-            if tmdb_id and tmdb_id.isdigit():
-                logging.info(f"🎯 发现TMDB ID: {tmdb_id}，将进行搜索验证")
+            tmdb_id = str(file_info.get('tmdb_id', '') or '')
+            if resolved_tmdb:
+                # 文件名自带ID并已直接解析，无需验证和搜索
+                scrape_logger.info("🏷️ 使用文件名中的ID: %s", resolved_tmdb.get('title') or resolved_tmdb.get('name', ''))
+                tmdb_result = resolved_tmdb
+            elif tmdb_id and tmdb_id.isdigit():
+                scrape_logger.info("🎯 发现TMDB ID: %s，将进行搜索验证", tmdb_id)
                 # 从TMDB API获取详细信息进行验证
                 media_type = file_info.get('media_type', 'movie')
 
                 try:
-                    # 根据媒体类型调用相应的TMDB API
-                    if media_type in ['tv', 'tv_show', 'anime']:
-                        url = f"{TMDB_API_URL_BASE}/tv/{tmdb_id}"
-                    else:
-                        url = f"{TMDB_API_URL_BASE}/movie/{tmdb_id}"
-
-                    params = {
-                        "api_key": TMDB_API_KEY,
-                        "language": LANGUAGE,
-                    }
-
-                    response = requests.get(url, params=params, timeout=TMDB_API_TIMEOUT)
-                    response.raise_for_status()
-                    tmdb_candidate = response.json()
+                    # 根据媒体类型获取相应的TMDB详情（带缓存）
+                    detail_type = 'tv' if media_type in ['tv', 'tv_show', 'anime'] else 'movie'
+                    tmdb_candidate = get_tmdb_details_by_id(tmdb_id, detail_type)
+                    if not tmdb_candidate:
+                        raise ValueError("TMDB详情获取失败")
 
                     # 验证这个TMDB ID是否与文件信息匹配
                     candidate_title = tmdb_candidate.get('name') or tmdb_candidate.get('title', '')
@@ -5316,17 +9206,17 @@ def extract_movie_name_and_info(chunk):
                     if candidate_title and file_title:
                         title_similarity = len(set(candidate_title.lower().split()) & set(file_title.lower().split()))
                         if title_similarity >= 1:  # 至少有一个共同词汇
-                            logging.info(f"✅ TMDB ID {tmdb_id} 验证通过: {candidate_title}")
+                            scrape_logger.info("✅ TMDB ID %s 验证通过: %s", tmdb_id, candidate_title)
                             tmdb_result = tmdb_candidate
                         else:
-                            logging.warning(f"⚠️ TMDB ID {tmdb_id} 验证失败，标题不匹配: '{candidate_title}' vs '{file_title}'，将进行搜索")
+                            scrape_logger.warning("⚠️ TMDB ID %s 验证失败，标题不匹配: '%s' vs '%s'，将进行搜索", tmdb_id, candidate_title, file_title)
                             tmdb_result = None
                     else:
-                        logging.info(f"✅ 使用TMDB ID {tmdb_id}: {candidate_title}")
+                        scrape_logger.info("✅ 使用TMDB ID %s: %s", tmdb_id, candidate_title)
                         tmdb_result = tmdb_candidate
 
                 except Exception as e:
-                    logging.warning(f"⚠️ 无法验证TMDB ID {tmdb_id}: {e}，将进行搜索")
+                    scrape_logger.warning("⚠️ 无法验证TMDB ID %s: %s，将进行搜索", tmdb_id, e)
                     tmdb_result = None
             else:
                 tmdb_result = None
@@ -5334,14 +9224,13 @@ def extract_movie_name_and_info(chunk):
             # 如果没有有效的TMDB结果，进行搜索
             if not tmdb_result:
                 # 使用增强版TMDB搜索函数
-                logging.info(f"🔍 开始TMDB搜索: {file_info.get('title', 'Unknown')}")
-                tmdb_result = search_movie_in_tmdb_enhanced(file_info, max_strategies=5)
+                scrape_logger.info("🔍 开始TMDB搜索: %s", file_info.get('title', 'Unknown'))
+                tmdb_result = search_movie_in_tmdb_deduplicated(file_info, max_strategies=5)
             _, ext = os.path.splitext(original_filename)
 
             if tmdb_result:
-                # 评估匹配质量
-                match_quality = evaluate_tmdb_match_quality(file_info, tmdb_result)
-                logging.info(f"📊 TMDB匹配质量: {match_quality['score']:.1f}分")
+                # 匹配质量在整个批次处理完成后统一评估（见下方 evaluate_tmdb_match_quality_batch）
+                match_quality = None
 
                 # 根据媒体类型确定命名格式
                 media_type = file_info.get('media_type', 'movie')
@@ -5360,8 +9249,8 @@ def extract_movie_name_and_info(chunk):
                     tmdb_id = tmdb_result.get('id', 'unknown')
 
                     # 调试日志：输出TMDB结果的详细信息
-                    logging.debug(f"🔍 TMDB结果详情: name='{tmdb_result.get('name')}', first_air_date='{tmdb_result.get('first_air_date')}', id='{tmdb_result.get('id')}'")
-                    logging.debug(f"🔍 提取的标题信息: title='{title}', first_air_date='{first_air_date}', tmdb_id='{tmdb_id}'")
+                    scrape_logger.debug("🔍 TMDB结果详情: name='%s', first_air_date='%s', id='%s'", tmdb_result.get('name'), tmdb_result.get('first_air_date'), tmdb_result.get('id'))
+                    scrape_logger.debug("🔍 提取的标题信息: title='%s', first_air_date='%s', tmdb_id='%s'", title, first_air_date, tmdb_id)
 
                     # 确保 season 和 episode 是整数，如果为 None 或其他非数字类型，则默认为 1
                     season = int(file_info.get('season', 1) or 1)
@@ -5374,7 +9263,7 @@ def extract_movie_name_and_info(chunk):
 
                 if suggested_name:
                     sanitized_output_string = sanitize_filename(suggested_name)
-                    logging.info(f"✅ 成功生成建议名称: {file_basename} -> {sanitized_output_string}")
+                    scrape_logger.info("✅ 成功生成建议名称: %s -> %s", file_basename, sanitized_output_string)
 
                     return {
                         'fileId': fid,
@@ -5388,7 +9277,7 @@ def extract_movie_name_and_info(chunk):
                     }
                 else:
                     # 没有生成建议名称（通常是电视剧缺少剧集信息）
-                    logging.warning(f"⚠️ 未能为 {file_basename} 生成建议名称（可能缺少剧集信息）")
+                    scrape_logger.warning("⚠️ 未能为 %s 生成建议名称（可能缺少剧集信息）", file_basename)
                     return {
                         'fileId': fid,
                         'original_name': file_basename,
@@ -5400,7 +9289,7 @@ def extract_movie_name_and_info(chunk):
                         'status': 'no_episode_info'
                     }
             else:
-                logging.warning(f"❌ 未找到 {file_basename} 的TMDB匹配结果")
+                scrape_logger.warning("❌ 未找到 %s 的TMDB匹配结果", file_basename)
                 return {
                     'fileId': fid,
                     'original_name': file_basename,
@@ -5412,7 +9301,7 @@ def extract_movie_name_and_info(chunk):
                 }
 
         except Exception as exc:
-            logging.error(f"❌ 处理文件 {file_basename} 时发生异常: {exc}")
+            scrape_logger.error("❌ 处理文件 %s 时发生异常: %s", file_basename, exc)
             traceback.print_exc()
             return {
                 'fileId': fid,
@@ -5426,50 +9315,60 @@ def extract_movie_name_and_info(chunk):
             }
 
     # 准备并行处理的参数
-    file_args = [(i, fid, file_info, size, original_filename)
-                 for i, (fid, file_info, size, original_filename)
-                 in enumerate(zip(fids, movie_info, sizes, names))]
+    file_args = [(i, item['fileId'], file_info, item['size_gb'], item['file_path'], tmdb_result)
+                 for i, (item, file_info, tmdb_result) in enumerate(resolved_items)]
 
-    # 使用线程池并行处理
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    max_workers = min(len(file_args), MAX_WORKERS)  # 使用配置的最大工作线程数
+    # 使用共享TMDB线程池并行处理
+    executor = shared_executors['tmdb']
+    logging.info(f"🚀 开始并行处理 {len(file_args)} 个文件，使用共享线程池 {executor.name}（{executor.max_workers} 个线程）")
 
-    logging.info(f"🚀 开始并行处理 {len(file_args)} 个文件，使用 {max_workers} 个线程")
+    # 提交所有任务
+    future_to_args = {executor.submit(process_single_file, args): args for args in file_args}
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有任务
-        future_to_args = {executor.submit(process_single_file, args): args for args in file_args}
+    # 收集结果
+    processed = []
+    for future in as_completed(future_to_args):
+        try:
+            processed.append((future_to_args[future], future.result()))
 
-        # 收集结果并更新缓存
-        for future in as_completed(future_to_args):
-            try:
-                result = future.result()
-                results.append(result)
-
-                # 更新缓存（只缓存成功的结果）
-                if result['status'] == 'success':
-                    args = future_to_args[future]
-                    original_filename = args[4]
-                    cache_key = f"scrape_{hash(original_filename)}"
-                    scraping_cache[cache_key] = {
-                        'result': result.copy(),
-                        'timestamp': current_time
-                    }
+        except Exception as exc:
+            args = future_to_args[future]
+            file_basename = os.path.basename(args[4])
+            logging.error(f"❌ 并行处理文件 {file_basename} 时发生异常: {exc}")
+            results.append({
+                'fileId': args[1],
+                'original_name': file_basename,
+                'suggested_name': '',
+                'size': args[3],
+                'tmdb_info': None,
+                'file_info': args[2],
+                'status': 'error',
+                'error': str(exc)
+            })
 
-            except Exception as exc:
-                args = future_to_args[future]
-                file_basename = os.path.basename(args[4])
-                logging.error(f"❌ 并行处理文件 {file_basename} 时发生异常: {exc}")
-                results.append({
-                    'fileId': args[1],
-                    'original_name': file_basename,
-                    'suggested_name': '',
-                    'size': args[3],
-                    'tmdb_info': None,
-                    'file_info': args[2],
-                    'status': 'error',
-                    'error': str(exc)
-                })
+    # 📊 整个批次一次性评估匹配质量：同一剧集多个文件匹配到的同一TMDB条目只计算一次特征
+    scored_results = [result for _, result in processed
+                      if result.get('tmdb_info') and isinstance(result.get('file_info'), dict)]
+    if scored_results:
+        qualities = evaluate_tmdb_match_quality_batch([result['file_info'] for result in scored_results],
+                                                      [[result['tmdb_info']] for result in scored_results])
+        for result, (quality,) in zip(scored_results, qualities):
+            result['match_quality'] = quality
+            scrape_logger.info("📊 TMDB匹配质量: %s - %.1f分", result['original_name'], quality['score'])
+
+    # 📺 电视剧：按(剧集, 季)批量预取季度数据，校验集数并补充单集标题
+    validate_tv_episodes([result for _, result in processed])
+
+    for args, result in processed:
+        results.append(result)
+
+        # 更新缓存（只缓存成功的结果）
+        if result['status'] == 'success':
+            cache_key = f"scrape_{FileMetadataStore.make_key(args[4])}"
+            scraping_cache[cache_key] = {
+                'result': result.copy(),
+                'timestamp': current_time
+            }
 
     # 统计处理结果并记录详细总结
     success_count = len([r for r in results if r['status'] == 'success'])
@@ -5481,23 +9380,13 @@ def extract_movie_name_and_info(chunk):
     # 记录TMDB搜索总结
     log_tmdb_search_summary(results)
 
-    # 🚀 保存新处理的结果到缓存
-    current_time = time.time()
+    # 🗄️ 保存新处理的结果到持久化元数据存储（提取成功的都保存，TMDB未匹配时只保存解析信息）
+    path_by_fid = {item['fileId']: item['file_path'] for item in uncached_items}
     for result in results:
-        if result['fileId'] in [item['fileId'] for item in uncached_items]:
-            # 只缓存新处理的结果
-            original_name = result['original_name']
-            cache_key = f"scrape_{hash(original_name)}"
-
-            # 创建缓存条目（不包含fileId，因为fileId可能变化）
-            cache_result = result.copy()
-            del cache_result['fileId']
-
-            scraping_cache[cache_key] = {
-                'result': cache_result,
-                'timestamp': current_time
-            }
-            logging.debug(f"💾 缓存结果: {original_name}")
+        file_path = path_by_fid.get(result['fileId'])
+        if file_path and result['status'] in ('success', 'no_episode_info', 'no_match'):
+            file_metadata_store.put(file_path, result['file_info'], result.get('tmdb_info'))
+            logging.debug(f"💾 保存元数据: {result['original_name']}")
 
     # LRU缓存会自动清理过期条目，无需手动清理
     # 这里只记录一下缓存状态
@@ -5528,15 +9417,111 @@ else:
 # 初始化QPS限制器
 initialize_qps_limiters()
 
+# 记录追踪的长耗时接口（刮削、重命名、移动、删除、整理）
+TRACED_ENDPOINTS = {
+    'scrape_preview', 'apply_rename', 'rename_files', 'move_files_direct', 'delete_files',
+    'organize_files_by_groups', 'execute_selected_groups', 'get_folder_grouping_analysis', 'delete_empty_folders'
+}
+
+
+@app.before_request
+def start_request_timer():
+    """记录请求开始时间，用于接口耗时直方图；长耗时接口同时开始一条追踪"""
+    g.request_start_time = time.time()
+    if request.endpoint in TRACED_ENDPOINTS:
+        g.trace_handle = tracer.begin_trace(f"{request.endpoint}-{uuid.uuid4().hex[:8]}", request.endpoint)
+
+
+@app.after_request
+def record_request_metrics(response):
+    """记录接口耗时和状态码（流式响应只统计到开始返回为止）"""
+    start_time = getattr(g, 'request_start_time', None)
+    if start_time is not None:
+        endpoint = request.endpoint or 'unknown'
+        metrics_registry.observe('pan123_http_request_duration_seconds', time.time() - start_time,
+                                 endpoint=endpoint, method=request.method)
+        metrics_registry.inc('pan123_http_requests_total', endpoint=endpoint, status=str(response.status_code))
+    trace_handle = getattr(g, 'trace_handle', None)
+    if trace_handle is not None:
+        response.headers['X-Trace-Id'] = trace_handle[0].trace_id
+    return response
+
+
+@app.teardown_request
+def release_task_token(exception=None):
+    """请求结束时注销该请求线程绑定的任务取消令牌，并结束本请求的追踪"""
+    finish_task()
+    tracer.end_trace(g.pop('trace_handle', None), exception)
+
+
 # Flask 路由
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def _parse_log_query():
+    """解析日志接口的游标、进程epoch和级别参数（SSE的 Last-Event-ID 格式为 "<epoch>:<序号>"）"""
+    cursor = request.headers.get('Last-Event-ID') or ''
+    if ':' in cursor:
+        epoch, _, seq_text = cursor.rpartition(':')
+    else:
+        epoch, seq_text = request.args.get('epoch', ''), cursor or request.args.get('since', 0)
+    try:
+        after_seq = int(seq_text)
+    except ValueError:
+        after_seq = 0
+    level_name = request.args.get('level', '').upper()
+    min_level = logging.getLevelName(level_name) if level_name else 0
+    if not isinstance(min_level, int):
+        min_level = 0
+    return after_seq, epoch, min_level
+
+
 @app.route('/logs')
 def get_logs():
-    # 返回所有当前存储的日志
-    return jsonify(list(log_queue))
+    """
+    获取日志
+
+    不带参数时返回全部缓存的日志行（兼容旧客户端）。
+    带 since=<序号> 时只返回该序号之后的日志：level 按最低级别过滤，
+    wait=<秒> 在没有新日志时长轮询等待（最多30秒），epoch 为上次响应中的进程标识，
+    与当前进程不一致时返回 reset=true 并从头获取。
+    """
+    if 'since' not in request.args:
+        return jsonify(log_ring.lines())
+
+    after_seq, epoch, min_level = _parse_log_query()
+    try:
+        wait_seconds = min(max(float(request.args.get('wait', 0)), 0), 30)
+    except ValueError:
+        wait_seconds = 0
+
+    result = log_ring.wait_since(after_seq, min_level, timeout=wait_seconds, epoch=epoch)
+    return jsonify({'success': True, **result})
+
+
+@app.route('/logs/stream')
+def stream_logs():
+    """以SSE推送新日志（支持 since / Last-Event-ID 续传和 level 过滤，服务重启后先推送 reset 事件）"""
+    after_seq, epoch, min_level = _parse_log_query()
+
+    def generate():
+        last_seq = after_seq
+        last_epoch = epoch
+        while True:
+            result = log_ring.wait_since(last_seq, min_level, timeout=15, epoch=last_epoch)
+            if result['reset']:
+                yield f"event: reset\ndata: {json.dumps({'epoch': result['epoch']})}\n\n"
+            last_epoch = result['epoch']
+            for entry in result['entries']:
+                data = json.dumps({**entry, 'epoch': last_epoch}, ensure_ascii=False)
+                yield f"id: {last_epoch}:{entry['seq']}\nevent: log\ndata: {data}\n\n"
+            if not result['entries']:
+                yield ": keep-alive\n\n"  # 心跳，防止代理断开空闲连接
+            last_seq = result['last_seq']
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/config', methods=['GET'])
 def get_config():
@@ -5846,11 +9831,11 @@ def save_configuration():
 
         # 确保所有QPS限制器都更新
         global qps_limiter, v2_list_limiter, rename_limiter, move_limiter, delete_limiter
-        qps_limiter = QPSLimiter(qps_limit=app_config["QPS_LIMIT"])  # 通用限制器，使用配置值
-        v2_list_limiter = QPSLimiter(qps_limit=4)     # api/v2/file/list: 4 QPS (平衡性能和稳定性)
-        rename_limiter = QPSLimiter(qps_limit=1)       # api/v1/file/rename: 保守使用1 QPS
-        move_limiter = QPSLimiter(qps_limit=3)        # api/v1/file/move: 3 QPS (提高性能)
-        delete_limiter = QPSLimiter(qps_limit=2)       # api/v1/file/delete: 2 QPS (提高性能)
+        qps_limiter = QPSLimiter(qps_limit=app_config["QPS_LIMIT"], name='general')  # 通用限制器，使用配置值
+        v2_list_limiter = QPSLimiter(qps_limit=4, name='v2_list')     # api/v2/file/list: 4 QPS (平衡性能和稳定性)
+        rename_limiter = QPSLimiter(qps_limit=1, name='rename')       # api/v1/file/rename: 保守使用1 QPS
+        move_limiter = QPSLimiter(qps_limit=3, name='move')        # api/v1/file/move: 3 QPS (提高性能)
+        delete_limiter = QPSLimiter(qps_limit=2, name='delete')       # api/v1/file/delete: 2 QPS (提高性能)
 
         logging.info("配置已更新并应用。")
         return jsonify({'success': True, 'message': '配置保存成功并已应用。'})
@@ -6152,7 +10137,7 @@ def get_folder_properties():
                 folder_name = request.form.get('folder_name', f'文件夹{folder_id}')
 
                 # 提交任务到队列
-                task_id = grouping_task_manager.submit_task(folder_id, folder_name)
+                task_id = grouping_task_manager.submit_task(folder_id, folder_name, submitter=request.remote_addr or '')
 
                 return jsonify({
                     'success': True,
@@ -6500,9 +10485,16 @@ def cleanup_expired_requests():
     if expired_folders:
         logging.info(f"🧹 清理了 {len(expired_folders)} 个文件夹的过期请求记录")
 
-def get_folder_grouping_analysis_internal(video_files, folder_id, log_func=None):
-    """内部分组分析函数 - 优化版（带缓存）"""
+def get_folder_grouping_analysis_internal(video_files, folder_id, log_func=None, checkpointer=None, progress_event=None):
+    """
+    内部分组分析函数 - 优化版（带缓存）
+
+    传入 checkpointer 时，每批分组结果和最终合并结果都会保存为检查点，
+    恢复执行时直接复用已完成的阶段。
+    传入 progress_event(stage, **data) 时，在分组开始、每批完成、合并前后发布结构化进度。
+    """
     log_func = log_func or logging.info
+    emit = progress_event or (lambda stage, **data: None)
 
     # 🔄 检查缓存
     cache_key = generate_cache_key(video_files, folder_id)
@@ -6510,6 +10502,7 @@ def get_folder_grouping_analysis_internal(video_files, folder_id, log_func=None)
 
     if cached_result is not None:
         log_func("⚡ 使用缓存的分组结果，跳过AI分析")
+        emit('merged', group_count=len(cached_result.get('movie_info', [])), cached=True)
         return cached_result
 
     # 计算基本信息
@@ -6519,12 +10512,19 @@ def get_folder_grouping_analysis_internal(video_files, folder_id, log_func=None)
 
     # 智能分组分析
     try:
-        if video_files:
+        merged_checkpoint = checkpointer.get('merge') if checkpointer else None
+        if merged_checkpoint is not None:
+            movie_info = merged_checkpoint
+            log_func(f"♻️ 从检查点恢复合并结果: {len(movie_info)} 个分组")
+            emit('merged', group_count=len(movie_info), resumed=True)
+        elif video_files:
             log_func("🎯 开始智能文件分组分析")
             log_func(f"📊 总文件数量: {len(video_files)} 个")
 
             # 🚀 优化：直接按文件数量分批，而不是按子文件夹分组
             all_enhanced_groups = []
+            # AI失败的批次不保存检查点，恢复执行时会重新处理
+            incomplete_batches = 0
 
             # 使用配置的批处理大小
             log_func(f"📦 使用批处理大小: {CHUNK_SIZE} 个文件/批")
@@ -6533,6 +10533,7 @@ def get_folder_grouping_analysis_internal(video_files, folder_id, log_func=None)
             if len(video_files) > CHUNK_SIZE:
                 batches = split_files_into_batches(video_files, CHUNK_SIZE)
                 log_func(f"📦 分批处理: {len(batches)} 批，减少API调用次数")
+                emit('grouping_started', total_files=len(video_files), total_batches=len(batches))
 
                 for i, batch_files in enumerate(batches):
                     try:
@@ -6542,17 +10543,34 @@ def get_folder_grouping_analysis_internal(video_files, folder_id, log_func=None)
 
                     log_func(f"🔄 处理第 {i+1}/{len(batches)} 批: {len(batch_files)} 个文件")
 
+                    # 批次检查点按批大小区分，批大小配置变化后不会错位复用
+                    batch_stage = f"batch_{CHUNK_SIZE}_{i}"
+                    batch_checkpoint = checkpointer.get(batch_stage) if checkpointer else None
+                    if batch_checkpoint is not None:
+                        all_enhanced_groups.extend(batch_checkpoint)
+                        log_func(f"♻️ 第 {i+1} 批从检查点恢复: {len(batch_checkpoint)} 个分组")
+                        emit('batch_done', batches_done=i + 1, total_batches=len(batches),
+                             groups=batch_checkpoint, resumed=True)
+                        continue
+
                     # 添加超时保护
                     batch_start_time = time.time()
                     try:
-                        batch_groups_result = process_files_for_grouping(batch_files, f"批次{i+1}")
+                        batch_failures = []
+                        batch_groups_result = process_files_for_grouping(batch_files, f"批次{i+1}", batch_failures)
                         batch_process_time = time.time() - batch_start_time
+                        if batch_failures:
+                            incomplete_batches += 1
+                        elif checkpointer:
+                            checkpointer.save(batch_stage, batch_groups_result or [])
 
                         if batch_groups_result:
                             all_enhanced_groups.extend(batch_groups_result)
                             log_func(f"✅ 第 {i+1} 批处理完成: 生成 {len(batch_groups_result)} 个分组 (耗时: {batch_process_time:.1f}秒)")
                         else:
                             log_func(f"⏭️ 第 {i+1} 批未生成有效分组 (耗时: {batch_process_time:.1f}秒)")
+                        emit('batch_done', batches_done=i + 1, total_batches=len(batches),
+                             groups=batch_groups_result or [])
 
                     except Exception as e:
                         batch_process_time = time.time() - batch_start_time
@@ -6560,6 +10578,8 @@ def get_folder_grouping_analysis_internal(video_files, folder_id, log_func=None)
                             log_func(f"⚠️ 任务已被用户取消，停止处理")
                             raise
                         log_func(f"❌ 第 {i+1} 批处理失败: {e} (耗时: {batch_process_time:.1f}秒)")
+                        incomplete_batches += 1
+                        emit('batch_done', batches_done=i + 1, total_batches=len(batches), groups=[], failed=True)
                         continue
 
                     # 更新进度
@@ -6568,11 +10588,25 @@ def get_folder_grouping_analysis_internal(video_files, folder_id, log_func=None)
             else:
                 # 单批处理
                 log_func(f"📊 单批处理: {len(video_files)} 个文件")
+                emit('grouping_started', total_files=len(video_files), total_batches=1)
                 batch_start_time = time.time()
+                batch_stage = f"batch_{CHUNK_SIZE}_0"
+                batch_checkpoint = checkpointer.get(batch_stage) if checkpointer else None
                 try:
-                    all_enhanced_groups = process_files_for_grouping(video_files, "全部文件")
+                    if batch_checkpoint is not None:
+                        all_enhanced_groups = batch_checkpoint
+                        log_func(f"♻️ 单批从检查点恢复: {len(all_enhanced_groups)} 个分组")
+                    else:
+                        batch_failures = []
+                        all_enhanced_groups = process_files_for_grouping(video_files, "全部文件", batch_failures)
+                        if batch_failures:
+                            incomplete_batches += 1
+                        elif checkpointer:
+                            checkpointer.save(batch_stage, all_enhanced_groups or [])
                     batch_process_time = time.time() - batch_start_time
                     log_func(f"✅ 单批处理完成: 生成 {len(all_enhanced_groups) if all_enhanced_groups else 0} 个分组 (耗时: {batch_process_time:.1f}秒)")
+                    emit('batch_done', batches_done=1, total_batches=1, groups=all_enhanced_groups or [],
+                         resumed=batch_checkpoint is not None)
                 except Exception as e:
                     batch_process_time = time.time() - batch_start_time
                     if "任务已被用户取消" in str(e):
@@ -6580,8 +10614,10 @@ def get_folder_grouping_analysis_internal(video_files, folder_id, log_func=None)
                         raise
                     log_func(f"❌ 单批处理失败: {e} (耗时: {batch_process_time:.1f}秒)")
                     all_enhanced_groups = []
+                    incomplete_batches += 1
 
             # 🔄 第一步：合并相同名称的分组（解决批处理导致的重复分组）
+            emit('merging', group_count=len(all_enhanced_groups))
             if len(all_enhanced_groups) > 1:
                 log_func(f"🔄 开始合并相同名称的分组: {len(all_enhanced_groups)} 个分组")
                 merge_start_time = time.time()
@@ -6628,6 +10664,10 @@ def get_folder_grouping_analysis_internal(video_files, folder_id, log_func=None)
                 log_func(f"⏭️ 跳过合并: 只有 {len(all_enhanced_groups)} 个分组")
 
             log_func(f"🎯 分组分析完成: 输出 {len(movie_info)} 个分组")
+            # 有批次失败时合并结果不完整，不保存合并检查点，恢复时重新处理失败批次后再合并
+            if checkpointer and not incomplete_batches:
+                checkpointer.save('merge', movie_info)
+            emit('merged', group_count=len(movie_info))
         else:
             movie_info = []
     except Exception as e:
@@ -6677,6 +10717,18 @@ def clear_cache():
             count = len(scraping_cache)
             scraping_cache.clear()
             message += f"，已清理 {count} 个刮削缓存"
+            tmdb_search_memo.clear()
+
+        # 持久化缓存需要显式指定才会清理
+        if cache_type == 'tmdb':
+            count = tmdb_response_cache.clear()
+            tmdb_search_memo.clear()
+            tmdb_season_memo.clear()
+            message = f"已清理 {count} 条TMDB响应缓存"
+
+        if cache_type == 'metadata':
+            count = file_metadata_store.clear()
+            message = f"已清理 {count} 条文件元数据"
 
         logging.info(f"🧹 缓存清理完成: {message}")
         return jsonify({'success': True, 'message': message})
@@ -6706,6 +10758,12 @@ def cache_status():
         scraping_cache_count = scraping_cache_stats['size']
         scraping_cache_valid = scraping_cache_count  # LRU缓存自动管理过期
 
+        # 统计TMDB响应缓存
+        tmdb_cache_stats = tmdb_response_cache.stats()
+
+        # 统计持久化文件元数据
+        metadata_store_stats = file_metadata_store.stats()
+
         return jsonify({
             'success': True,
             'cache_status': {
@@ -6726,7 +10784,16 @@ def cache_status():
                     'valid': scraping_cache_valid,
                     'expired': scraping_cache_count - scraping_cache_valid,
                     'duration': SCRAPING_CACHE_DURATION
-                }
+                },
+                'tmdb_response_cache': tmdb_cache_stats,
+                'tmdb_search_dedup': dict(
+                    tmdb_search_deduplicator.stats(),
+                    memo_size=tmdb_search_memo.size(),
+                    memo_ttl=tmdb_search_memo.ttl
+                ),
+                'tmdb_season_memo': tmdb_season_memo.stats(),
+                'tmdb_title_index': tmdb_title_index.stats(),
+                'file_metadata_store': metadata_store_stats
             }
         })
 
@@ -6734,17 +10801,70 @@ def cache_status():
         logging.error(f"获取缓存状态时发生错误: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/build_tmdb_title_index', methods=['POST'])
+def build_tmdb_title_index():
+    """从TMDB每日导出文件后台构建离线标题索引"""
+    try:
+        movie_export = request.form.get('movie_export', '').strip()
+        tv_export = request.form.get('tv_export', '').strip()
+
+        if not movie_export and not tv_export:
+            return jsonify({'success': False, 'error': '请至少提供一个TMDB导出文件路径（movie_export 或 tv_export）'})
+        for export_path in (movie_export, tv_export):
+            if export_path and not os.path.isfile(export_path):
+                return jsonify({'success': False, 'error': f'导出文件不存在: {export_path}'})
+        # 检查并标记构建状态在同一把锁内完成，避免并发请求同时开始构建
+        if not tmdb_title_index.try_begin_build():
+            return jsonify({'success': False, 'error': '离线标题索引正在构建中'})
+
+        def build_worker():
+            try:
+                tmdb_title_index.build(movie_export or None, tv_export or None)
+            except Exception as e:
+                logging.error(f"❌ 构建离线标题索引失败: {e}")
+
+        threading.Thread(target=build_worker, daemon=True).start()
+        logging.info(f"📚 开始构建离线标题索引: movie={movie_export or '-'}, tv={tv_export or '-'}")
+        return jsonify({'success': True, 'message': '离线标题索引开始后台构建，可通过 /cache_status 查看状态'})
+
+    except Exception as e:
+        logging.error(f"构建离线标题索引时发生错误: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/cancel_task', methods=['POST'])
 def cancel_task():
-    """取消当前正在运行的任务"""
+    """取消正在运行的任务（传入task_id时只取消该任务）"""
     try:
-        cancel_current_task()
-        return jsonify({'success': True, 'message': '任务取消请求已发送'})
+        task_id = request.form.get('task_id') or None
+        cancelled_ids = cancel_current_task(task_id)
+        return jsonify({'success': True, 'message': '任务取消请求已发送', 'cancelled_tasks': cancelled_ids})
     except Exception as e:
         logging.error(f"取消任务时发生错误: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """以Prometheus文本格式导出指标（接口/上游/限速器延迟直方图，重试、429和缓存命中计数）"""
+    return Response(metrics_registry.render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/api/traces', methods=['GET'])
+def list_traces():
+    """最近的追踪列表（分组任务的追踪ID即任务ID，接口追踪ID见响应头 X-Trace-Id）"""
+    return jsonify({'success': True, 'tracing_enabled': TRACING_ENABLED, 'traces': tracer.list_traces()})
+
+
+@app.route('/api/traces/<trace_id>', methods=['GET'])
+def export_trace(trace_id):
+    """导出 Chrome trace-event JSON，可在 chrome://tracing 或 https://ui.perfetto.dev 打开"""
+    trace_data = tracer.export_chrome(trace_id)
+    if trace_data is None:
+        return jsonify({'success': False, 'error': '追踪不存在或已过期'}), 404
+    return Response(json.dumps(trace_data, ensure_ascii=False), mimetype='application/json',
+                    headers={'Content-Disposition': f'attachment; filename="trace-{trace_id}.json"'})
+
+
 @app.route('/performance_stats', methods=['GET'])
 def get_performance_stats():
     """获取性能统计信息"""
@@ -6752,6 +10872,14 @@ def get_performance_stats():
         stats = {
             'app_state': app_state.get_stats(),
             'performance': performance_monitor.get_stats(),
+            'tmdb_client': tmdb_client.stats(),
+            'executors': {name: executor.stats() for name, executor in shared_executors.items()},
+            'scheduler': scheduler.stats(),
+            'task_store': task_store.stats(),
+            'task_events': task_event_bus.stats(),
+            'logging': get_logging_stats(),
+            'latency': metrics_registry.histogram_summaries(),
+            'limiters': get_limiter_stats(),
             'system_info': {
                 'python_version': sys.version,
                 'platform': sys.platform,
@@ -6769,6 +10897,7 @@ def reset_performance_stats():
     """重置性能统计"""
     try:
         performance_monitor.reset_stats()
+        tmdb_client.reset_stats()
         return jsonify({'success': True, 'message': '性能统计已重置'})
     except Exception as e:
         logging.error(f"重置性能统计时发生错误: {e}")
@@ -6814,7 +10943,7 @@ def scrape_preview():
     """刮削预览"""
     try:
         # 开始新任务
-        start_new_task(f"scrape_preview_{int(time.time())}")
+        start_new_task(request.form.get('task_id') or f"scrape_preview_{int(time.time())}")
 
         selected_files_json = request.form.get('files')
         if not selected_files_json:
@@ -6922,65 +11051,80 @@ def scrape_preview():
         # 检查任务是否被取消
         check_task_cancelled()
 
-        # 🚀 优化分块处理策略
-        chunks = [files_to_scrape[i:i + CHUNK_SIZE] for i in range(0, len(files_to_scrape), CHUNK_SIZE)]
+        # 🚀 优化分块处理策略：按需切分批次，不预先生成全部批次
+        total_batches = (len(files_to_scrape) + CHUNK_SIZE - 1) // CHUNK_SIZE
+        chunk_iter = (files_to_scrape[i:i + CHUNK_SIZE] for i in range(0, len(files_to_scrape), CHUNK_SIZE))
         all_scraped_results = []
 
-        logging.info(f"📦 分为 {len(chunks)} 个批次处理 (每批次 {CHUNK_SIZE} 个文件)")
+        # 同时在途的批次数上限：超过AI线程池大小的批次只会排队占用内存
+        max_in_flight = max(1, shared_executors['ai'].max_workers)
+
+        logging.info(f"📦 分为 {total_batches} 个批次处理 (每批次 {CHUNK_SIZE} 个文件，最多 {max_in_flight} 个批次同时在途)")
         logging.info(f"🔧 性能配置: QPS_LIMIT={QPS_LIMIT}, MAX_WORKERS={MAX_WORKERS}")
 
         # 记录开始时间用于性能分析
         start_time = time.time()
         completed_batches = 0
+        submitted_batches = 0
 
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = []
-            future_info = {}  # 存储 future 对象的额外信息
-
-            for i, chunk in enumerate(chunks):
-
-                # 检查任务是否被取消
+        # 批次提交到共享AI线程池；每个批次内的TMDB搜索再扇出到共享TMDB线程池
+        in_flight = {}  # future -> 批次信息，完成后立即移除
+        try:
+            while True:
+                # 检查任务是否被取消（取消后不再提交新批次）
                 check_task_cancelled()
 
-                logging.info(f"🚀 提交第 {i+1}/{len(chunks)} 个批次进行处理 (包含 {len(chunk)} 个文件)")
-                future = executor.submit(extract_movie_name_and_info, chunk)
-                futures.append(future)
-                future_info[future] = {'batch_num': i+1, 'batch_size': len(chunk)}
+                # 补充提交批次，直到达到在途上限
+                while len(in_flight) < max_in_flight:
+                    chunk = next(chunk_iter, None)
+                    if chunk is None:
+                        break
+                    submitted_batches += 1
+                    logging.info(f"🚀 提交第 {submitted_batches}/{total_batches} 个批次进行处理 (包含 {len(chunk)} 个文件)")
+                    future = shared_executors['ai'].submit(extract_movie_name_and_info, chunk)
+                    in_flight[future] = {'batch_num': submitted_batches, 'batch_size': len(chunk), 'submit_time': time.time()}
 
-            for future in as_completed(futures):
-                batch_num = future_info[future]['batch_num']
-                batch_size = future_info[future]['batch_size']
-                try:
-                    # 检查任务是否被取消
-                    check_task_cancelled()
+                if not in_flight:
+                    break
 
-                    batch_start_time = time.time()
-                    results = future.result()
-                    batch_end_time = time.time()
-                    batch_duration = batch_end_time - batch_start_time
+                # 短超时等待，使取消请求能在批次完成前生效
+                done, _ = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    info = in_flight.pop(future)
+                    batch_num = info['batch_num']
+                    batch_size = info['batch_size']
+                    try:
+                        results = future.result()
+                        batch_duration = time.time() - info['submit_time']
 
-                    completed_batches += 1
+                        completed_batches += 1
 
-                    if results:
-                        all_scraped_results.extend(results)
-                        logging.info(f"✅ 完成第 {batch_num} 个批次 ({batch_size} 个文件)，获得 {len(results)} 个结果，耗时 {batch_duration:.2f}秒")
-                    else:
-                        logging.info(f"⚠️ 第 {batch_num} 个批次未获得结果，耗时 {batch_duration:.2f}秒")
+                        if results:
+                            all_scraped_results.extend(results)
+                            logging.info(f"✅ 完成第 {batch_num} 个批次 ({batch_size} 个文件)，获得 {len(results)} 个结果，耗时 {batch_duration:.2f}秒")
+                        else:
+                            logging.info(f"⚠️ 第 {batch_num} 个批次未获得结果，耗时 {batch_duration:.2f}秒")
 
-                    # 计算整体进度
-                    progress = (completed_batches / len(chunks)) * 100
-                    elapsed_time = time.time() - start_time
-                    avg_time_per_batch = elapsed_time / completed_batches
-                    estimated_remaining = (len(chunks) - completed_batches) * avg_time_per_batch
+                        # 计算整体进度
+                        progress = (completed_batches / total_batches) * 100
+                        elapsed_time = time.time() - start_time
+                        avg_time_per_batch = elapsed_time / completed_batches
+                        estimated_remaining = (total_batches - completed_batches) * avg_time_per_batch
 
-                    logging.info(f"📊 进度: {completed_batches}/{len(chunks)} ({progress:.1f}%), 预计剩余时间: {estimated_remaining:.1f}秒")
+                        logging.info(f"📊 进度: {completed_batches}/{total_batches} ({progress:.1f}%), 预计剩余时间: {estimated_remaining:.1f}秒")
 
-                except Exception as exc:
-                    if "任务已被用户取消" in str(exc):
-                        logging.info("🛑 刮削任务被用户取消")
-                        raise
-                    else:
-                        logging.error(f'第 {batch_num} 个批次处理异常: {exc}', exc_info=True)
+                    except Exception as exc:
+                        if "任务已被用户取消" in str(exc):
+                            logging.info("🛑 刮削任务被用户取消")
+                            raise
+                        else:
+                            logging.error(f'第 {batch_num} 个批次处理异常: {exc}', exc_info=True)
+        finally:
+            # 取消或异常退出时撤回尚未开始的批次，避免继续占用共享线程池
+            for future in in_flight:
+                future.cancel()
+            if in_flight:
+                logging.info(f"🛑 已撤回 {len(in_flight)} 个在途批次，{total_batches - submitted_batches} 个批次未提交")
 
         logging.info(f"🎉 刮削预览完成。总结果: {len(all_scraped_results)}")
         return jsonify({'success': True, 'results': all_scraped_results})
@@ -7653,6 +11797,50 @@ def get_folder_naming_prompt():
 """
 
 
+def suggest_folder_name_from_metadata(video_files):
+    """
+    当所有文件都已在元数据存储中匹配到同一部作品时，直接生成文件夹名称，不调用AI
+
+    命名规则与AI提示词一致：电影 `标题 (年份)`；电视剧单季 `标题 (年份) S01`，
+    2-4季 `标题 (年份) S01-S04`，5季以上 `标题 完整系列`。
+
+    Returns:
+        str or None: 建议的文件夹名称，无法确定时返回None
+    """
+    paths = [f.get('file_path') or f['filename'] for f in video_files]
+    records = file_metadata_store.get_many(paths)
+    if not paths or len(records) < len(paths):
+        return None
+
+    tmdb_infos = [records[path]['tmdb_info'] for path in paths]
+    if any(not info for info in tmdb_infos):
+        return None
+
+    file_infos = [records[path]['file_info'] or {} for path in paths]
+    is_movie = [info.get('media_type') == 'movie' for info in file_infos]
+    if len({info.get('id') for info in tmdb_infos}) != 1 or len(set(is_movie)) != 1:
+        return None
+
+    tmdb_info = tmdb_infos[0]
+    if is_movie[0]:
+        year = (tmdb_info.get('release_date') or '')[:4]
+        title = tmdb_info.get('title', '')
+        suggested_name = f"{title} ({year})" if year else title
+    else:
+        title = tmdb_info.get('name', '')
+        year = (tmdb_info.get('first_air_date') or '')[:4]
+        seasons = sorted({int(info.get('season') or 1) for info in file_infos})
+        if len(seasons) >= 5:
+            suggested_name = f"{title} 完整系列"
+        else:
+            season_part = f"S{seasons[0]:02d}" if len(seasons) == 1 else f"S{seasons[0]:02d}-S{seasons[-1]:02d}"
+            suggested_name = f"{title} ({year}) {season_part}" if year else f"{title} {season_part}"
+
+    if not title or len(suggested_name) > 30:
+        return None
+    return suggested_name
+
+
 def generate_folder_name_with_ai(file_list):
     """使用AI生成文件夹名称建议"""
     user_input_content = repr(file_list)
@@ -7662,16 +11850,13 @@ def generate_folder_name_with_ai(file_list):
     retry_delay = AI_RETRY_DELAY
     suggested_name = None
 
-    # 构建完整的提示词
-    full_prompt = f"{folder_name_prompt}\n\n{user_input_content}"
-
     for attempt in range(max_retries):
         try:
             # 检查任务是否被取消
             check_task_cancelled()
 
             # 使用统一的AI API调用函数
-            ai_content = call_ai_api(full_prompt, GROUPING_MODEL)
+            ai_content = call_ai_api(user_input_content, GROUPING_MODEL, system_prompt=folder_name_prompt)
 
             if not ai_content:
                 logging.warning(f"AI API调用返回空结果 (尝试 {attempt + 1}/{max_retries})")
@@ -7688,7 +11873,7 @@ def generate_folder_name_with_ai(file_list):
         except Exception as e:
             logging.error(f"AI请求处理失败 (尝试 {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(retry_delay)
+                upstream_retry_sleep('ai', retry_delay)
             else:
                 raise AIServiceError(f'AI服务请求失败: {str(e)}')
 
@@ -7767,7 +11952,7 @@ def suggest_folder_name():
     """根据文件夹内容智能建议文件夹名称"""
     try:
         # 开始新任务
-        start_new_task(f"suggest_name_{int(time.time())}")
+        start_new_task(request.form.get('task_id') or f"suggest_name_{int(time.time())}")
 
         # 清理操作相关缓存
         clear_operation_related_caches(operation_type="renaming")
@@ -7790,8 +11975,12 @@ def suggest_folder_name():
         # 准备AI分析的文件列表
         file_list = [{'fileId': item['fileId'], 'filename': item['filename']} for item in sampled_video_files]
 
-        # 使用AI生成文件夹名称建议
-        suggested_name = generate_folder_name_with_ai(file_list)
+        # 🗄️ 所有文件都已识别为同一部作品时直接命名，否则使用AI生成文件夹名称建议
+        suggested_name = suggest_folder_name_from_metadata(sampled_video_files)
+        if suggested_name:
+            logging.info(f"🗄️ 根据已识别的元数据生成文件夹名称，跳过AI: {suggested_name}")
+        else:
+            suggested_name = generate_folder_name_with_ai(file_list)
 
         # 清理和验证建议的名称
         clean_name = clean_suggested_folder_name(suggested_name)
@@ -7862,7 +12051,7 @@ def organize_files_by_groups():
             for attempt in range(max_retries):
                 try:
                     logging.info(f"🔄 重试智能分组 (第 {attempt + 1}/{max_retries} 次)")
-                    time.sleep(GROUPING_RETRY_DELAY)  # 使用全局配置的重试延迟
+                    upstream_retry_sleep('ai', GROUPING_RETRY_DELAY)  # 使用全局配置的重试延迟
                     movie_info = process_files_for_grouping(video_files, f"文件夹{folder_id}_重试{attempt+1}")
                     if movie_info:
                         logging.info(f"✅ 重试成功，获得 {len(movie_info)} 个分组")
@@ -8571,6 +12760,9 @@ def start_flask_app():
         # 启动缓存清理后台任务
         start_cache_cleanup_task()
 
+        # 恢复上次未完成的智能分组任务（此时所有全局对象已初始化）
+        resume_grouping_tasks()
+
         # 检测是否为打包环境
         import sys
         is_packaged = getattr(sys, 'frozen', False)
@@ -282,11 +282,21 @@ document.addEventListener('DOMContentLoaded', () => {
     const cancelRenameTaskBtn = document.getElementById('cancelRenameTaskBtn');
     const cancelScrapePreviewBtn = document.getElementById('cancelScrapePreviewBtn');
 
-    // 取消当前任务的函数
-    async function cancelCurrentTask() {
+    // 当前刮削预览任务ID（用于只取消本次刮削，不影响其他任务）
+    let currentScrapeTaskId = null;
+    // 当前智能重命名建议任务ID
+    let currentRenameTaskId = null;
+
+    // 取消当前任务的函数（传入taskId时只取消该任务）
+    async function cancelCurrentTask(taskId = null) {
         try {
+            const formData = new FormData();
+            if (taskId) {
+                formData.append('task_id', taskId);
+            }
             const response = await fetch('/cancel_task', {
-                method: 'POST'
+                method: 'POST',
+                body: formData
             });
             const data = await response.json();
 
@@ -402,60 +412,96 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // 注意：showStatus 和 hideStatus 函数已移至全局作用域
 
-    // 获取并显示实时日志
-    async function fetchLogs() {
-        // 如果日志被暂停，则不更新
+    // 获取并显示实时日志（增量）：服务器为每行日志分配递增序号，只拉取游标之后的新日志
+    const MAX_DISPLAY_LOGS = 1000;
+    let logCursor = 0;
+    let logEpoch = '';  // 服务器进程标识：变化说明服务已重启，旧游标失效
+    let displayedLogLines = [];
+
+    function renderLogLines(newLines) {
+        displayedLogLines.push(...newLines);
+        // 超出上限较多时整体重绘一次，平时只追加新行，避免每次重建DOM
+        const fullRender = displayedLogLines.length > MAX_DISPLAY_LOGS + 200;
+        if (fullRender) {
+            displayedLogLines = displayedLogLines.slice(-MAX_DISPLAY_LOGS);
+        }
+
+        const appendLines = (target) => {
+            if (fullRender) {
+                target.textContent = displayedLogLines.join('\n') + '\n';
+            } else {
+                target.appendChild(document.createTextNode(newLines.join('\n') + '\n'));
+            }
+        };
+
+        // 更新主面板日志
+        if (logDisplay) {
+            appendLines(logDisplay);
+
+            // 自动滚动到底部（如果用户没有手动滚动）
+            if (!isUserScrolling && logContainer) {
+                // 使用 setTimeout 确保DOM更新完成后再滚动
+                setTimeout(() => {
+                    logContainer.scrollTop = logContainer.scrollHeight;
+                }, 10);
+            }
+        }
+
+        // 更新悬浮窗日志
+        if (floatingLogDisplay && isFloatingMode) {
+            appendLines(floatingLogDisplay);
+
+            // 自动滚动到底部
+            floatingLogDisplay.scrollTop = floatingLogDisplay.scrollHeight;
+        }
+    }
+
+    async function fetchLogs(waitSeconds = 0) {
+        // 如果日志被暂停，则不更新（游标不前进，恢复后补齐暂停期间的日志）
         if (logPaused) {
-            return;
+            return true;
         }
 
         try {
-            const response = await fetch('/logs');
+            const response = await fetch(`/logs?since=${logCursor}&epoch=${encodeURIComponent(logEpoch)}&wait=${waitSeconds}`);
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
-            const logs = await response.json();
-
-            const MAX_DISPLAY_LOGS = 1000;
-            const startIndex = Math.max(0, logs.length - MAX_DISPLAY_LOGS);
-            const logsToDisplay = logs.slice(startIndex);
-
-            const fragment = document.createDocumentFragment();
-            logsToDisplay.forEach(logEntryText => {
-                const logEntry = document.createTextNode(logEntryText + '\n');
-                fragment.appendChild(logEntry);
-            });
+            const data = await response.json();
 
-            // 更新主面板日志
-            if (logDisplay) {
-                logDisplay.innerHTML = '';
-                logDisplay.appendChild(fragment.cloneNode(true));
-
-                // 自动滚动到底部（如果用户没有手动滚动）
-                if (!isUserScrolling && logContainer) {
-                    // 使用 setTimeout 确保DOM更新完成后再滚动
-                    setTimeout(() => {
-                        logContainer.scrollTop = logContainer.scrollHeight;
-                    }, 10);
-                }
+            if (logEpoch && data.epoch !== logEpoch) {
+                // 服务器重启后序号重新计数（以进程epoch判断，不依赖序号大小）
+                logCursor = 0;
             }
+            logEpoch = data.epoch;
+            // 请求在途期间用户暂停了日志：丢弃本次结果且游标不前进，恢复后重新获取这些日志
+            if (logPaused) {
+                return true;
+            }
+            // 多个请求并发时（例如操作完成后的立即刷新）只处理未显示过的日志
+            const newEntries = data.entries.filter(entry => entry.seq > logCursor);
+            logCursor = Math.max(logCursor, data.last_seq);
 
-            // 更新悬浮窗日志
-            if (floatingLogDisplay && isFloatingMode) {
-                floatingLogDisplay.innerHTML = '';
-                floatingLogDisplay.appendChild(fragment.cloneNode(true));
-
-                // 自动滚动到底部
-                floatingLogDisplay.scrollTop = floatingLogDisplay.scrollHeight;
+            if (newEntries.length > 0) {
+                renderLogLines(newEntries.map(entry => entry.line));
             }
+            return true;
         } catch (error) {
             console.error('获取日志失败:', error);
+            return false;
         }
     }
 
-    // 每隔一段时间获取一次日志
-    setInterval(fetchLogs, 1000);
-    fetchLogs();
+    // 长轮询获取日志：没有新日志时服务器挂起请求，空闲时几乎没有开销
+    async function pollLogs() {
+        while (true) {
+            const ok = await fetchLogs(logPaused ? 0 : 25);
+            if (!ok || logPaused) {
+                await new Promise(resolve => setTimeout(resolve, ok ? 1000 : 3000));
+            }
+        }
+    }
+    pollLogs();
 
     // 监听日志容器的滚动事件
     if (logContainer) {
@@ -1159,6 +1205,8 @@ document.addEventListener('DOMContentLoaded', () => {
         try {
             const formData = new FormData();
             formData.append('files', JSON.stringify(itemsToScrape));
+            currentScrapeTaskId = `scrape_preview_${Date.now()}_${Math.random().toString(36).slice(2, 8)}`;
+            formData.append('task_id', currentScrapeTaskId);
 
             const response = await fetch('/scrape_preview', {
                 method: 'POST',
@@ -1536,11 +1584,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     showOperationResultModal(`<div class="alert alert-success"><i class="fas fa-check-circle"></i> ${data.message || '重命名操作完成'}</div>`);
                 }
 
-                fetchLogs();
-
-                // 延迟调用几次 fetchLogs，确保获取最新日志
-                setTimeout(() => fetchLogs(), 1000);
-                setTimeout(() => fetchLogs(), 3000);
+                // 日志通过长轮询实时推送，无需额外刷新
             } else {
                 // 处理失败情况，也可能包含部分结果
                 if (data.results && Array.isArray(data.results)) {
@@ -2724,6 +2768,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
             const formData = new FormData();
             formData.append('folder_id', currentActiveFolderId);
+            currentRenameTaskId = `suggest_name_${Date.now()}_${Math.random().toString(36).slice(2, 8)}`;
+            formData.append('task_id', currentRenameTaskId);
 
             const response = await fetch('/suggest_folder_name', {
                 method: 'POST',
@@ -3209,7 +3255,7 @@ document.addEventListener('DOMContentLoaded', () => {
     organizeFilesModalClose.addEventListener('click', () => {
         // 🚨 如果有正在进行的分组任务，直接取消任务
         if (isGroupingInProgress && currentTaskId) {
-            cancelCurrentTask().then((cancelled) => {
+            cancelCurrentTask(currentTaskId).then((cancelled) => {
                 if (cancelled) {
                     console.log('✅ 后台任务已取消');
                     showStatus(organizeFilesStatus, '任务已取消', 'warning');
@@ -3254,7 +3300,7 @@ document.addEventListener('DOMContentLoaded', () => {
     cancelOrganizeBtn.addEventListener('click', () => {
         // 🚨 如果有正在进行的分组任务，直接取消任务
         if (isGroupingInProgress && currentTaskId) {
-            cancelCurrentTask().then((cancelled) => {
+            cancelCurrentTask(currentTaskId).then((cancelled) => {
                 if (cancelled) {
                     console.log('✅ 后台任务已取消');
                     showStatus(organizeFilesStatus, '任务已取消', 'warning');
@@ -3279,14 +3325,20 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // 取消任务按钮事件监听器
     cancelTaskBtn.addEventListener('click', async () => {
-        const cancelled = await cancelCurrentTask();
+        if (!currentTaskId) {
+            return;
+        }
+        const cancelled = await cancelCurrentTask(currentTaskId);
         if (cancelled) {
             showStatus(organizeFilesStatus, '正在取消任务...', 'warning');
         }
     });
 
     cancelRenameTaskBtn.addEventListener('click', async () => {
-        const cancelled = await cancelCurrentTask();
+        if (!currentRenameTaskId) {
+            return;
+        }
+        const cancelled = await cancelCurrentTask(currentRenameTaskId);
         if (cancelled) {
             showStatus(smartRenameStatus, '正在取消任务...', 'warning');
         }
@@ -3294,7 +3346,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // 取消预览刮削按钮事件监听器
     cancelScrapePreviewBtn.addEventListener('click', async () => {
-        const cancelled = await cancelCurrentTask();
+        const cancelled = await cancelCurrentTask(currentScrapeTaskId);
         if (cancelled) {
             showStatus(scrapePreviewStatus, '正在取消刮削预览...', 'warning');
             // 立即恢复按钮状态
@@ -3365,7 +3417,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (event.target === organizeFilesModal) {
             // 🚨 如果有正在进行的分组任务，直接取消任务
             if (isGroupingInProgress && currentTaskId) {
-                cancelCurrentTask().then((cancelled) => {
+                cancelCurrentTask(currentTaskId).then((cancelled) => {
                     if (cancelled) {
                         console.log('✅ 后台任务已取消');
                         showStatus(organizeFilesStatus, '任务已取消', 'warning');
@@ -3527,6 +3579,7 @@ document.addEventListener('DOMContentLoaded', () => {
         clearLogBtn.addEventListener('click', () => {
             if (logDisplay) logDisplay.textContent = '';
             if (floatingLogDisplay) floatingLogDisplay.textContent = '';
+            displayedLogLines = [];
         });
     }
 
@@ -3615,6 +3668,7 @@ document.addEventListener('DOMContentLoaded', () => {
         floatingClearLogBtn.addEventListener('click', () => {
             if (logDisplay) logDisplay.textContent = '';
             if (floatingLogDisplay) floatingLogDisplay.textContent = '';
+            displayedLogLines = [];
         });
     }
 
@@ -4397,15 +4451,93 @@ function startRateLimitCountdown(remainingSeconds) {
 
 let currentTaskId = null;
 let taskPollingInterval = null;
+let taskEventSource = null;
 
 function startTaskStatusPolling(taskId) {
-    // 开始轮询任务状态
+    // 优先通过SSE接收服务器推送的进度事件，不支持或连接失败时回退到轮询
     currentTaskId = taskId;
 
-    // 清除之前的轮询
+    // 清除之前的轮询和事件连接
     if (taskPollingInterval) {
         clearInterval(taskPollingInterval);
+        taskPollingInterval = null;
+    }
+    closeTaskEventSource();
+
+    if (window.EventSource) {
+        startTaskEventStream(taskId);
+        return;
+    }
+
+    startTaskStatusInterval(taskId);
+}
+
+function startTaskEventStream(taskId) {
+    // 订阅任务进度事件流
+    const source = new EventSource(`/api/grouping_task/events/${taskId}`);
+    taskEventSource = source;
+
+    source.addEventListener('progress', (event) => {
+        const data = JSON.parse(event.data);
+        updateTaskUI({
+            status: data.status,
+            progress: data.progress,
+            folder_name: data.folder_name,
+            error: null
+        });
+        updateTaskStageDetail(data);
+    });
+
+    source.addEventListener('done', () => {
+        // 任务结束：关闭事件流，获取一次完整结果
+        closeTaskEventSource();
+        checkTaskStatus(taskId);
+    });
+
+    source.onerror = () => {
+        // 连接失败（例如任务不存在或服务器重启）：回退到轮询
+        if (taskEventSource !== source) {
+            return;
+        }
+        console.warn('⚠️ 任务事件流连接失败，回退到状态轮询');
+        closeTaskEventSource();
+        if (currentTaskId === taskId) {
+            startTaskStatusInterval(taskId);
+        }
+    };
+
+    console.log(`📡 开始接收任务进度事件: ${taskId}`);
+}
+
+function updateTaskStageDetail(data) {
+    // 在状态栏中补充阶段细节（已扫描文件数、批次进度、预计剩余时间）
+    const details = [];
+    if (data.files_scanned !== undefined) {
+        details.push(`已扫描 ${data.files_scanned} 个文件`);
+    }
+    if (data.total_batches !== undefined && data.batches_done !== undefined) {
+        details.push(`批次 ${data.batches_done}/${data.total_batches}`);
     }
+    if (data.eta_seconds !== undefined && data.eta_seconds !== null) {
+        details.push(`预计剩余 ${Math.ceil(data.eta_seconds)} 秒`);
+    }
+    if (data.group_count !== undefined) {
+        details.push(`${data.group_count} 个分组`);
+    }
+    if (details.length > 0 && data.status === 'running') {
+        showStatus(organizeFilesStatus, `🔄 正在分析文件夹... (进度: ${data.progress.toFixed(1)}%, ${details.join('，')})`, 'info');
+    }
+}
+
+function closeTaskEventSource() {
+    if (taskEventSource) {
+        taskEventSource.close();
+        taskEventSource = null;
+    }
+}
+
+function startTaskStatusInterval(taskId) {
+    // 轮询任务状态（SSE不可用时的回退方案）
 
     // 立即检查一次状态
     checkTaskStatus(taskId);
@@ -4502,11 +4634,12 @@ function updateProgressBar(progress) {
 }
 
 function stopTaskStatusPolling() {
-    // 停止任务状态轮询
+    // 停止任务状态轮询和事件流
     if (taskPollingInterval) {
         clearInterval(taskPollingInterval);
         taskPollingInterval = null;
     }
+    closeTaskEventSource();
     currentTaskId = null;
     console.log('🛑 停止任务状态轮询');
 }